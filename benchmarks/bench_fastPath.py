@@ -0,0 +1,66 @@
+"""
+Compares the requests per second of /api/risk/ and /api/risk/fast on a single worker.
+The ASGI app is called directly, in-process, so the numbers leave out the network and
+the HTTP parsing of the server (the same for both endpoints).
+
+Usage: python benchmarks/bench_fastPath.py [requests]
+"""
+import sys, os
+
+benchdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, srcdir)))
+sys.path.append(os.path.abspath(os.path.join(benchdir, '..')))
+
+import asyncio
+import json
+import random
+import time
+from main import app
+from tests.helpers import random_user
+
+
+async def post(path: str, body: bytes) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 50000), "server": ("localhost", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = []
+
+    async def receive():
+        return messages.pop() if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+async def requests_per_second(path: str, bodies) -> float:
+    start = time.perf_counter()
+    for body in bodies:
+        assert await post(path, body) == 200
+    return len(bodies) / (time.perf_counter() - start)
+
+
+async def main(count: int) -> None:
+    rnd = random.Random(0)
+    bodies = [json.dumps(random_user(rnd)).encode() for _ in range(count)]
+    # warm up
+    await requests_per_second("/api/risk/", bodies[:200])
+    await requests_per_second("/api/risk/fast", bodies[:200])
+
+    default_rps = await requests_per_second("/api/risk/", bodies)
+    fast_rps = await requests_per_second("/api/risk/fast", bodies)
+    print(f"requests:        {count}")
+    print(f"/api/risk/:      {default_rps:.0f} requests/s")
+    print(f"/api/risk/fast:  {fast_rps:.0f} requests/s ({fast_rps / default_rps:.1f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000))
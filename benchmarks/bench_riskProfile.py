@@ -0,0 +1,42 @@
+"""
+Measures the time per request saved by trusting an already validated UserModel in RiskProfile.
+
+Usage: python benchmarks/bench_riskProfile.py [users]
+"""
+import sys, os
+
+benchdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, srcdir)))
+sys.path.append(os.path.abspath(os.path.join(benchdir, '..')))
+
+import random
+import time
+from models.user_model import UserModel
+from riskProfile import RiskProfile
+from tests.helpers import random_user
+
+
+def main(count: int) -> None:
+    rnd = random.Random(0)
+    users = [UserModel.parse_obj(random_user(rnd)) for _ in range(count)]
+
+    start = time.perf_counter()
+    for user in users:
+        RiskProfile(user, validate=True)
+    validated_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for user in users:
+        RiskProfile(user)
+    trusted_time = time.perf_counter() - start
+
+    print(f"users:                 {count}")
+    print(f"validated UserModel:   {validated_time / count * 1e6:.3f} us/request")
+    print(f"trusted UserModel:     {trusted_time / count * 1e6:.3f} us/request")
+    print(f"saving:                {(validated_time - trusted_time) / count * 1e6:.3f} us/request "
+          f"({(1 - trusted_time / validated_time) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
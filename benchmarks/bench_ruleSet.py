@@ -0,0 +1,67 @@
+"""
+Compares the time per user of the Rules class and the compiled RuleSet evaluator.
+
+Usage: python benchmarks/bench_ruleSet.py [users]
+"""
+import sys, os
+
+benchdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, srcdir)))
+sys.path.append(os.path.abspath(os.path.join(benchdir, '..')))
+
+import datetime
+import random
+import time
+from rules import Rules
+from ruleSet import RuleSet
+from tests.helpers import random_user
+
+
+def main(count: int) -> None:
+    rnd = random.Random(0)
+    users = [random_user(rnd) for _ in range(count)]
+    rule_set = RuleSet.from_file()
+    evaluate = rule_set.evaluate
+    year = datetime.datetime.now().year
+    arguments = [
+        (u["age"], u["dependents"], u["income"], u["marital_status"],
+         u["house"] and u["house"]["ownership_status"], u["vehicle"] and u["vehicle"]["year"],
+         sum(u["risk_questions"]), year)
+        for u in users
+    ]
+
+    start = time.perf_counter()
+    for user in users:
+        rules = Rules(user=user, score={"auto": 0, "disability": 0, "home": 0, "life": 0})
+        rules.apply_all_rules()
+    rules_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for args in arguments:
+        evaluate(*args)
+    evaluate_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for user in users:
+        rules = Rules(user=user, score={"auto": 0, "disability": 0, "home": 0, "life": 0})
+        rules.apply_all_rules()
+        rules.processedScore
+    rules_model_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for user in users:
+        rule_set.calculate(user)
+    calculate_time = time.perf_counter() - start
+
+    print(f"users:                          {count}")
+    print(f"Rules.apply_all_rules:          {rules_time / count * 1e6:.3f} us/user")
+    print(f"RuleSet.evaluate:               {evaluate_time / count * 1e6:.3f} us/user "
+          f"({rules_time / evaluate_time:.1f}x)")
+    print(f"Rules + processedScore:         {rules_model_time / count * 1e6:.3f} us/user")
+    print(f"RuleSet.calculate:              {calculate_time / count * 1e6:.3f} us/user "
+          f"({rules_model_time / calculate_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
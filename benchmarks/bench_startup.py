@@ -0,0 +1,92 @@
+"""
+Measures the cold start of the API: the time to import the app (main.py) and the time to the first
+response of /, /api/risk/ and /openapi.json (generated on its first request), each one in a new process.
+The ASGI app is called directly, in-process, so the numbers leave out the server. The medians of the runs
+are reported. Run it with `python -X importtime` in the service directory to see the modules that are imported.
+
+Usage: python benchmarks/bench_startup.py [runs]
+"""
+import sys, os
+
+benchdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, srcdir)))
+
+import asyncio
+import json
+import statistics
+import subprocess
+import time
+
+USER = {
+    "age": 35,
+    "dependents": 2,
+    "house": {"ownership_status": "owned"},
+    "income": 0,
+    "marital_status": "married",
+    "risk_questions": [0, 1, 0],
+    "vehicle": {"year": 2018}
+}
+
+
+async def request(app, method: str, path: str, body: bytes = b"") -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 50000), "server": ("localhost", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = []
+
+    async def receive():
+        return messages.pop() if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+def child() -> None:
+    # runs in a new process, prints the milliseconds of each step
+    start = time.perf_counter()
+    from main import app
+    timings = {"import main": time.perf_counter() - start}
+
+    async def first_responses() -> None:
+        for name, method, path, body in [("first GET /", "GET", "/", b""),
+                                         ("first POST /api/risk/", "POST", "/api/risk/", json.dumps(USER).encode()),
+                                         ("first GET /openapi.json", "GET", "/openapi.json", b"")]:
+            step = time.perf_counter()
+            assert await request(app, method, path, body) == 200
+            timings[name] = time.perf_counter() - step
+
+    asyncio.run(first_responses())
+    timings["total in process"] = time.perf_counter() - start
+    print(json.dumps({name: seconds * 1000 for name, seconds in timings.items()}))
+
+
+def main(runs: int) -> None:
+    results = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, __file__, "--child"], check=True, capture_output=True,
+                                cwd=os.path.abspath(os.path.join(benchdir, srcdir))).stdout
+        wall = (time.perf_counter() - start) * 1000
+        timings = json.loads(output)
+        timings["process (with the interpreter)"] = wall
+        results.append(timings)
+
+    print(f"runs: {runs} (medians)")
+    for name in results[0]:
+        print(f"{name + ':':32}{statistics.median(r[name] for r in results):8.1f} ms")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--child"]:
+        child()
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,274 @@
+"""
+Benchmark suite of the scoring engine and the HTTP layer.
+
+Microbenchmarks of each Rules method, Validator.validate_all, utils.process and RiskProfile, and an
+in-process load test of /api/risk/ through httpx's ASGI transport (no network). Each benchmark is
+calibrated to run for at least --min-time seconds and repeated --repeat times; the median of the
+repetitions is the result. Results are saved as JSON, and compared with a previous run with --compare:
+the suite fails (exit status 1) if any benchmark is slower than the threshold.
+
+Usage:
+    python benchmarks/bench_suite.py -o baseline.json
+    python benchmarks/bench_suite.py -o current.json --compare baseline.json --threshold 10
+"""
+import sys, os
+
+benchdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, srcdir)))
+sys.path.append(os.path.abspath(os.path.join(benchdir, '..')))
+
+import argparse
+import asyncio
+import datetime
+import json
+import platform
+import random
+import statistics
+import time
+from typing import Callable, Dict, List
+
+import httpx
+import utils as utils
+from main import app
+from models.user_model import UserModel
+from riskProfile import RiskProfile
+from rules import Rules
+from userRecord import UserRecord, new_score
+from validator import Validator
+from tests.helpers import random_user
+
+FORMAT_VERSION = 1
+
+USER = UserModel.Config.schema_extra["example"]
+
+RULES = [
+    "rule_risk_questions",
+    "rule_vehicle_last_five_years",
+    "rule_user_is_married",
+    "rule_user_has_dependents",
+    "rule_user_s_house_is_mortgaged",
+    "rule_if_income_is_above_two_hundred_k",
+    "rule_age_risk",
+    "rule_user_over_sixty_years",
+    "rule_user_does_not_have_income_vehicle_or_house",
+]
+
+
+def time_loops(function: Callable[[], object], loops: int) -> float:
+    # seconds per call of `loops` calls
+    calls = range(loops)
+    start = time.perf_counter()
+    for _ in calls:
+        function()
+    return (time.perf_counter() - start) / loops
+
+
+def calibrate(function: Callable[[], object], min_time: float) -> int:
+    # number of loops that take at least min_time seconds
+    loops = 1
+    while True:
+        if time_loops(function, loops) * loops >= min_time:
+            return loops
+        loops *= 2
+
+
+def summary(values: List[float], **extra) -> Dict:
+    return {
+        "unit": "s",
+        "values": values,
+        "median": statistics.median(values),
+        "mean": statistics.mean(values),
+        "stdev": statistics.stdev(values) if len(values) > 1 else 0.0,
+        "min": min(values),
+        **extra
+    }
+
+
+def microbenchmarks() -> Dict[str, Callable[[], object]]:
+    """
+    Returns the functions to measure, by benchmark name
+    """
+    benchmarks: Dict[str, Callable[[], object]] = {}
+
+    # each rule on a reused instance; the scores drift, but the cost of the rules does not depend on them
+    rules = Rules(user=USER, score=new_score())
+    for name in RULES:
+        benchmarks[f"rules.{name}"] = getattr(rules, name)
+
+    def apply_all_rules():
+        rules.score = new_score()
+        rules.apply_all_rules()
+        return rules.processedScore
+    benchmarks["rules.apply_all_rules"] = apply_all_rules
+
+    validator = Validator(user=USER)
+    benchmarks["validator.validate_all"] = validator.validate_all
+    benchmarks["validator.validate_all_dict"] = lambda: Validator(user=USER).validate_all()
+
+    # every range of scores
+    scores = [None, -1, 0, 1, 2, 3, 4, 5]
+    benchmarks["utils.process"] = lambda: [utils.process(score) for score in scores]
+
+    # end to end, on a cycle of random users
+    rnd = random.Random(0)
+    raw_users = [random_user(rnd) for _ in range(1024)]
+    models = [UserModel.parse_obj(user) for user in raw_users]
+    records = [UserRecord.from_user(user) for user in raw_users]
+
+    def cycle(users, function):
+        position = [0]
+
+        def call():
+            position[0] = (position[0] + 1) & 1023
+            return function(users[position[0]])
+        return call
+
+    benchmarks["riskProfile.user_model"] = cycle(models, RiskProfile)
+    benchmarks["riskProfile.dict"] = cycle(raw_users, RiskProfile)
+    benchmarks["riskProfile.user_record"] = cycle(records, lambda user: RiskProfile(user, validate=False))
+    return benchmarks
+
+
+async def load_test(requests: int, concurrency: int) -> Dict[str, float]:
+    """
+    Posts `requests` random users to /api/risk/ with `concurrency` concurrent clients, in-process
+    Returns:
+        the total seconds and the latency of each request
+    """
+    rnd = random.Random(0)
+    bodies = [random_user(rnd) for _ in range(requests)]
+    latencies: List[float] = []
+
+    async with httpx.AsyncClient(app=app, base_url="http://benchmark") as client:
+        async def worker(queue: List[dict]) -> None:
+            while queue:
+                body = queue.pop()
+                start = time.perf_counter()
+                response = await client.post("/api/risk/", json=body)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    raise RuntimeError(f"/api/risk/ returned {response.status_code}: {response.text}")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(bodies) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "latencies": latencies}
+
+
+def run(repeat: int, min_time: float, requests: int, concurrency: int, selected: str = None,
+        progress=sys.stderr) -> Dict:
+    """
+    Runs the suite
+    Args:
+        repeat: number of measures of each benchmark
+        min_time: minimum seconds of each measure of the microbenchmarks
+        requests: number of requests of each measure of the load test, 0 to skip it
+        concurrency: concurrent clients of the load test
+        selected: only run the benchmarks whose name contains this text
+        progress: file the results are reported to as they are measured, None to disable it
+    Returns:
+        the results, as saved in the JSON file
+    """
+    results: Dict[str, Dict] = {}
+
+    def report(name: str) -> None:
+        if progress is not None:
+            result = results[name]
+            progress.write(f"{name:56} {result['median'] * 1e6:10.3f} us +- {result['stdev'] * 1e6:.3f}\n")
+
+    for name, function in microbenchmarks().items():
+        if selected and selected not in name:
+            continue
+        loops = calibrate(function, min_time)
+        results[name] = summary([time_loops(function, loops) for _ in range(repeat)], loops=loops)
+        report(name)
+
+    name = "http.api_risk"
+    if requests > 0 and (not selected or selected in name):
+        # the first round warms up the app and the client
+        asyncio.run(load_test(min(requests, 100), concurrency))
+        rounds = [asyncio.run(load_test(requests, concurrency)) for _ in range(repeat)]
+        latencies = sorted(latency for r in rounds for latency in r["latencies"])
+        results[name] = summary(
+            [r["seconds"] / requests for r in rounds],
+            requests=requests,
+            concurrency=concurrency,
+            requests_per_second=requests / statistics.median(r["seconds"] for r in rounds),
+            latency_p50=latencies[len(latencies) // 2],
+            latency_p99=latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)]
+        )
+        report(name)
+
+    return {
+        "version": FORMAT_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "benchmarks": results
+    }
+
+
+def compare(baseline: Dict, current: Dict, threshold: float, output=sys.stdout) -> List[str]:
+    """
+    Compares the medians of two runs
+    Args:
+        baseline: results of the previous run
+        current: results of this run
+        threshold: maximum slowdown, in percent
+        output: file the comparison is written to
+    Returns:
+        the names of the benchmarks slower than the threshold
+    """
+    regressions = []
+    output.write(f"{'benchmark':56} {'baseline':>12} {'current':>12} {'change':>8}\n")
+    for name, result in current["benchmarks"].items():
+        previous = baseline["benchmarks"].get(name)
+        if previous is None:
+            output.write(f"{name:56} {'-':>12} {result['median'] * 1e6:10.3f}us {'new':>8}\n")
+            continue
+        change = (result["median"] / previous["median"] - 1) * 100
+        regression = change > threshold
+        if regression:
+            regressions.append(name)
+        output.write(f"{name:56} {previous['median'] * 1e6:10.3f}us {result['median'] * 1e6:10.3f}us "
+                     f"{change:+7.1f}%{'  REGRESSION' if regression else ''}\n")
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark suite of the scoring engine and the HTTP layer")
+    parser.add_argument("-o", "--output", help="JSON file the results are saved to")
+    parser.add_argument("--compare", help="JSON file of a previous run to compare with")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="maximum slowdown of a benchmark, in percent (default 10)")
+    parser.add_argument("--repeat", type=int, default=5, help="measures of each benchmark (default 5)")
+    parser.add_argument("--min-time", type=float, default=0.1,
+                        help="minimum seconds of each measure of the microbenchmarks (default 0.1)")
+    parser.add_argument("--requests", type=int, default=2000,
+                        help="requests of each measure of the load test, 0 to skip it (default 2000)")
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent clients of the load test (default 10)")
+    parser.add_argument("--filter", help="only run the benchmarks whose name contains this text")
+    args = parser.parse_args(argv)
+
+    # read the baseline first, so a wrong path fails before running the suite
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = run(args.repeat, args.min_time, args.requests, args.concurrency, args.filter)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if baseline is not None:
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) slower than {args.threshold}%: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
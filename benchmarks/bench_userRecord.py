@@ -0,0 +1,70 @@
+"""
+Measures the time and the memory allocated per risk profile by Rules, Validator and RiskProfile.
+
+Usage: python benchmarks/bench_userRecord.py [users]
+"""
+import sys, os
+
+benchdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, srcdir)))
+sys.path.append(os.path.abspath(os.path.join(benchdir, '..')))
+
+import random
+import time
+import tracemalloc
+from models.user_model import UserModel
+from riskProfile import RiskProfile
+from rules import Rules
+from userRecord import UserRecord
+from validator import Validator
+from tests.helpers import random_user
+
+
+def score_rules(user):
+    rules = Rules(user=user, score={"auto": 0, "disability": 0, "home": 0, "life": 0})
+    rules.apply_all_rules()
+    return rules.processedScore
+
+
+def validate(user):
+    Validator(user=user).validate_all()
+
+
+def measure(name, function, users) -> None:
+    start = time.perf_counter()
+    for user in users:
+        function(user)
+    elapsed = time.perf_counter() - start
+
+    # peak of the memory allocated while calculating one profile, averaged over some users
+    sample = users[:1000]
+    tracemalloc.start()
+    peak = 0
+    for user in sample:
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        function(user)
+        peak += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    print(f"{name:32} {elapsed / len(users) * 1e6:8.3f} us/profile {peak / len(sample):8.0f} bytes/profile")
+
+
+def main(count: int) -> None:
+    rnd = random.Random(0)
+    raw_users = [random_user(rnd) for _ in range(count)]
+    models = [UserModel.parse_obj(user) for user in raw_users]
+    records = [UserRecord.from_user(user) for user in raw_users]
+
+    print(f"users: {count}")
+    measure("Rules (UserModel)", score_rules, models)
+    measure("Rules (dict)", score_rules, raw_users)
+    measure("Rules (UserRecord)", score_rules, records)
+    measure("Validator (dict)", validate, raw_users)
+    measure("Validator (UserRecord)", validate, records)
+    measure("RiskProfile (UserModel)", RiskProfile, models)
+    measure("RiskProfile (dict)", RiskProfile, raw_users)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
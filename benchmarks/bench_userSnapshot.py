@@ -0,0 +1,57 @@
+"""
+Compares rescoring a NDJSON file of users with rescoring its snapshot (.rsk) with the batch scorer.
+
+Usage: python benchmarks/bench_userSnapshot.py [users]
+"""
+import sys, os
+
+benchdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, srcdir)))
+sys.path.append(os.path.abspath(os.path.join(benchdir, '..')))
+
+import json
+import random
+import shutil
+import tempfile
+import time
+import batch
+from userSnapshot import ROW_SIZE, read_snapshot
+from vectorizedRules import VectorizedRules
+from tests.helpers import random_user
+
+
+def main(count: int) -> None:
+    rnd = random.Random(0)
+    directory = tempfile.mkdtemp()
+    try:
+        users = os.path.join(directory, "users.ndjson")
+        with open(users, "w") as f:
+            for _ in range(count):
+                f.write(json.dumps(random_user(rnd)) + "\n")
+        snapshot = os.path.join(directory, "users.rsk")
+        batch.run(users, snapshot, chunk_size=100000, engine="rules")
+
+        ndjson_time = batch.run(users, os.path.join(directory, "results.ndjson"), chunk_size=100000,
+                                engine="rules")["seconds"]
+        snapshot_time = batch.run(snapshot, os.path.join(directory, "results2.ndjson"), chunk_size=100000,
+                                  engine="rules")["seconds"]
+
+        # zero-copy scoring of the mapped snapshot, without writing the results
+        start = time.perf_counter()
+        rules = VectorizedRules(**read_snapshot(snapshot))
+        rules.apply_all_rules()
+        scoring_time = time.perf_counter() - start
+
+        print(f"users:          {count}")
+        print(f"NDJSON size:    {os.path.getsize(users) / count:.1f} bytes/user")
+        print(f"snapshot size:  {os.path.getsize(snapshot) / count:.1f} bytes/user ({ROW_SIZE} per row)")
+        print(f"NDJSON:         {count / ndjson_time:,.0f} users/s")
+        print(f"snapshot:       {count / snapshot_time:,.0f} users/s ({ndjson_time / snapshot_time:.1f}x)")
+        print(f"scores only:    {count / scoring_time:,.0f} users/s")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500000)
@@ -0,0 +1,45 @@
+"""
+Compares the per row time of Rules.apply_all_rules and VectorizedRules.apply_all_rules.
+
+Usage: python benchmarks/bench_vectorizedRules.py [rows]
+"""
+import sys, os
+
+benchdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(benchdir, srcdir)))
+sys.path.append(os.path.abspath(os.path.join(benchdir, '..')))
+
+import random
+import time
+from rules import Rules
+from vectorizedRules import VectorizedRules, columns_from_users
+from tests.helpers import random_user
+
+
+def main(rows: int) -> None:
+    rnd = random.Random(0)
+    users = [random_user(rnd) for _ in range(rows)]
+    columns = columns_from_users(users)
+
+    start = time.perf_counter()
+    for user in users:
+        rules = Rules(user=user, score={"auto": 0, "disability": 0, "home": 0, "life": 0})
+        rules.apply_all_rules()
+        rules.processedScore
+    rules_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rules = VectorizedRules(**columns)
+    rules.apply_all_rules()
+    rules.processedScore
+    vectorized_time = time.perf_counter() - start
+
+    print(f"rows:       {rows}")
+    print(f"Rules:      {rules_time / rows * 1e6:.3f} us/row")
+    print(f"Vectorized: {vectorized_time / rows * 1e6:.3f} us/row")
+    print(f"speedup:    {rules_time / vectorized_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
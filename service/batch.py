@@ -0,0 +1,443 @@
+"""
+Offline batch scorer: calculates the risk profile of every user of a CSV, NDJSON or Parquet file.
+
+    python -m service.batch users.csv profiles.csv --workers 4
+    python -m service.batch users.csv report.json --aggregate age_band
+
+The input is read in chunks, the chunks are scored by a pool of processes and the results are
+written in the same order and format of the input, so the memory used does not depend on the size of the file.
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# the service modules import each other by name
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fastPath
+from clock import Clock
+from engines import ENGINES, RISK_ENGINE, build_engine
+from portfolioStats import GROUPINGS, PortfolioStats
+from userSnapshot import UserSnapshotWriter, read_snapshot, snapshot_rows
+from vectorizedRules import HOUSE_NONE, HOUSE_MORTGAGED, LINES, NO_VEHICLE, VectorizedRules, process_array
+
+try:
+    import pyarrow
+    import pyarrow.parquet as parquet
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pyarrow = None
+    parquet = None
+
+FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".parquet": "parquet", ".pq": "parquet",
+           ".rsk": "snapshot"}
+
+# a record is (line or row number, user), a result is (line or row number, plans, errors)
+Record = Tuple[int, Any]
+Result = Tuple[int, Optional[Tuple[str, str, str, str]], Optional[List[Dict]]]
+
+_engine = None
+_clock = None
+
+
+def file_format(path: str) -> str:
+    """
+    Returns the format of a file (csv, ndjson, parquet or snapshot) from its extension
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f'Invalid file format {extension}')
+    return FORMATS[extension]
+
+
+def _user_from_row(row: Dict) -> Dict:
+    # flat rows (CSV or Parquet): house is the ownership status, vehicle the year,
+    # risk_questions a list or its JSON text. Empty values are missing house/vehicle
+    user = dict(row)
+    house = user.get("house")
+    if house in ("", None):
+        user["house"] = None
+    elif isinstance(house, str):
+        user["house"] = {"ownership_status": house}
+    vehicle = user.get("vehicle")
+    if vehicle in ("", None):
+        user["vehicle"] = None
+    elif not isinstance(vehicle, dict):
+        user["vehicle"] = {"year": vehicle}
+    risk_questions = user.get("risk_questions")
+    if isinstance(risk_questions, str):
+        try:
+            user["risk_questions"] = json.loads(risk_questions)
+        except ValueError:
+            pass
+    return user
+
+
+def read_chunks(path: str, fmt: str, chunk_size: int) -> Iterator[List[Record]]:
+    """
+    Reads the users of a file in chunks of at most chunk_size users.
+    NDJSON users are left as bytes, to be decoded by the workers. Empty lines are skipped.
+    """
+    chunk: List[Record] = []
+    if fmt == "ndjson":
+        with open(path, "rb") as f:
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    chunk.append((number, line))
+                    if len(chunk) == chunk_size:
+                        yield chunk
+                        chunk = []
+    elif fmt == "csv":
+        with open(path, newline="") as f:
+            for number, row in enumerate(csv.DictReader(f), 1):
+                chunk.append((number, _user_from_row(row)))
+                if len(chunk) == chunk_size:
+                    yield chunk
+                    chunk = []
+    else:
+        if parquet is None:
+            raise ValueError('Parquet files need pyarrow')
+        number = 0
+        for batch in parquet.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            for row in batch.to_pylist():
+                number += 1
+                chunk.append((number, _user_from_row(row)))
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _init_worker(engine_name: str, as_of: datetime.date = None) -> None:
+    global _engine, _clock
+    _clock = None if as_of is None else Clock(as_of)
+    _engine = build_engine(engine_name, clock=_clock)
+
+
+def _check(record: Any) -> Tuple[Optional[Dict], List[Dict]]:
+    if isinstance(record, bytes):
+        try:
+            data, errors = fastPath.decode(record, ())
+        except ValueError:
+            return None, [{"loc": [], "msg": "line is not valid UTF-8", "type": "value_error.unicode"}]
+        if errors:
+            return None, errors
+        record = data
+    return fastPath.check_user(record, ())
+
+
+def score_chunk(chunk: List[Record]) -> List[Result]:
+    """
+    Calculates the plans of a chunk of users with the engine of the process (see _init_worker)
+    """
+    results: List[Result] = []
+    for number, record in chunk:
+        user, errors = _check(record)
+        if errors:
+            results.append((number, None, errors))
+        else:
+            results.append((number, tuple(fastPath.plans(user, _engine, _clock)), None))
+    return results
+
+
+def check_chunk(chunk: List[Record]) -> Tuple[List[Dict], int]:
+    """
+    Validates a chunk of users
+    Returns:
+        the valid users and the number of invalid ones
+    """
+    users = []
+    for _, record in chunk:
+        user, errors = _check(record)
+        if not errors:
+            users.append(user)
+    return users, len(chunk) - len(users)
+
+
+def score_snapshot(task: Tuple[str, int, int]) -> List[Result]:
+    """
+    Calculates the plans of a slice (path, start, stop) of a snapshot file. The columns are memory-mapped
+    and scored by VectorizedRules without copying them, or converted to users for other engines
+    """
+    path, start, stop = task
+    columns = read_snapshot(path, start, stop)
+    if _engine is None:
+        rules = VectorizedRules(**columns, clock=_clock)
+        rules.apply_all_rules()
+        plans = zip(*(process_array(rules.score[line], rules.eligible[line]).tolist() for line in LINES))
+    else:
+        plans = (_engine.plans(user) for user in _snapshot_users(columns))
+    return [(number, tuple(plan), None) for number, plan in enumerate(plans, start + 1)]
+
+
+def _snapshot_users(columns: Dict) -> Iterator[Dict]:
+    # the users of the columns of a snapshot, as returned by fastPath.check_user
+    for age, dependents, income, married, house, vehicle_year, risk_questions in zip(
+            *(columns[name].tolist() for name in ("age", "dependents", "income", "married", "house",
+                                                   "vehicle_year", "risk_questions"))):
+        yield {
+            "age": age,
+            "dependents": dependents,
+            "house": None if house == HOUSE_NONE else
+            {"ownership_status": "mortgaged" if house == HOUSE_MORTGAGED else "owned"},
+            "income": income,
+            "marital_status": "married" if married else "single",
+            "risk_questions": risk_questions,
+            "vehicle": None if vehicle_year == NO_VEHICLE else {"year": vehicle_year}
+        }
+
+
+def aggregate_chunk(task: Tuple[List[Record], Optional[str]]) -> PortfolioStats:
+    """
+    Counts the risk profiles of a chunk of users (chunk, group_by) with the engine of the process
+    """
+    chunk, group_by = task
+    stats = PortfolioStats(group_by, _engine, _clock)
+    for _, record in chunk:
+        user, errors = _check(record)
+        if errors:
+            stats.add_error()
+        else:
+            stats.add(user)
+    return stats
+
+
+def aggregate_snapshot(task: Tuple[str, int, int, Optional[str]]) -> PortfolioStats:
+    """
+    Counts the risk profiles of a slice (path, start, stop, group_by) of a snapshot file with the engine of the process
+    """
+    path, start, stop, group_by = task
+    stats = PortfolioStats(group_by, _engine, _clock)
+    for user in _snapshot_users(read_snapshot(path, start, stop)):
+        stats.add(user)
+    return stats
+
+
+class _Writer:
+    def __init__(self, path: str, fmt: str) -> None:
+        self._fmt = fmt
+        self._parquet = None
+        if fmt == "parquet":
+            if parquet is None:
+                raise ValueError('Parquet files need pyarrow')
+            schema = pyarrow.schema([(line, pyarrow.string()) for line in LINES] + [("errors", pyarrow.string())])
+            self._parquet = parquet.ParquetWriter(path, schema)
+            return
+        if fmt == "ndjson":
+            self._file = open(path, "wb")
+        else:
+            self._file = open(path, "w", newline="")
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(LINES + ("errors",))
+
+    def write(self, results: List[Result]) -> None:
+        if self._fmt == "ndjson":
+            # the same items of /api/risk/stream
+            self._file.write(b"".join(
+                fastPath.dumps({"result": dict(zip(LINES, plans))} if plans is not None
+                               else {"line": number, "detail": errors}) + b"\n"
+                for number, plans, errors in results))
+        elif self._fmt == "csv":
+            self._csv.writerows(plans + ("",) if plans is not None else ("", "", "", "", json.dumps(errors))
+                                for _, plans, errors in results)
+        else:
+            columns = {line: [plans[i] if plans is not None else None for _, plans, _ in results]
+                       for i, line in enumerate(LINES)}
+            columns["errors"] = [json.dumps(errors) if errors is not None else None for _, _, errors in results]
+            self._parquet.write_table(pyarrow.table(columns))
+
+    def close(self) -> None:
+        if self._parquet is not None:
+            self._parquet.close()
+        else:
+            self._file.close()
+
+
+def _map(function, tasks: Iterator, workers: int, engine: str, as_of: datetime.date = None) -> Iterator:
+    # applies the function to the tasks in a pool of processes, returning the results in order
+    if workers == 1:
+        _init_worker(engine, as_of)
+        for task in tasks:
+            yield function(task)
+        return
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(engine, as_of)) as pool:
+        # at most two tasks per process are read ahead, and they are returned in submission order
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(function, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def run(input_path: str, output_path: str, workers: int = 1, chunk_size: int = 10000,
+        engine: str = RISK_ENGINE, progress=None, as_of: datetime.date = None) -> Dict[str, float]:
+    """
+    Scores the users of a file and writes the results to another file of the same format.
+    When the output is a snapshot (.rsk) the valid users are exported to it instead, and
+    the results of a snapshot are written to a CSV, NDJSON or Parquet file.
+    Args:
+        input_path: CSV, NDJSON, Parquet or snapshot file of users
+        output_path: file of the results, one per user in the same order
+        workers: number of processes. With 1 the users are scored in this process
+        chunk_size: number of users sent at once to a process
+        engine: scoring engine (see engines.py)
+        progress: file the progress is reported to, None to disable it
+        as_of: date the users are scored on, so the results do not depend on when the file is scored.
+               None for the current date
+    Returns:
+        the number of users, of invalid users and the seconds taken
+    """
+    fmt = file_format(input_path)
+    output_fmt = file_format(output_path)
+    if fmt == "snapshot" and output_fmt == "snapshot":
+        raise ValueError('Invalid output file: it must be a CSV, NDJSON or Parquet file')
+    if output_fmt != fmt and "snapshot" not in (fmt, output_fmt):
+        raise ValueError('Invalid output file: it must have the same format of the input')
+    if workers < 1:
+        raise ValueError('Invalid number of workers')
+    if chunk_size < 1:
+        raise ValueError('Invalid chunk size')
+    if engine not in ENGINES:
+        # checked before the pool is started, its initializer would break it instead
+        raise ValueError(f'Invalid risk engine {engine}')
+    if as_of is not None and engine == "shared":
+        # the table is shared by every process of the host, it is always the one of the current year
+        raise ValueError('The shared engine can not score as of another date')
+
+    start = time.monotonic()
+    stats = {"users": 0, "errors": 0, "seconds": 0.0}
+
+    def report(users: int, errors: int) -> None:
+        stats["users"] += users
+        stats["errors"] += errors
+        if progress is not None:
+            elapsed = time.monotonic() - start
+            progress.write(f"\r{'exported' if output_fmt == 'snapshot' else 'scored'} {stats['users']} users "
+                           f"({stats['errors']} invalid), {stats['users'] / elapsed if elapsed else 0:.0f} users/s")
+            progress.flush()
+
+    if output_fmt == "snapshot":
+        with UserSnapshotWriter(output_path) as writer:
+            for users, errors in _map(check_chunk, read_chunks(input_path, fmt, chunk_size), workers, engine, as_of):
+                # users that do not fit in the snapshot columns are counted as invalid
+                report(len(users) + errors, errors + writer.write(users))
+    else:
+        writer = _Writer(output_path, output_fmt)
+        try:
+            if fmt == "snapshot":
+                rows = snapshot_rows(input_path)
+                slices = ((input_path, first, min(first + chunk_size, rows)) for first in range(0, rows, chunk_size))
+                for results in _map(score_snapshot, slices, workers, engine, as_of):
+                    writer.write(results)
+                    report(len(results), 0)
+            else:
+                for results in _map(score_chunk, read_chunks(input_path, fmt, chunk_size), workers, engine, as_of):
+                    writer.write(results)
+                    report(len(results), sum(1 for result in results if result[2] is not None))
+        finally:
+            writer.close()
+
+    stats["seconds"] = time.monotonic() - start
+    if progress is not None:
+        progress.write("\n")
+    return stats
+
+
+def aggregate(input_path: str, output_path: str, workers: int = 1, chunk_size: int = 10000,
+              group_by: str = None, engine: str = RISK_ENGINE, progress=None,
+              as_of: datetime.date = None) -> Dict[str, float]:
+    """
+    Counts the plans of each line of insurance and the histogram of their scores for the users of a file,
+    optionally by age band or marital status (see PortfolioStats), and writes the report to a JSON file.
+    The users are scored with the engine in a single pass and only counted, no result is kept.
+    Args:
+        input_path: CSV, NDJSON, Parquet or snapshot file of users
+        output_path: JSON file of the report
+        workers: number of processes. With 1 the users are scored in this process
+        chunk_size: number of users sent at once to a process
+        group_by: "age_band" or "marital_status", None for a single group
+        engine: scoring engine (see engines.py), the same counts as the results of run
+        progress: file the progress is reported to, None to disable it
+        as_of: date the users are scored on, None for the current date
+    Returns:
+        the number of users, of invalid users and the seconds taken
+    """
+    fmt = file_format(input_path)
+    if os.path.splitext(output_path)[1].lower() != ".json":
+        raise ValueError('Invalid output file: the report is a JSON file')
+    if workers < 1:
+        raise ValueError('Invalid number of workers')
+    if chunk_size < 1:
+        raise ValueError('Invalid chunk size')
+    if engine not in ENGINES:
+        raise ValueError(f'Invalid risk engine {engine}')
+    if as_of is not None and engine == "shared":
+        raise ValueError('The shared engine can not score as of another date')
+    stats = PortfolioStats(group_by)
+
+    start = time.monotonic()
+    if fmt == "snapshot":
+        rows = snapshot_rows(input_path)
+        tasks = ((input_path, first, min(first + chunk_size, rows), group_by) for first in range(0, rows, chunk_size))
+        function = aggregate_snapshot
+    else:
+        tasks = ((chunk, group_by) for chunk in read_chunks(input_path, fmt, chunk_size))
+        function = aggregate_chunk
+    for chunk_stats in _map(function, tasks, workers, engine, as_of):
+        stats.merge(chunk_stats)
+        if progress is not None:
+            elapsed = time.monotonic() - start
+            progress.write(f"\raggregated {stats.users + stats.errors} users ({stats.errors} invalid), "
+                           f"{(stats.users + stats.errors) / elapsed if elapsed else 0:.0f} users/s")
+            progress.flush()
+
+    with open(output_path, "w") as f:
+        json.dump(stats.to_dict(), f, indent=2)
+        f.write("\n")
+    if progress is not None:
+        progress.write("\n")
+    return {"users": stats.users + stats.errors, "errors": stats.errors, "seconds": time.monotonic() - start}
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m service.batch", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", help="CSV, NDJSON (.ndjson, .jsonl), Parquet or snapshot (.rsk) file of users")
+    parser.add_argument("output", help="file of the results, of the same format of the input (any format for "
+                                       "snapshots), or a snapshot file to export the valid users to")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of processes")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="number of users sent at once to a process")
+    parser.add_argument("--engine", default=RISK_ENGINE, choices=ENGINES, help="scoring engine")
+    parser.add_argument("--as-of", type=datetime.date.fromisoformat, metavar="YYYY-MM-DD",
+                        help="score the users on this date instead of the current one")
+    parser.add_argument("--aggregate", choices=("all",) + GROUPINGS, metavar="GROUP",
+                        help="write the counts of plans and scores of each line of insurance to a JSON file instead, "
+                             "for all the users or by age_band or marital_status")
+    parser.add_argument("--quiet", action="store_true", help="do not report the progress")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.aggregate is not None:
+            stats = aggregate(args.input, args.output, args.workers, args.chunk_size,
+                              None if args.aggregate == "all" else args.aggregate, args.engine,
+                              None if args.quiet else sys.stderr, args.as_of)
+        else:
+            stats = run(args.input, args.output, args.workers, args.chunk_size, args.engine,
+                        None if args.quiet else sys.stderr, args.as_of)
+    except (OSError, ValueError) as e:
+        parser.exit(1, f"{parser.prog}: error: {e}\n")
+    if not args.quiet:
+        sys.stderr.write(f"{stats['users']} users ({stats['errors']} invalid) in {stats['seconds']:.2f}s, "
+                         f"{stats['users'] / stats['seconds'] if stats['seconds'] else 0:.0f} users/s\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import datetime
+import time
+
+
+class Clock:
+    """
+    The date the rules are applied on (the vehicle rule depends on the current year).
+
+    The year of the system clock is cached and only calculated again when the calendar year changes,
+    so reading it costs a time.time() call instead of building a datetime on every evaluation.
+    With an as-of date the clock is fixed, so batch runs and historical rescoring are reproducible.
+
+    ...
+
+    Attributes
+    ----------
+    as_of : datetime.date, optional
+        fixed date of the clock. When None, the clock follows the system clock
+
+    Methods
+    -------
+    today()
+        Returns the current date of the clock
+
+    Properties
+    ----------
+    year : int
+        current year of the clock
+    as_of : datetime.date
+        fixed date of the clock, None if it follows the system clock
+    """
+
+    def __init__(self, as_of: datetime.date = None) -> None:
+        self._as_of = as_of
+        # timestamps of the first second of the cached year and of the next one
+        if as_of is None:
+            self._year = None
+            self._starts = self._expires = 0.0
+        else:
+            self._year = as_of.year
+            self._starts, self._expires = float("-inf"), float("inf")
+
+    @property
+    def as_of(self) -> datetime.date:
+        return self._as_of
+
+    @property
+    def year(self) -> int:
+        now = time.time()
+        # also refreshed when the system clock is set back
+        if not self._starts <= now < self._expires:
+            self._refresh(now)
+        return self._year
+
+    def today(self) -> datetime.date:
+        if self._as_of is not None:
+            return self._as_of
+        return datetime.date.today()
+
+    def _refresh(self, now: float) -> None:
+        year = datetime.datetime.fromtimestamp(now).year
+        self._year = year
+        self._starts = datetime.datetime(year, 1, 1).timestamp()
+        self._expires = datetime.datetime(year + 1, 1, 1).timestamp()
+
+
+# clock of the engines built without one
+SYSTEM_CLOCK = Clock()
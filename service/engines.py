@@ -0,0 +1,102 @@
+import datetime
+import functools
+import os
+
+# names of the scoring engines, see build_engine
+ENGINES = ("rules", "table", "ruleset", "shared")
+# scoring engine used by the API, see build_engine
+RISK_ENGINE = os.environ.get("RISK_ENGINE", "rules")
+# rule set file used by the "ruleset" engine, the default one reproduces the Rules class
+RISK_RULE_SET = os.environ.get("RISK_RULE_SET")
+# seconds between checks for changes of the rule set file (0 disables reloading)
+RISK_RULE_SET_RELOAD_INTERVAL = float(os.environ.get("RISK_RULE_SET_RELOAD_INTERVAL", "1"))
+# file of the table shared by all the workers of the host, used by the "shared" engine
+RISK_SHARED_TABLE = os.environ.get("RISK_SHARED_TABLE")
+# maximum number of risk profiles kept by the cache in front of the engine (0 disables the cache)
+RISK_CACHE_SIZE = int(os.environ.get("RISK_CACHE_SIZE", "0"))
+# seconds a cached risk profile is kept (0 keeps them until they are evicted or invalidated)
+RISK_CACHE_TTL = float(os.environ.get("RISK_CACHE_TTL", "0"))
+# record the latency and firing counts of each rule (see RuleMetrics), exposed in /metrics/rules
+RISK_RULE_METRICS = os.environ.get("RISK_RULE_METRICS", "0") == "1"
+# processes of the pool each worker scores the large batches of /api/risk/batch with (0 scores them inline)
+RISK_BATCH_WORKERS = int(os.environ.get("RISK_BATCH_WORKERS", "2"))
+# batches of up to this number of users are scored inline, in the event loop
+RISK_BATCH_INLINE_LIMIT = int(os.environ.get("RISK_BATCH_INLINE_LIMIT", "100"))
+# number of users of each chunk of a large batch sent to the pool
+RISK_BATCH_CHUNK_SIZE = int(os.environ.get("RISK_BATCH_CHUNK_SIZE", "1000"))
+# maximum number of chunks sent to the pool at once (0: twice the number of processes)
+RISK_BATCH_CONCURRENCY = int(os.environ.get("RISK_BATCH_CONCURRENCY", "0"))
+# number of chunks waiting or running in a worker from which new large batches are rejected with 429
+RISK_BATCH_MAX_PENDING = int(os.environ.get("RISK_BATCH_MAX_PENDING", "64"))
+# maximum number of Idempotency-Key responses kept by each worker (0 ignores the header)
+RISK_IDEMPOTENCY_SIZE = int(os.environ.get("RISK_IDEMPOTENCY_SIZE", "10000"))
+# seconds the response of an Idempotency-Key is replayed (0 keeps them until they are evicted)
+RISK_IDEMPOTENCY_TTL = float(os.environ.get("RISK_IDEMPOTENCY_TTL", "86400"))
+# OpenAPI schema written by the build step (python staticResponse.py <file>), generated on its first request if missing
+RISK_OPENAPI_FILE = os.environ.get("RISK_OPENAPI_FILE")
+# import the app in the gunicorn master and fork the workers from it (see gunicorn_conf.py)
+RISK_PRELOAD = os.environ.get("RISK_PRELOAD", "0") == "1"
+# directory where each worker writes its request metrics, merged by /metrics (None: only the answering worker)
+RISK_METRICS_DIR = os.environ.get("RISK_METRICS_DIR")
+
+
+def build_engine(name: str = RISK_ENGINE, cache_size: int = RISK_CACHE_SIZE, cache_ttl: float = RISK_CACHE_TTL,
+                 clock=None):
+    """
+    Builds the scoring engine used by RiskProfile and RiskProfileBatch.
+    Every engine has a calculate(user) method returning a RiskModel and a plans(user) method
+    returning the plans (auto, disability, home, life) as strings.
+    Args:
+        name (str): "rules" applies the Rules class on every request (returns None)
+                    "table" precomputes the risk profile of every class of users (RiskTable)
+                    "ruleset" compiles the rule set file in RISK_RULE_SET and reloads it when it changes
+                    (RuleSetReloader)
+                    "shared" maps the table of risk profiles shared by all the workers (SharedRiskTable)
+        cache_size (int): when greater than 0, the engine is wrapped by a RiskCache of this size
+        cache_ttl (float): seconds a cached risk profile is kept (0 never expires)
+        clock (Clock): the date the rules are applied on (see clock.py). By default, the system clock.
+                       The "rules" engine (None) can not keep it, it is passed to the Rules class instead
+    Returns:
+        the scoring engine
+    """
+    engine = _build_engine(name, clock)
+    if cache_size > 0:
+        from riskCache import RiskCache
+        return RiskCache(engine, cache_size, cache_ttl, clock)
+    return engine
+
+
+@functools.lru_cache(maxsize=16)
+def build_engine_as_of(name: str, as_of: datetime.date):
+    """
+    Builds the scoring engine of the API for an as-of date, so the requests of a past (or future) date are scored
+    by the same kind of engine and rule set as the other ones. The engines of the last dates are kept.
+    Args:
+        name (str): the name of the engine (see build_engine)
+        as_of (datetime.date): the date the rules are applied on
+    Returns:
+        the scoring engine and its clock, which the Rules class is applied with when the engine is None
+    Raises:
+        ValueError: the "shared" engine, the table of the workers is always the one of the current year
+    """
+    if name == "shared":
+        raise ValueError('The shared engine can not score as of another date')
+    from clock import Clock
+    clock = Clock(as_of)
+    return build_engine(name, clock=clock), clock
+
+
+def _build_engine(name: str, clock=None):
+    if name == "rules":
+        return None
+    if name == "table":
+        from riskTable import RiskTable
+        return RiskTable(clock)
+    if name == "ruleset":
+        from ruleSet import DEFAULT_RULE_SET
+        from ruleSetReloader import RuleSetReloader
+        return RuleSetReloader(RISK_RULE_SET or DEFAULT_RULE_SET, RISK_RULE_SET_RELOAD_INTERVAL, clock)
+    if name == "shared":
+        from sharedRiskTable import SharedRiskTable, DEFAULT_PATH
+        return SharedRiskTable(RISK_SHARED_TABLE or DEFAULT_PATH, clock)
+    raise ValueError(f'Invalid risk engine {name}')
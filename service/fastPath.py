@@ -0,0 +1,248 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+import utils as utils
+from rules import Rules
+from userRecord import new_score
+from clock import Clock
+
+try:
+    import orjson
+
+    loads = orjson.loads
+    dumps = orjson.dumps
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+    loads = json.loads
+
+    def dumps(value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode()
+
+MARITAL_STATUSES = ("single", "married")
+OWNERSHIP_STATUSES = ("owned", "mortgaged")
+
+
+def _missing(loc: List) -> Dict:
+    return {"loc": loc, "msg": "field required", "type": "value_error.missing"}
+
+
+def _none(loc: List) -> Dict:
+    return {"loc": loc, "msg": "none is not an allowed value", "type": "type_error.none.not_allowed"}
+
+
+def _not_dict(loc: List) -> Dict:
+    return {"loc": loc, "msg": "value is not a valid dict", "type": "type_error.dict"}
+
+
+def _dict(value: Any) -> Optional[Dict]:
+    # same coercion of pydantic's dict fields
+    if isinstance(value, dict):
+        return value
+    try:
+        return dict(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _value_error(loc: List, msg: str) -> Dict:
+    return {"loc": loc, "msg": msg, "type": "value_error"}
+
+
+def _enum(loc: List, permitted: Tuple[str, ...]) -> Dict:
+    return {
+        "loc": loc,
+        "msg": "value is not a valid enumeration member; permitted: " + ", ".join(f"'{p}'" for p in permitted),
+        "type": "type_error.enum",
+        "ctx": {"enum_values": list(permitted)}
+    }
+
+
+def _int(value: Any, loc: List, errors: List[Dict]) -> Optional[int]:
+    # same coercion of pydantic's int fields
+    if value.__class__ is int:
+        return value
+    if value is None:
+        errors.append(_none(loc))
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        errors.append({"loc": loc, "msg": "value is not a valid integer", "type": "type_error.integer"})
+        return None
+
+
+def _non_negative_int(data: Dict, loc: List, field: str, message: str, errors: List[Dict]) -> Optional[int]:
+    if field not in data:
+        errors.append(_missing([*loc, field]))
+        return None
+    value = _int(data[field], [*loc, field], errors)
+    if value is not None and value < 0:
+        errors.append(_value_error([*loc, field], message))
+        return None
+    return value
+
+
+def check_user(data: Any, loc: Tuple = ("body",)) -> Tuple[Optional[Dict], List[Dict]]:
+    """
+    Hand-written equivalent of UserModel (and so of the Validator class) for a decoded JSON body.
+    The errors have the same format and messages of the ones returned by FastAPI.
+    Args:
+        data: the decoded JSON body
+        loc: prefix of the location of the errors
+    Returns:
+        the user as a dictionary (None if it is invalid) and the list of errors
+    """
+    if data is None:
+        return None, [_missing([*loc])]
+    if not isinstance(data, dict):
+        return None, [_not_dict([*loc])]
+
+    errors: List[Dict] = []
+    age = _non_negative_int(data, loc, "age", "Invalid age", errors)
+    dependents = _non_negative_int(data, loc, "dependents", "Invalid number of dependents", errors)
+
+    house = data.get("house")
+    if house is not None:
+        house = _dict(house)
+        if house is None:
+            errors.append(_not_dict([*loc, "house"]))
+        elif "ownership_status" not in house:
+            errors.append(_missing([*loc, "house", "ownership_status"]))
+        elif house["ownership_status"] is None:
+            errors.append(_none([*loc, "house", "ownership_status"]))
+        elif house["ownership_status"] not in OWNERSHIP_STATUSES:
+            errors.append(_enum([*loc, "house", "ownership_status"], OWNERSHIP_STATUSES))
+        else:
+            house = {"ownership_status": house["ownership_status"]}
+
+    income = _non_negative_int(data, loc, "income", "Invalid income", errors)
+
+    if "marital_status" not in data:
+        errors.append(_missing([*loc, "marital_status"]))
+    elif data["marital_status"] is None:
+        errors.append(_none([*loc, "marital_status"]))
+    elif data["marital_status"] not in MARITAL_STATUSES:
+        errors.append(_enum([*loc, "marital_status"], MARITAL_STATUSES))
+
+    risk_questions = None
+    if "risk_questions" not in data:
+        errors.append(_missing([*loc, "risk_questions"]))
+    elif data["risk_questions"] is None:
+        errors.append(_none([*loc, "risk_questions"]))
+    elif not isinstance(data["risk_questions"], (list, tuple)):
+        errors.append({"loc": [*loc, "risk_questions"], "msg": "value is not a valid list", "type": "type_error.list"})
+    elif len(data["risk_questions"]) != 3:
+        too_few = len(data["risk_questions"]) < 3
+        errors.append({
+            "loc": [*loc, "risk_questions"],
+            "msg": f"ensure this value has at {'least' if too_few else 'most'} 3 items",
+            "type": f"value_error.list.{'min' if too_few else 'max'}_items",
+            "ctx": {"limit_value": 3}
+        })
+    else:
+        item_errors: List[Dict] = []
+        risk_questions = [_int(answer, [*loc, "risk_questions", i], item_errors)
+                          for i, answer in enumerate(data["risk_questions"])]
+        if item_errors:
+            errors.extend(item_errors)
+            risk_questions = None
+        else:
+            for answer in risk_questions:
+                if answer != 0 and answer != 1:
+                    errors.append(_value_error([*loc, "risk_questions"], "Invalid risk answer"))
+                    risk_questions = None
+                    break
+
+    vehicle = data.get("vehicle")
+    if vehicle is not None:
+        vehicle = _dict(vehicle)
+        if vehicle is None:
+            errors.append(_not_dict([*loc, "vehicle"]))
+        elif "year" not in vehicle:
+            errors.append(_missing([*loc, "vehicle", "year"]))
+        else:
+            year = _int(vehicle["year"], [*loc, "vehicle", "year"], errors)
+            if year is not None and year < 0:
+                errors.append(_value_error([*loc, "vehicle", "year"], "Invalid vehicle year"))
+            vehicle = {"year": year}
+
+    if errors:
+        return None, errors
+    return {
+        "age": age,
+        "dependents": dependents,
+        "house": house,
+        "income": income,
+        "marital_status": data["marital_status"],
+        "risk_questions": risk_questions,
+        "vehicle": vehicle
+    }, errors
+
+
+def decode(body: bytes, loc: Tuple = ("body",)) -> Tuple[Any, List[Dict]]:
+    """
+    Decodes a JSON body
+    Args:
+        body: the JSON document
+        loc: prefix of the location of the errors
+    Returns:
+        the decoded value and the list of errors (in the format returned by FastAPI)
+    Raises:
+        ValueError if the body is not valid UTF-8
+    """
+    if not body:
+        return None, []
+    try:
+        return loads(body), []
+    except ValueError:
+        pass
+    # the error details of the standard library, as reported by FastAPI
+    try:
+        return json.loads(body), []
+    except json.JSONDecodeError as e:
+        return None, [{
+            "loc": [*loc, e.pos],
+            "msg": str(e),
+            "type": "value_error.jsondecode",
+            "ctx": {"msg": e.msg, "doc": e.doc, "pos": e.pos, "lineno": e.lineno, "colno": e.colno}
+        }]
+
+
+def plans(user: Dict, engine=None, clock: Clock = None) -> Tuple[str, str, str, str]:
+    """
+    Calculates the plans (auto, disability, home, life) of a valid user
+    Args:
+        user: the user returned by check_user
+        engine: scoring engine (see engines.py). When None, the Rules class is applied
+        clock: the date the Rules class is applied on (see clock.py). By default, the system clock
+    """
+    if engine is not None:
+        return engine.plans(user)
+    rules = Rules(user=user, score=new_score(), clock=clock)
+    rules.apply_all_rules()
+    return utils.process_score(rules.scoreArray)
+
+
+def calculate(body: bytes, engine=None, metrics=None) -> Tuple[int, bytes]:
+    """
+    Calculates the risk profile of a raw JSON body without building Pydantic objects
+    Args:
+        body: the request body
+        engine: scoring engine (see engines.py). When None, the Rules class is applied
+        metrics: RequestMetrics the validation errors and the plans are counted in, optional
+    Returns:
+        the status code and the JSON response body, the same ones returned by /api/risk/
+    """
+    try:
+        data, errors = decode(body)
+    except ValueError:
+        return 400, dumps({"detail": "There was an error parsing the body"})
+    if not errors:
+        user, errors = check_user(data)
+    if errors:
+        if metrics is not None:
+            metrics.observe_errors(errors)
+        return 422, dumps({"detail": errors})
+    result = plans(user, engine)
+    if metrics is not None:
+        metrics.observe_plans(result)
+    return 200, utils.encode_plans(result)
@@ -0,0 +1,36 @@
+import gc
+import glob
+import os
+import sys
+
+# gunicorn loads this file before changing to the app directory
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from engines import RISK_PRELOAD
+
+# import the app once in the master and fork the workers from it (also enabled by gunicorn --preload)
+preload_app = RISK_PRELOAD
+
+
+def on_starting(server):
+    from engines import RISK_ENGINE, RISK_METRICS_DIR, RISK_SHARED_TABLE
+    if RISK_METRICS_DIR:
+        # remove the request metrics of the workers of a previous run
+        for path in glob.glob(os.path.join(RISK_METRICS_DIR, "metrics-*.json")):
+            os.unlink(path)
+    # publish the shared risk table once per host, before the workers are started
+    if RISK_ENGINE == "shared":
+        from sharedRiskTable import SharedRiskTable, DEFAULT_PATH
+        SharedRiskTable.publish(RISK_SHARED_TABLE or DEFAULT_PATH)
+
+
+def when_ready(server):
+    if not server.cfg.preload_app:
+        return
+    # the app was imported by the master: the OpenAPI schema is encoded once for all the workers,
+    # instead of on the first request of /docs of each one
+    import main
+    main.openapi_response.body
+    # the objects of the master are moved out of the generations of the garbage collector, so the
+    # collections of the workers do not write to their pages and they stay shared (copy-on-write)
+    gc.freeze()
@@ -1,9 +1,28 @@
+import datetime
+from typing import Any, List, Literal, Tuple, Union
+
 import fastapi
-import uvicorn
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import PlainTextResponse
+from starlette.routing import Route
 
 from models.user_model import UserModel
-from models.risk_model import RiskModel
+from models.risk_model import RiskModel, BatchRiskItem, ExplainedRiskModel, ScoredRiskModel
 from riskProfile import RiskProfile
+from clock import Clock
+from engines import RISK_ENGINE, RISK_METRICS_DIR, RISK_RULE_METRICS, build_engine, build_engine_as_of, \
+    RISK_BATCH_WORKERS, RISK_BATCH_INLINE_LIMIT, RISK_BATCH_CHUNK_SIZE, RISK_BATCH_CONCURRENCY, RISK_BATCH_MAX_PENDING, \
+    RISK_IDEMPOTENCY_SIZE, RISK_IDEMPOTENCY_TTL, RISK_OPENAPI_FILE
+from requestDedup import IdempotencyConflict, IdempotencyStore, request_key
+from scheduler import Overloaded, Scheduler
+from ruleMetrics import RuleMetrics
+from requestMetrics import MetricsMiddleware, RequestMetrics
+import fastPath
+import utils as utils
+from ndjsonStream import NDJSONStreamResponse, aggregate_stream, score_stream
+from portfolioStats import PortfolioStats
+from staticResponse import StaticResponse, encode_json, openapi_schema
 
 app = fastapi.FastAPI(
     title="Risk Profile API",
@@ -11,26 +30,258 @@ app = fastapi.FastAPI(
     version="1.0"
 )
 
+engine_name = RISK_ENGINE
+engine = build_engine(engine_name)
+
+rule_metrics = RuleMetrics()
+if RISK_RULE_METRICS:
+    rule_metrics.enable()
+
+request_metrics = RequestMetrics(RISK_METRICS_DIR)
+app.add_middleware(MetricsMiddleware, metrics=request_metrics)
+
+scheduler = Scheduler(RISK_BATCH_WORKERS, inline_limit=RISK_BATCH_INLINE_LIMIT, chunk_size=RISK_BATCH_CHUNK_SIZE,
+                      concurrency=RISK_BATCH_CONCURRENCY or None, max_pending=RISK_BATCH_MAX_PENDING)
+
+
+idempotency_store = IdempotencyStore(RISK_IDEMPOTENCY_SIZE, RISK_IDEMPOTENCY_TTL) if RISK_IDEMPOTENCY_SIZE > 0 else None
+
+
+@app.on_event("shutdown")
+def close_scheduler():
+    scheduler.close()
+
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: fastapi.Request, exc: RequestValidationError):
+    # count the validation failures of /api/risk/ before returning the usual 422 response
+    request_metrics.observe_errors(exc.errors())
+    return await request_validation_exception_handler(request, exc)
+
+
+def set_version_header(response: fastapi.Response, used_engine=None) -> None:
+    # engines with hot-reloadable rule sets tell which version calculated the response
+    version = getattr(engine if used_engine is None else used_engine, "version", None)
+    if version is not None:
+        response.headers["X-Rule-Set-Version"] = version
+
+
+def engine_as_of(as_of: datetime.date = None) -> Tuple[Any, Clock]:
+    """
+    Returns the scoring engine of a request and the clock of the Rules class: the engine of the API,
+    or the same kind of engine built for the as-of date (400 if the engine can not score another date)
+    """
+    if as_of is None:
+        return engine, None
+    try:
+        return build_engine_as_of(engine_name, as_of)
+    except ValueError as e:
+        raise fastapi.HTTPException(status_code=400, detail=str(e))
+
+
+# encoded once, the health checks of the load balancer call it all the time
+INDEX = encode_json({"message": "Hello World",
+                     "documentation": "Call /docs to see all the documentation"})
+
 
 @app.get("/")
-def index():
+async def index():
     """
     Index page to test the API services
     """
-    return {"message": "Hello World",
-            "documentation": "Call /docs to see all the documentation"}
+    return fastapi.Response(INDEX, media_type="application/json")
+
 
+# the OpenAPI schema is encoded once (or read from the file of the build step) and served with an ETag.
+# Inserted before the route of FastAPI, which encodes it again on every request
+openapi_response = StaticResponse(build=lambda: openapi_schema(app, RISK_OPENAPI_FILE))
+app.router.routes.insert(0, Route(app.openapi_url, openapi_response, methods=["GET", "HEAD"], include_in_schema=False))
 
-@app.post('/api/risk/', response_model=RiskModel)
-async def calculate_user_risk(user: UserModel):
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Requests, latency histograms, validation failures and plans of all the workers, in the Prometheus text format
+    """
+    return PlainTextResponse(request_metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/metrics/scheduler")
+def scheduler_metrics():
+    """
+    Pending chunks of large batches and counters of the batches scored inline, offloaded and rejected
+    """
+    return scheduler.stats
+
+
+@app.get("/metrics/dedup")
+def dedup_metrics():
+    """
+    Counters of the Idempotency-Key store of /api/risk/ (hits, misses, conflicts, etc.)
+    """
+    return {
+        "idempotency": None if idempotency_store is None else idempotency_store.stats
+    }
+
+
+@app.get("/metrics/cache")
+def cache_metrics():
+    """
+    Counters of the risk profile cache (hits, misses, evictions, expirations and invalidations)
+    """
+    if not hasattr(engine, "stats"):
+        raise fastapi.HTTPException(status_code=404, detail="Cache is disabled")
+    return engine.stats
+
+
+@app.get("/metrics/rules")
+def rule_metrics_stats():
+    """
+    Calls, errors, firing counts and latency histograms of the validation, each rule and the final processing
+    """
+    if not rule_metrics.enabled:
+        raise fastapi.HTTPException(status_code=404, detail="Rule metrics are disabled")
+    return rule_metrics.stats
+
+
+# the responses are returned as pre-encoded JSON, the response model only documents them
+@app.post('/api/risk/', response_model=Union[RiskModel, ScoredRiskModel, ExplainedRiskModel])
+async def calculate_user_risk(user: UserModel, explain: bool = False, scores: bool = False,
+                              as_of: datetime.date = None, idempotency_key: str = fastapi.Header(None)):
     """
     This is the main API endpoint for calculating the user's risk profile.
+    A request with an Idempotency-Key header that was already answered gets the same response again
+    (with an Idempotent-Replayed header).
     :param user: UserModel object
-    :return: RiskModel object
+    :param explain: also return the changes each rule made to the score and the score before processing
+    :param scores: also return the score of each line of insurance before processing (null if ineligible)
+    :param as_of: date the risk profile is calculated on (YYYY-MM-DD), the current date by default
+    :param idempotency_key: key of the request, reusing it with another request is an error (422)
+    :return: RiskModel object, ScoredRiskModel object with the scores, ExplainedRiskModel object when explained
+    """
+    idempotent = idempotency_key is not None and idempotency_store is not None
+    if idempotent:
+        key = request_key(user, explain, scores, as_of)
+        try:
+            stored = idempotency_store.get(idempotency_key, key)
+        except IdempotencyConflict as e:
+            raise fastapi.HTTPException(status_code=422, detail=str(e))
+        if stored is not None:
+            body, version = stored
+            replayed = fastapi.Response(body, media_type="application/json", headers={"Idempotent-Replayed": "true"})
+            if version is not None:
+                replayed.headers["X-Rule-Set-Version"] = version
+            return replayed
+
+    used_engine, clock = engine_as_of(as_of)
+    plans, body = score_user(user, explain, scores, used_engine, clock)
+    request_metrics.observe_plans(plans)
+    if idempotent:
+        idempotency_store.put(idempotency_key, key, (body, getattr(used_engine, "version", None)))
+    response = fastapi.Response(body, media_type="application/json")
+    set_version_header(response, used_engine)
+    return response
+
+
+def score_user(user: UserModel, explain: bool, scores: bool, used_engine=None,
+               clock: Clock = None) -> Tuple[Tuple[str, str, str, str], bytes]:
+    """
+    Calculates the plans of a request of /api/risk/ and its response body, with the engine of the request
+    """
+    if not explain and not scores:
+        # the body of each combination of plans is encoded once, no RiskModel is built
+        plans = fastPath.plans(user, used_engine, clock)
+        return plans, utils.encode_plans(plans)
+
+    risk_profile = RiskProfile(user, used_engine, explain=explain, scores=scores, clock=clock)
+    result = risk_profile.calculatedRiskProfile
+    content = result.dict()
+    if scores:
+        content["scores"] = risk_profile.scores
+    if explain:
+        content["explanation"] = risk_profile.explanation
+    return (result.auto.value, result.disability.value, result.home.value, result.life.value), encode_json(content)
+
+
+async def calculate_user_risk_fast(request: fastapi.Request):
+    """
+    High-throughput version of /api/risk/, receiving the same UserModel and returning the same RiskModel.
+    The raw body is decoded and validated without building Pydantic objects, and the response is written as bytes.
+    """
+    status_code, content = fastPath.calculate(await request.body(), engine, request_metrics)
+    response = fastapi.Response(content, status_code=status_code, media_type="application/json")
+    set_version_header(response)
+    return response
+
+
+# plain Starlette route, so FastAPI does not parse the request or serialize the response
+app.add_route('/api/risk/fast', calculate_user_risk_fast, methods=["POST"], include_in_schema=False)
+
+
+async def calculate_users_risk_stream(request: fastapi.Request):
+    """
+    Streaming version of /api/risk/batch, receiving a NDJSON document of UserModel objects (one per line)
+    and returning a NDJSON document with one BatchRiskItem per user, written as the users are received.
+    Errors include the line number of the user.
+    """
+    response = NDJSONStreamResponse(score_stream(request.stream(), engine, metrics=request_metrics))
+    set_version_header(response)
+    return response
+
+
+app.add_route('/api/risk/stream', calculate_users_risk_stream, methods=["POST"], include_in_schema=False)
+
+
+@app.post('/api/risk/aggregate')
+async def aggregate_users_risk(request: fastapi.Request, response: fastapi.Response,
+                               group_by: Literal["age_band", "marital_status"] = None, as_of: datetime.date = None):
+    """
+    Portfolio statistics of a NDJSON document of UserModel objects (one per line), counted as it is received:
+    the number of users of each plan and the histogram of the scores of each line of insurance, optionally by
+    age band or marital status. The users are scored by the scoring engine, as in the other endpoints, and no
+    individual risk profile is returned. Invalid users are only counted.
+    :param group_by: cut the users by "age_band" or "marital_status", a single group "all" by default
+    :param as_of: date the risk profiles are calculated on (YYYY-MM-DD), the current date by default
+    :return: the grouping, the number of users and of invalid ones, and the counts of each group
+    """
+    used_engine, clock = engine_as_of(as_of)
+    stats = PortfolioStats(group_by, used_engine, clock)
+    await aggregate_stream(request.stream(), stats)
+    set_version_header(response, used_engine)
+    return stats.to_dict()
+
+
+@app.post('/api/risk/batch', response_model=List[BatchRiskItem], response_model_exclude_none=True)
+async def calculate_users_risk(response: fastapi.Response,
+                               users: List[Any] = fastapi.Body(..., example=[UserModel.Config.schema_extra["example"]]),
+                               as_of: datetime.date = None):
+    """
+    Batch API endpoint for calculating the risk profile of many users in a single request.
+    The results are returned in the same order as the users and errors are reported per item.
+    :param users: list of UserModel objects
+    :param as_of: date the risk profiles are calculated on (YYYY-MM-DD), the current date by default
+    :return: list of BatchRiskItem objects
     """
-    risk_profile = RiskProfile(user)
-    return risk_profile.calculatedRiskProfile
+    used_engine, clock = engine_as_of(as_of)
+    try:
+        # large batches are scored by a pool of processes, without blocking the other requests
+        items, version = await scheduler.score(users, used_engine, clock)
+    except Overloaded as e:
+        raise fastapi.HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    # the versions that scored the batch, the processes of the pool reload the rule set on their own
+    if version is not None:
+        response.headers["X-Rule-Set-Version"] = version
+    for item in items:
+        if item.result is not None:
+            result = item.result
+            request_metrics.observe_plans((result.auto.value, result.disability.value,
+                                           result.home.value, result.life.value))
+        else:
+            request_metrics.observe_errors(item.detail)
+    return items
 
 
 if __name__ == "__main__":
+    # only needed to run the app directly, gunicorn (or a serverless runtime) imports the app without it
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
 
 class Results(str, Enum):
@@ -26,4 +27,79 @@ class RiskModel(BaseModel):
             "home": "economic",
             "life": "regular"
             }
-        }
\ No newline at end of file
+        }
+
+
+class BatchRiskItem(BaseModel):
+    result: Optional[RiskModel] = None
+    detail: Optional[List[Dict[str, Any]]] = None
+    def __getitem__(self, item):
+        return getattr(self, item)
+
+    class Config:
+        schema_extra = {
+            "example": {
+            "result": {
+                "auto": "regular",
+                "disability": "ineligible",
+                "home": "economic",
+                "life": "regular"
+                }
+            }
+        }
+
+
+class RuleStep(BaseModel):
+    rule: str
+    delta: Dict[str, int]
+    ineligible: List[str]
+
+
+class RiskScores(BaseModel):
+    auto: Optional[int]
+    disability: Optional[int]
+    home: Optional[int]
+    life: Optional[int]
+
+
+class RiskExplanation(BaseModel):
+    steps: List[RuleStep]
+    score: RiskScores
+
+
+class ScoredRiskModel(RiskModel):
+    scores: RiskScores
+
+    class Config:
+        schema_extra = {
+            "example": {
+            "auto": "regular",
+            "disability": "ineligible",
+            "home": "economic",
+            "life": "regular",
+            "scores": {"auto": 1, "disability": None, "home": 0, "life": 2}
+            }
+        }
+
+
+class ExplainedRiskModel(RiskModel):
+    explanation: RiskExplanation
+
+    class Config:
+        schema_extra = {
+            "example": {
+            "auto": "regular",
+            "disability": "ineligible",
+            "home": "economic",
+            "life": "regular",
+            "explanation": {
+                "steps": [
+                    {"rule": "rule_user_does_not_have_income_vehicle_or_house", "delta": {},
+                     "ineligible": ["disability"]},
+                    {"rule": "rule_risk_questions", "delta": {"auto": 1, "home": 1, "life": 1},
+                     "ineligible": []}
+                ],
+                "score": {"auto": 1, "disability": None, "home": 0, "life": 2}
+                }
+            }
+        }
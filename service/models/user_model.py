@@ -1,6 +1,6 @@
 from enum import Enum
 from typing import Optional
-from pydantic import BaseModel, conlist
+from pydantic import BaseModel, conlist, validator
 
 class MaritalStatus(str, Enum):
     single = "single"
@@ -24,6 +24,12 @@ class Vehicle(BaseModel):
     def __getitem__(self, item):
         return getattr(self, item)
 
+    @validator('year')
+    def validate_year(cls, year):
+        if year < 0:
+            raise ValueError('Invalid vehicle year')
+        return year
+
 class UserModel(BaseModel):
 
     age: int
@@ -36,6 +42,32 @@ class UserModel(BaseModel):
     def __getitem__(self, item):
         return getattr(self, item)
 
+    # same rules and messages of the Validator class, so a UserModel can be trusted without validating it again
+    @validator('age')
+    def validate_age(cls, age):
+        if age < 0:
+            raise ValueError('Invalid age')
+        return age
+
+    @validator('dependents')
+    def validate_dependents(cls, dependents):
+        if dependents < 0:
+            raise ValueError('Invalid number of dependents')
+        return dependents
+
+    @validator('income')
+    def validate_income(cls, income):
+        if income < 0:
+            raise ValueError('Invalid income')
+        return income
+
+    @validator('risk_questions')
+    def validate_risk_questions(cls, risk_questions):
+        for answer in risk_questions:
+            if answer != 0 and answer != 1:
+                raise ValueError('Invalid risk answer')
+        return risk_questions
+
     class Config:
         schema_extra = {
             "example": {
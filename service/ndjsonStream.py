@@ -0,0 +1,180 @@
+from typing import AsyncIterable, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+import fastPath
+import utils as utils
+from portfolioStats import PortfolioStats
+
+# longest accepted line, a longer one is reported as an error and skipped
+MAX_LINE_BYTES = 64 * 1024
+
+
+class LineSplitter:
+    """
+    Splits chunks of a NDJSON document into lines.
+    Only the incomplete last line of a chunk is kept, and at most `max_line` bytes of it,
+    so the memory used does not depend on the size of the document.
+
+    ...
+
+    Attributes
+    ----------
+    max_line : int
+        longest accepted line, in bytes
+
+    Methods
+    -------
+    feed(chunk)
+        Returns the (number, line) of the lines completed by the chunk. The line is None if it is too long
+
+    close()
+        Returns the (number, line) of the last line, if the document does not end with a new line
+    """
+
+    def __init__(self, max_line: int = MAX_LINE_BYTES) -> None:
+        self._max_line = max_line
+        self._buffer = b""
+        self._too_long = False
+        self._number = 0
+
+    def feed(self, chunk: bytes) -> Iterator[Tuple[int, Optional[bytes]]]:
+        lines = chunk.split(b"\n")
+        for part in lines[:-1]:
+            yield self._line(part)
+        rest = lines[-1]
+        if not self._too_long:
+            self._buffer += rest
+            if len(self._buffer) > self._max_line:
+                self._buffer = b""
+                self._too_long = True
+
+    def close(self) -> Iterator[Tuple[int, Optional[bytes]]]:
+        if self._buffer or self._too_long:
+            yield self._line(b"")
+
+    def _line(self, part: bytes) -> Tuple[int, Optional[bytes]]:
+        self._number += 1
+        if self._too_long or len(self._buffer) + len(part) > self._max_line:
+            line = None
+        else:
+            line = self._buffer + part if self._buffer else part
+        self._buffer = b""
+        self._too_long = False
+        return self._number, line
+
+
+def check_line(line: Optional[bytes]) -> Tuple[Optional[Dict], List[Dict]]:
+    """
+    Decodes and validates a line of a NDJSON document
+    Args:
+        line: the JSON user, None if the line was too long
+    Returns:
+        the user as a dictionary (None if it is invalid) and the list of errors
+    """
+    if line is None:
+        return None, [{"loc": [], "msg": f"line longer than {MAX_LINE_BYTES} bytes",
+                       "type": "value_error.line_too_long"}]
+    try:
+        data, errors = fastPath.decode(line, ())
+    except ValueError:
+        return None, [{"loc": [], "msg": "line is not valid UTF-8", "type": "value_error.unicode"}]
+    if errors:
+        return None, errors
+    return fastPath.check_user(data, ())
+
+
+def score_line(number: int, line: Optional[bytes], engine=None, metrics=None) -> bytes:
+    """
+    Calculates the risk profile of a line of a NDJSON document
+    Args:
+        number: line number, starting from 1
+        line: the JSON user, None if the line was too long
+        engine: scoring engine (see engines.py). When None, the Rules class is applied
+        metrics: RequestMetrics the validation errors and the plans are counted in, optional
+    Returns:
+        the NDJSON result, {"result": RiskModel} or {"line": number, "detail": errors}
+    """
+    user, errors = check_line(line)
+    if errors:
+        if metrics is not None:
+            metrics.observe_errors(errors)
+        return fastPath.dumps({"line": number, "detail": errors}) + b"\n"
+    plans = fastPath.plans(user, engine)
+    if metrics is not None:
+        metrics.observe_plans(plans)
+    return b'{"result":' + utils.encode_plans(plans) + b'}\n'
+
+
+async def score_stream(chunks: AsyncIterable[bytes], engine=None, max_line: int = MAX_LINE_BYTES,
+                       metrics=None) -> AsyncIterator[bytes]:
+    """
+    Calculates the risk profiles of a NDJSON document of users, as it is received.
+    There is one result per non-empty line, in the same order, and the results of a chunk are
+    returned together. Empty lines are skipped but counted in the line numbers of the errors.
+    Args:
+        chunks: the document
+        engine: scoring engine (see engines.py). When None, the Rules class is applied
+        max_line: longest accepted line, in bytes
+        metrics: RequestMetrics the validation errors and the plans are counted in, optional
+    """
+    splitter = LineSplitter(max_line)
+    async for chunk in chunks:
+        results = [score_line(number, line, engine, metrics) for number, line in splitter.feed(chunk)
+                   if line is None or line.strip()]
+        if results:
+            yield b"".join(results)
+    results: List[bytes] = [score_line(number, line, engine, metrics) for number, line in splitter.close()
+                                if line is None or line.strip()]
+    if results:
+        yield b"".join(results)
+
+
+async def aggregate_stream(chunks: AsyncIterable[bytes], stats: PortfolioStats,
+                           max_line: int = MAX_LINE_BYTES) -> PortfolioStats:
+    """
+    Counts the risk profiles of a NDJSON document of users in the stats, as it is received.
+    Only one chunk of the document is kept at a time. Empty lines are skipped, invalid users are counted as errors.
+    Args:
+        chunks: the document
+        stats: PortfolioStats the users are counted in
+        max_line: longest accepted line, in bytes
+    Returns:
+        the stats
+    """
+    splitter = LineSplitter(max_line)
+
+    def count(lines: Iterator[Tuple[int, Optional[bytes]]]) -> None:
+        for _, line in lines:
+            if line is not None and not line.strip():
+                continue
+            user, errors = check_line(line)
+            if errors:
+                stats.add_error()
+            else:
+                stats.add(user)
+
+    async for chunk in chunks:
+        count(splitter.feed(chunk))
+    count(splitter.close())
+    return stats
+
+
+class NDJSONStreamResponse(StreamingResponse):
+    """
+    A StreamingResponse that can be sent while the request body is still being read.
+
+    StreamingResponse listens for the client disconnection by reading the request messages, which
+    would take them from the body iterator. Here the body iterator reads the request itself (and
+    raises ClientDisconnect when the client goes away), so the response only sends. The next chunk
+    of the request is only read after the results of the previous one are sent, so a slow client
+    slows down the reading and the memory used is bounded.
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,183 @@
+from typing import Any, Dict, List, Tuple
+import utils as utils
+from clock import Clock
+from rules import Rules
+from userRecord import ELIGIBILITY, LINES, UserRecord, new_score
+
+PLANS = ("ineligible", "economic", "regular", "responsible")
+_PLAN_INDEX = {plan: i for i, plan in enumerate(PLANS)}
+
+# the groups the users can be cut by, and the age bands of the rules (under 30, 30 to 40, 41 to 60, over 60)
+GROUPINGS = ("age_band", "marital_status")
+AGE_BANDS = ("under 30", "30-40", "41-60", "over 60")
+
+
+def age_band(age: int) -> str:
+    if age < 30:
+        return AGE_BANDS[0]
+    if age <= 40:
+        return AGE_BANDS[1]
+    if age <= 60:
+        return AGE_BANDS[2]
+    return AGE_BANDS[3]
+
+
+class _Group:
+    __slots__ = ("users", "plans", "scores")
+
+    def __init__(self) -> None:
+        self.users = 0
+        # count of each plan and of each score (eligible lines only), by line of insurance
+        self.plans = [[0] * len(PLANS) for _ in LINES]
+        self.scores: List[Dict[int, int]] = [{} for _ in LINES]
+
+    def merge(self, other: "_Group") -> None:
+        self.users += other.users
+        for line in range(len(LINES)):
+            counts = self.plans[line]
+            for i, count in enumerate(other.plans[line]):
+                counts[i] += count
+            scores = self.scores[line]
+            for score, count in other.scores[line].items():
+                scores[score] = scores.get(score, 0) + count
+
+    def to_dict(self) -> Dict:
+        return {
+            "users": self.users,
+            "plans": {line: dict(zip(PLANS, counts)) for line, counts in zip(LINES, self.plans)},
+            # JSON keys are strings, the scores are sorted
+            "scores": {line: {str(score): scores[score] for score in sorted(scores)}
+                       for line, scores in zip(LINES, self.scores)}
+        }
+
+
+class PortfolioStats:
+    """
+    Distributions of the risk profiles of a portfolio of users, optionally cut by age band or marital status:
+    the number of users of each plan and the histogram of the scores (before processing) of each line of insurance.
+
+    The users are scored one by one with the scoring engine (its score method, the same scores its plans are
+    processed from) and only counted, so no RiskModel is built and the memory used does not depend on the number
+    of users: each group keeps 16 plan counts and
+    a histogram of the scores of each line, which only has the few scores the rules can produce.
+    The stats of chunks of a portfolio (e.g. scored by different processes) are combined with merge.
+
+    ...
+
+    Attributes
+    ----------
+    group_by : str, optional
+        "age_band" or "marital_status". When None, every user is counted in the group "all"
+    engine : optional
+        scoring engine (see engines.py). When None, or for the engines without score (the tables, compiled from
+        the Rules class), the Rules class is applied
+    clock : Clock, optional
+        the date the Rules class is applied on (see clock.py). An engine keeps its own clock. By default,
+        the system clock
+
+    Methods
+    -------
+    add(user)
+        Scores a valid user (a dictionary returned by fastPath.check_user, a UserModel or a UserRecord)
+        and counts it
+
+    add_error()
+        Counts an invalid user
+
+    merge(other)
+        Adds the counts of other stats, of the same grouping
+
+    to_dict()
+        Returns the report: the grouping, the number of users and of invalid ones,
+        and the users, plans and score histogram of each line of every group
+
+    Properties
+    ----------
+    users : int
+        number of valid users counted
+    errors : int
+        number of invalid users
+    """
+
+    def __init__(self, group_by: str = None, engine=None, clock: Clock = None) -> None:
+        if group_by is not None and group_by not in GROUPINGS:
+            raise ValueError(f'Invalid grouping {group_by}')
+        self._group_by = group_by
+        self._score = getattr(engine, "score", None)
+        self._clock = clock
+        self._groups: Dict[str, _Group] = {}
+        self._users = 0
+        self._errors = 0
+
+    @property
+    def users(self) -> int:
+        return self._users
+
+    @property
+    def errors(self) -> int:
+        return self._errors
+
+    def add(self, user: Any) -> None:
+        if self._score is None:
+            rules = Rules(user=user, score=new_score(), clock=self._clock)
+            rules.apply_all_rules()
+            user = rules.user
+            score = rules.scoreArray
+        else:
+            # the engines read the record as a dictionary
+            user = UserRecord.from_user(user)
+            score = self._score(user)
+        group = self._group(user)
+        self._users += 1
+        group.users += 1
+
+        eligible = score[ELIGIBILITY]
+        plans = group.plans
+        scores = group.scores
+        for line in range(len(LINES)):
+            if eligible & (1 << line):
+                value = score[line]
+                plans[line][_PLAN_INDEX[utils.process(value)]] += 1
+                histogram = scores[line]
+                histogram[value] = histogram.get(value, 0) + 1
+            else:
+                plans[line][0] += 1
+
+    def add_error(self) -> None:
+        self._errors += 1
+
+    def merge(self, other: "PortfolioStats") -> None:
+        if other._group_by != self._group_by:
+            raise ValueError('Stats of different groupings can not be merged')
+        self._users += other._users
+        self._errors += other._errors
+        for name, group in other._groups.items():
+            mine = self._groups.get(name)
+            if mine is None:
+                mine = self._groups[name] = _Group()
+            mine.merge(group)
+
+    def to_dict(self) -> Dict:
+        return {
+            "group_by": self._group_by,
+            "users": self._users,
+            "errors": self._errors,
+            "groups": {name: self._groups[name].to_dict() for name in sorted(self._groups, key=self._order)}
+        }
+
+    def _group(self, user: UserRecord) -> _Group:
+        if self._group_by is None:
+            name = "all"
+        elif self._group_by == "age_band":
+            name = age_band(user.age)
+        else:
+            name = user.marital_status
+        group = self._groups.get(name)
+        if group is None:
+            group = self._groups[name] = _Group()
+        return group
+
+    @staticmethod
+    def _order(name: str) -> Tuple[int, str]:
+        # age bands from the youngest, the other groups alphabetically
+        return AGE_BANDS.index(name) if name in AGE_BANDS else -1, name
@@ -0,0 +1,115 @@
+import datetime
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+from models.user_model import UserModel
+
+
+def request_key(user: UserModel, explain: bool = False, scores: bool = False,
+                as_of: datetime.date = None) -> Tuple:
+    """
+    Canonical key of a request of /api/risk/: a flat tuple of the fields of the user (the enums by value)
+    and of the options of the request, cheap to build and to hash. Equal requests have equal keys.
+    """
+    house = user.house
+    vehicle = user.vehicle
+    return (
+        user.age,
+        user.dependents,
+        None if house is None else house.ownership_status.value,
+        user.income,
+        user.marital_status.value,
+        tuple(user.risk_questions),
+        None if vehicle is None else vehicle.year,
+        explain,
+        scores,
+        as_of
+    )
+
+
+class IdempotencyConflict(Exception):
+    """
+    Raised when an Idempotency-Key is used again with a different request
+    """
+
+
+class IdempotencyStore:
+    """
+    A bounded store of the responses of the requests with an Idempotency-Key header, local to the worker.
+
+    A request that repeats a key gets the response stored for it, without scoring the user again.
+    Each key remembers the canonical key of its request (see request_key), so reusing a key with another
+    request is an error instead of returning the response of a different user.
+
+    ...
+
+    Attributes
+    ----------
+    maxsize : int
+        maximum number of keys, the least recently used one is evicted when it is full
+    ttl : float
+        seconds a response is kept. Responses never expire if it is 0 or less
+
+    Methods
+    -------
+    get(key, fingerprint)
+        Returns the stored response of the key, None if there is none. Raises IdempotencyConflict
+        if the key was used with another request
+
+    put(key, fingerprint, response)
+        Stores the response of the key
+
+    Properties
+    ----------
+    stats : dictionary
+        counters of hits, misses, conflicts, evictions and expirations, and the current size
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 86400) -> None:
+        if maxsize < 1:
+            raise ValueError('Invalid size')
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[Hashable, Any, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.conflicts = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "conflicts": self.conflicts,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "size": len(self._entries),
+            "maxsize": self._maxsize
+        }
+
+    def get(self, key: str, fingerprint: Hashable) -> Optional[Any]:
+        entries = self._entries
+        entry = entries.get(key)
+        if entry is not None and 0 < self._ttl and entry[2] <= time.monotonic():
+            self.expirations += 1
+            del entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] != fingerprint:
+            self.conflicts += 1
+            raise IdempotencyConflict('Idempotency-Key was used with another request')
+        self.hits += 1
+        entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, fingerprint: Hashable, response: Any) -> None:
+        entries = self._entries
+        entries[key] = (fingerprint, response, time.monotonic() + self._ttl if self._ttl > 0 else 0)
+        entries.move_to_end(key)
+        if len(entries) > self._maxsize:
+            entries.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,247 @@
+import asyncio
+import glob
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from starlette.types import ASGIApp, Receive, Scope, Send
+from userRecord import LINES
+
+PLANS = ("ineligible", "economic", "regular", "responsible")
+_PLAN_INDEX = {plan: i for i, plan in enumerate(PLANS)}
+
+# upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS: Tuple[float, ...] = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                                      float("inf"))
+
+# name, type and help of each metric
+METRICS = (
+    ("riskprofile_requests_total", "counter", "Requests by method, path and status code"),
+    ("riskprofile_request_duration_seconds", "histogram", "Request latency by method and path"),
+    ("riskprofile_validation_failures_total", "counter", "Validation errors of the users by message"),
+    ("riskprofile_plans_total", "counter", "Plans suggested by line of insurance"),
+)
+LABELS = {
+    "riskprofile_requests_total": ("method", "path", "status"),
+    "riskprofile_request_duration_seconds": ("method", "path"),
+    "riskprofile_validation_failures_total": ("message",),
+    "riskprofile_plans_total": ("line", "plan"),
+}
+
+
+def _error_message(error: Dict) -> str:
+    # the messages of JSON decoding errors have the position of the error, they are grouped
+    if error.get("type") == "value_error.jsondecode":
+        return "Invalid JSON"
+    return error.get("msg", "")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+class RequestMetrics:
+    """
+    Operational metrics of the API in the Prometheus text format: requests, request latency histograms,
+    validation failures by message and the distribution of the plans suggested for each line of insurance.
+
+    Each worker counts in memory, without locks (everything runs in the worker's event loop).
+    With a directory, the counts of each worker are also written to a file of the directory (named after
+    the process id) at most once every `interval` seconds, and a scrape merges the files of all the workers,
+    so any worker of a gunicorn server can answer it. The files of stopped workers are kept, so the counters
+    never go down; the directory should be emptied when the server starts (see gunicorn_conf.py).
+
+    ...
+
+    Attributes
+    ----------
+    directory : str, optional
+        directory shared by the workers. When None, only the counts of this process are exposed
+    interval : float
+        seconds between writes of the counts of this process
+
+    Methods
+    -------
+    observe_request(method, path, status, seconds)
+        Counts a request and its latency
+
+    observe_errors(errors)
+        Counts the validation errors of a user (in the format of FastAPI)
+
+    observe_plans(plans)
+        Counts the plans (auto, disability, home, life) suggested to a user
+
+    flush()
+        Writes the counts of this process to its file
+
+    render()
+        Returns the metrics of all the workers in the Prometheus text format
+    """
+
+    def __init__(self, directory: str = None, interval: float = 1.0) -> None:
+        self._directory = directory
+        self._interval = interval
+        self._requests: Dict[Tuple[str, str, str], int] = {}
+        self._latencies: Dict[Tuple[str, str], List] = {}
+        self._failures: Dict[str, int] = {}
+        self._plans = [[0] * len(PLANS) for _ in LINES]
+        self._pending = False
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def observe_request(self, method: str, path: str, status: int, seconds: float) -> None:
+        key = (method, path, str(status))
+        self._requests[key] = self._requests.get(key, 0) + 1
+        histogram = self._latencies.get((method, path))
+        if histogram is None:
+            histogram = self._latencies[(method, path)] = [[0] * len(LATENCY_BUCKETS), 0.0]
+        counts = histogram[0]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                counts[i] += 1
+                break
+        histogram[1] += seconds
+        self._changed()
+
+    def observe_errors(self, errors: List[Dict]) -> None:
+        failures = self._failures
+        for error in errors:
+            message = _error_message(error)
+            failures[message] = failures.get(message, 0) + 1
+        self._changed()
+
+    def observe_plans(self, plans: Tuple[str, str, str, str]) -> None:
+        counts = self._plans
+        counts[0][_PLAN_INDEX[plans[0]]] += 1
+        counts[1][_PLAN_INDEX[plans[1]]] += 1
+        counts[2][_PLAN_INDEX[plans[2]]] += 1
+        counts[3][_PLAN_INDEX[plans[3]]] += 1
+        self._changed()
+
+    def _changed(self) -> None:
+        # the counts are written once per interval, later in the event loop
+        if self._directory is None or self._pending:
+            return
+        self._pending = True
+        try:
+            asyncio.get_running_loop().call_later(self._interval, self.flush)
+        except RuntimeError:
+            # no event loop (e.g. the batch scorer), written on the next scrape
+            pass
+
+    def _samples(self) -> Dict[str, List]:
+        return {
+            "riskprofile_requests_total": [[list(key), value] for key, value in self._requests.items()],
+            "riskprofile_request_duration_seconds": [[list(key), histogram[0], histogram[1]]
+                                                     for key, histogram in self._latencies.items()],
+            "riskprofile_validation_failures_total": [[[message], value] for message, value in self._failures.items()],
+            "riskprofile_plans_total": [[[line, plan], counts[i]]
+                                        for line, counts in zip(LINES, self._plans)
+                                        for i, plan in enumerate(PLANS) if counts[i]],
+        }
+
+    def flush(self) -> None:
+        self._pending = False
+        if self._directory is None:
+            return
+        path = os.path.join(self._directory, f"metrics-{os.getpid()}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._samples(), f)
+        os.replace(tmp, path)
+
+    def _merged(self) -> Dict[str, Dict[Tuple, object]]:
+        files: List[Dict[str, List]] = []
+        if self._directory is None:
+            files.append(self._samples())
+        else:
+            self.flush()
+            for path in glob.glob(os.path.join(self._directory, "metrics-*.json")):
+                try:
+                    with open(path) as f:
+                        files.append(json.load(f))
+                except (OSError, ValueError):
+                    # removed or replaced while reading
+                    continue
+
+        merged: Dict[str, Dict[Tuple, object]] = {name: {} for name, _, _ in METRICS}
+        for samples in files:
+            for name, kind, _ in METRICS:
+                metric = merged[name]
+                for sample in samples.get(name, []):
+                    key = tuple(sample[0])
+                    if kind == "histogram":
+                        counts, total = metric.get(key, ([0] * len(LATENCY_BUCKETS), 0.0))
+                        metric[key] = ([a + b for a, b in zip(counts, sample[1])], total + sample[2])
+                    else:
+                        metric[key] = metric.get(key, 0) + sample[1]
+        return merged
+
+    def render(self) -> str:
+        lines = []
+        merged = self._merged()
+        for name, kind, description in METRICS:
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            names = LABELS[name]
+            for key, value in sorted(merged[name].items()):
+                if kind == "histogram":
+                    counts, total = value
+                    cumulative = 0
+                    for bound, count in zip(LATENCY_BUCKETS, counts):
+                        cumulative += count
+                        le = 'le="' + _bound(bound) + '"'
+                        lines.append(f"{name}_bucket{_labels(names, key, le)} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(names, key)} {total}")
+                    lines.append(f"{name}_count{_labels(names, key)} {cumulative}")
+                else:
+                    lines.append(f"{name}{_labels(names, key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting the requests and their latency (until the last byte of the response is sent).
+    Paths that are not routes of the app are counted as "other", so unknown paths do not create new series.
+    """
+
+    def __init__(self, app: ASGIApp, metrics: RequestMetrics) -> None:
+        self.app = app
+        self.metrics = metrics
+        self._paths: Optional[set] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self._paths is None:
+            self._paths = {getattr(route, "path", None) for route in scope["app"].routes}
+        path = scope["path"] if scope["path"] in self._paths else "other"
+        status = [500]
+        start = time.perf_counter()
+
+        async def send_and_observe(message) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                self.metrics.observe_request(scope["method"], path, status[0], time.perf_counter() - start)
+                status[0] = None
+
+        try:
+            await self.app(scope, receive, send_and_observe)
+        finally:
+            # the response was not completed (an error, or the client went away)
+            if status[0] is not None:
+                self.metrics.observe_request(scope["method"], path, status[0], time.perf_counter() - start)
@@ -0,0 +1,167 @@
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+from models.user_model import UserModel
+from models.risk_model import RiskModel
+from rules import Rules
+from userRecord import new_score
+from riskTable import bucket_key
+from clock import Clock, SYSTEM_CLOCK
+
+
+class RiskCache:
+    """
+    An in-process LRU cache of risk profiles, in front of a scoring engine.
+
+    Users are cached by a canonical key that only keeps what the rules depend on (the age band
+    instead of the age, the income bracket instead of the income, etc.), so different users with
+    the same risk profile share the same entry. The key is the class of the user (see bucket_key)
+    for the Rules class and the RiskTable, and the canonical tuple of the rule set for RuleSet
+    engines. The cache is cleared when the year of the clock or the rule set changes.
+
+    ...
+
+    Attributes
+    ----------
+    engine : optional
+        scoring engine (see engines.py). When None, the Rules class is applied
+    maxsize : int
+        maximum number of entries, the least recently used one is evicted when it is full
+    ttl : float
+        seconds an entry is kept. Entries never expire if it is 0 or less
+    clock : Clock, optional
+        the date the rules are applied on (see clock.py), the same one of the engine. By default, the system clock
+
+    Methods
+    -------
+    calculate(user)
+        Returns the RiskModel of the user
+
+    plans(user)
+        Returns the plans (auto, disability, home, life) of the user
+
+    score(user)
+        Returns the score array of the user, never cached. The engines without score (the tables) are compiled
+        from the Rules class, which is applied instead
+
+    explain(user)
+        Returns the changes each rule made to the score of the user and the score array, never cached,
+        as with score
+
+    clear()
+        Removes all the entries
+
+    Properties
+    ----------
+    stats : dictionary
+        counters of hits, misses, evictions, expirations and invalidations, and the current size
+    version : str
+        version of the rule set of the engine, if it has one
+    """
+
+    def __init__(self, engine=None, maxsize: int = 10000, ttl: float = 0, clock: Clock = None) -> None:
+        self._engine = engine
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._entries: "OrderedDict[object, Tuple[RiskModel, Tuple[str, str, str, str], float]]" = OrderedDict()
+        self._clock = SYSTEM_CLOCK if clock is None else clock
+        self._year = self._clock.year
+        self._rule_set = getattr(engine, "ruleSet", None)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def version(self) -> str:
+        return getattr(self._engine, "version", None)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "size": len(self._entries),
+            "maxsize": self._maxsize
+        }
+
+    def clear(self) -> None:
+        self._entries = OrderedDict()
+
+    def calculate(self, user: UserModel) -> RiskModel:
+        return self._get(user)[0]
+
+    def plans(self, user: UserModel) -> Tuple[str, str, str, str]:
+        return self._get(user)[1]
+
+    def score(self, user: UserModel) -> List[int]:
+        score = getattr(self._engine, "score", None)
+        if score is not None:
+            return score(user)
+        rules = Rules(user=user, score=new_score(), clock=self._clock)
+        rules.apply_all_rules()
+        return rules.scoreArray
+
+    def explain(self, user: UserModel) -> Tuple[List[Dict], List[int]]:
+        explain = getattr(self._engine, "explain", None)
+        if explain is not None:
+            return explain(user)
+        rules = Rules(user=user, score=new_score(), clock=self._clock)
+        return rules.explain(), rules.scoreArray
+
+    def _key(self, user: UserModel):
+        canonical_key = getattr(self._engine, "canonical_key", None)
+        if canonical_key is None:
+            return bucket_key(user, self._year)
+        return canonical_key(user)
+
+    def _compute(self, user: UserModel) -> RiskModel:
+        if self._engine is not None:
+            return self._engine.calculate(user)
+        rules = Rules(user=user, score=new_score(), clock=self._clock)
+        rules.apply_all_rules()
+        return rules.processedScore
+
+    def _get(self, user: UserModel) -> Tuple[RiskModel, Tuple[str, str, str, str], float]:
+        # the key is calculated first, so reloadable engines check for a new rule set
+        key = self._key(user)
+        if self._invalidate():
+            key = self._key(user)
+        entries = self._entries
+        entry = entries.get(key)
+        if entry is not None:
+            if self._ttl <= 0 or time.monotonic() < entry[2]:
+                self.hits += 1
+                entries.move_to_end(key)
+                return entry
+            self.expirations += 1
+            del entries[key]
+
+        self.misses += 1
+        risk_model = self._compute(user)
+        entry = (
+            risk_model,
+            (risk_model.auto.value, risk_model.disability.value, risk_model.home.value, risk_model.life.value),
+            time.monotonic() + self._ttl if self._ttl > 0 else 0
+        )
+        entries[key] = entry
+        if len(entries) > self._maxsize:
+            entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def _invalidate(self) -> bool:
+        # the vehicle rule depends on the year, and the rule set of the engine can be reloaded
+        year = self._clock.year
+        rule_set = getattr(self._engine, "ruleSet", None)
+        if year == self._year and rule_set is self._rule_set:
+            return False
+        self._year = year
+        self._rule_set = rule_set
+        self.invalidations += 1
+        self.clear()
+        return True
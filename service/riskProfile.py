@@ -1,7 +1,11 @@
+from typing import Dict, Optional
+import utils as utils
 from models.user_model import UserModel
 from models.risk_model import RiskModel
 from validator import Validator
 from rules import Rules
+from userRecord import LINES, UserRecord, new_score
+from clock import Clock
 
 
 class RiskProfile:
@@ -12,31 +16,82 @@ class RiskProfile:
     ----------
     user : UserModel
         user's risk profile
+    engine : optional
+        precompiled scoring engine (see engines.py). When None, the Rules class is applied
+    validate : bool, optional
+        run the Validator on the user. By default, only raw inputs (e.g. dictionaries) are validated:
+        a UserModel was already validated by Pydantic with the same rules, so it is trusted
+    explain : bool, optional
+        record the changes each rule of the engine made to the score. The engines compiled from the Rules class
+        (the tables) have no explain, the Rules class is applied instead
+    scores : bool, optional
+        keep the score of each line of insurance before processing, calculated by the engine. As with explain,
+        the Rules class is applied for the engines without score (the tables)
+    clock : Clock, optional
+        the date the Rules class is applied on (see clock.py), e.g. an as-of date. An engine keeps its own clock,
+        see engines.build_engine_as_of. By default, the system clock
 
     Properties
     ----------
     calculatedRiskProfile : RiskModel
         risk profile of the provided user
+    explanation : dictionary
+        the steps of the rules (see Rules.explain) and the score before processing, None unless explained
+    scores : dictionary
+        the score of each line of insurance before processing (None if ineligible), None unless requested
     """
 
-    def __init__(self, user: UserModel) -> None:
+    # only set on the instances that are explained or keep the scores
+    _explanation = None
+    _scores = None
+
+    def __init__(self, user: UserModel, engine=None, validate: bool = None, explain: bool = False,
+                 scores: bool = False, clock: Clock = None) -> None:
         # get user's risk profile
         _user = user
 
-        # validate the user's risk profile
-        _validator = Validator(user=_user)
-        _validator.validate_all()
+        # validate the user's risk profile, unless it is a trusted UserModel
+        if validate is None:
+            validate = not isinstance(_user, UserModel)
+        if validate:
+            # the Validator and the rules read the same lean record
+            _user = UserRecord.from_user(_user)
+            _validator = Validator(user=_user)
+            _validator.validate_all()
+
+        engine_explain = getattr(engine, "explain", None)
+        engine_score = getattr(engine, "score", None)
+        if (explain and engine_explain is not None) or (not explain and scores and engine_score is not None):
+            # the rule set of the engine is applied, so the steps and the scores match the plans it returns
+            if explain:
+                steps, score = engine_explain(user)
+                self._explanation = {"steps": steps, "score": dict(zip(LINES, utils.numeric_score(score)))}
+            else:
+                score = engine_score(user)
+            if scores:
+                self._scores = dict(zip(LINES, utils.numeric_score(score)))
+            self._output = utils.risk_model(utils.process_score(score))
+            return
+
+        if explain or scores:
+            # the tables do not keep the steps or the scores, the Rules class they are compiled from is applied
+            _rules = Rules(user=_user, score=new_score(), clock=clock)
+            if explain:
+                self._explanation = {"steps": _rules.explain(), "score": _rules.score}
+            else:
+                _rules.apply_all_rules()
+            if scores:
+                self._scores = _rules.score
+            self._output = _rules.processedScore
+            return
 
-        # initialize score
-        _cleanScore = {
-            "auto": 0,
-            "disability": 0,
-            "home": 0,
-            "life": 0
-        }
+        if engine is not None:
+            # calculate the risk profile with the precompiled engine
+            self._output = engine.calculate(user)
+            return
 
-        # apply rules to score to calculate the risk profile
-        _rules = Rules(user=_user, score=_cleanScore)
+        # apply rules to a clean score array to calculate the risk profile
+        _rules = Rules(user=_user, score=new_score(), clock=clock)
         _rules.apply_all_rules()
 
         self._output = _rules.processedScore
@@ -48,3 +103,19 @@ class RiskProfile:
         :return: RiskModel object
         """
         return self._output
+
+    @property
+    def explanation(self) -> Optional[Dict]:
+        """
+        provides the steps of the rules applied to the user and the score before processing
+        :return: dictionary, None if the risk profile was not explained
+        """
+        return self._explanation
+
+    @property
+    def scores(self) -> Optional[Dict]:
+        """
+        provides the score of each line of insurance before processing, None for the ineligible lines
+        :return: dictionary, None if the scores were not requested
+        """
+        return self._scores
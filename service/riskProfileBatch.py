@@ -0,0 +1,60 @@
+from typing import Any, Dict, List
+from pydantic import ValidationError
+from models.user_model import UserModel
+from models.risk_model import BatchRiskItem
+from rules import Rules
+from userRecord import new_score
+from clock import Clock
+
+
+class RiskProfileBatch:
+    """
+    This is the class to receive a list of user's risk profiles and calculate the risk score of each one.
+    Raw users are parsed (and validated) as UserModel objects, and a single Rules instance is reused
+    for the whole batch.
+    ...
+    Attributes
+    ----------
+    users : list
+        raw user's risk profiles (dictionaries or UserModel objects)
+    engine : optional
+        precompiled scoring engine (see engines.py). When None, the Rules class is applied
+    clock : Clock, optional
+        the date the Rules class is applied on (see clock.py), e.g. an as-of date. An engine keeps its own clock,
+        see engines.build_engine_as_of. By default, the system clock
+
+    Properties
+    ----------
+    calculatedRiskProfiles : list of BatchRiskItem
+        one item per user, in the same order as the input.
+        Each item has either a result (RiskModel) or a detail (list of errors)
+    """
+
+    def __init__(self, users: List[Any], engine=None, clock: Clock = None) -> None:
+        _rules = Rules(user=None, score=None, clock=clock)
+
+        self._output = []
+        for _user in users:
+            try:
+                if not isinstance(_user, UserModel):
+                    _user = UserModel.parse_obj(_user)
+
+                if engine is not None:
+                    self._output.append(BatchRiskItem(result=engine.calculate(_user)))
+                    continue
+
+                # apply rules to a clean score to calculate the risk profile
+                _rules.user = _user
+                _rules.score = new_score()
+                _rules.apply_all_rules()
+                self._output.append(BatchRiskItem(result=_rules.processedScore))
+            except ValidationError as e:
+                self._output.append(BatchRiskItem(detail=e.errors()))
+
+    @property
+    def calculatedRiskProfiles(self) -> List[BatchRiskItem]:
+        """
+        provides the calculated risk scores from the provided user's risk profiles
+        :return: list of BatchRiskItem objects
+        """
+        return self._output
@@ -0,0 +1,161 @@
+from itertools import product
+from typing import List, Tuple
+from models.user_model import UserModel
+from models.risk_model import RiskModel
+from rules import Rules
+from userRecord import new_score
+from clock import Clock, SYSTEM_CLOCK
+
+# number of classes of each discretized input
+AGE_CLASSES = 4         # under 30, 30 to 40, 41 to 60, over 60
+INCOME_CLASSES = 3      # no income, up to $200k, above $200k
+DEPENDENTS_CLASSES = 2  # no dependents, has dependents
+MARITAL_CLASSES = 2     # single, married
+HOUSE_CLASSES = 3       # no house, owned, mortgaged
+VEHICLE_CLASSES = 3     # no vehicle, produced in the last 5 years, older
+RISK_CLASSES = 4        # sum of the risk answers (0 to 3)
+
+
+def bucket_key(user: UserModel, year: int) -> int:
+    """
+    Calculates the class of a user for the rules of the Rules class.
+    Users of the same class have the same risk profile.
+    Args:
+        user: the user's risk profile
+        year: current year, the vehicle rule depends on it
+    Returns:
+        the position of the user's class in the RiskTable
+    """
+    age = user['age']
+    if age < 30:
+        k = 0
+    elif age <= 40:
+        k = 1
+    elif age <= 60:
+        k = 2
+    else:
+        k = 3
+
+    income = user['income']
+    k = k * INCOME_CLASSES + (0 if income == 0 else 1 if income <= 200000 else 2)
+    k = k * DEPENDENTS_CLASSES + (user['dependents'] > 0)
+    k = k * MARITAL_CLASSES + (user['marital_status'] == 'married')
+
+    house = user['house']
+    k = k * HOUSE_CLASSES + (0 if house is None else 2 if house['ownership_status'] == 'mortgaged' else 1)
+
+    vehicle = user['vehicle']
+    k = k * VEHICLE_CLASSES + (0 if vehicle is None else 1 if vehicle['year'] >= year - 5 else 2)
+
+    risk = 0
+    for answer in user['risk_questions']:
+        if answer == 1:
+            risk += 1
+    return k * RISK_CLASSES + risk
+
+
+class RiskTable:
+    """
+    A compiled version of the Rules class.
+    The rules only depend on a few thresholds of each attribute, so every user falls in one of
+    a few thousand classes. The RiskModel of each class is calculated once (with the Rules class)
+    and the risk profile of a user is found with a bucket key computation and one table lookup.
+    The table is rebuilt when the year of the clock changes, since the vehicle rule depends on it.
+
+    ...
+
+    Attributes
+    ----------
+    clock : Clock, optional
+        the date the rules are applied on (see clock.py). By default, the system clock
+
+    Properties
+    ----------
+    year : int
+        year the table was built for
+    size : int
+        number of classes of users
+    plansTable : list
+        the plans (auto, disability, home, life) of each class of users
+
+    Methods
+    -------
+    calculate(user)
+        Returns the RiskModel of the user, read from the table
+
+    plans(user)
+        Returns the plans (auto, disability, home, life) of the user, read from the table
+
+    key(user)
+        Returns the position of the user's class in the table
+
+    build()
+        Calculates the RiskModel of every class for the current year of the clock
+    """
+
+    def __init__(self, clock: Clock = None) -> None:
+        self._clock = SYSTEM_CLOCK if clock is None else clock
+        self._year = None
+        self._table = None
+        self._plans = None
+        self.build()
+
+    @property
+    def year(self) -> int:
+        return self._year
+
+    @property
+    def size(self) -> int:
+        return len(self._table)
+
+    @property
+    def plansTable(self) -> List[Tuple[str, str, str, str]]:
+        return self._plans
+
+    def build(self) -> None:
+        year = self._clock.year
+        ages = [0, 30, 41, 61]
+        incomes = [0, 1, 200001]
+        dependents = [0, 1]
+        marital_statuses = ["single", "married"]
+        houses = [None, {"ownership_status": "owned"}, {"ownership_status": "mortgaged"}]
+        vehicles = [None, {"year": year}, {"year": year - 6}]
+        risk_questions = [[0, 0, 0], [1, 0, 0], [1, 1, 0], [1, 1, 1]]
+
+        table: List[RiskModel] = []
+        plans: List[Tuple[str, str, str, str]] = []
+        rules = Rules(user=None, score=None, clock=self._clock)
+        # the order of the loops must match the order of the key calculation
+        for age, income, dep, marital, house, vehicle, risk in product(
+                ages, incomes, dependents, marital_statuses, houses, vehicles, risk_questions):
+            rules.user = {
+                "age": age,
+                "dependents": dep,
+                "house": house,
+                "income": income,
+                "marital_status": marital,
+                "risk_questions": risk,
+                "vehicle": vehicle
+            }
+            rules.score = new_score()
+            rules.apply_all_rules()
+            risk_model = rules.processedScore
+            table.append(risk_model)
+            plans.append((risk_model.auto.value, risk_model.disability.value,
+                          risk_model.home.value, risk_model.life.value))
+
+        # swap all at once, requests being answered keep using the previous table
+        self._table, self._plans, self._year = table, plans, year
+
+    def key(self, user: UserModel) -> int:
+        return bucket_key(user, self._year)
+
+    def calculate(self, user: UserModel) -> RiskModel:
+        if self._clock.year != self._year:
+            self.build()
+        return self._table[self.key(user)]
+
+    def plans(self, user: UserModel) -> Tuple[str, str, str, str]:
+        if self._clock.year != self._year:
+            self.build()
+        return self._plans[self.key(user)]
@@ -0,0 +1,192 @@
+import functools
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple
+import utils as utils
+from rules import Rules
+from userRecord import ELIGIBILITY, LINES
+from validator import Validator
+
+# upper bounds (seconds) of the latency histogram buckets, the last one catches the rest
+LATENCY_BUCKETS: Tuple[float, ...] = (1e-7, 2.5e-7, 5e-7, 1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, float("inf"))
+
+
+class Histogram:
+    """
+    Counts of observed values by bucket (upper bounds), with their sum, in the format of Prometheus histograms
+    """
+
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def snapshot(self) -> Dict:
+        # cumulative counts, as in Prometheus
+        buckets = {}
+        total = 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            buckets["+Inf" if bound == float("inf") else repr(bound)] = total
+        return {"count": total, "sum": self.sum, "buckets": buckets}
+
+
+class StageMetrics:
+    """
+    Metrics of one instrumented stage: calls, errors raised, latencies and, for rules,
+    how many times the rule changed the score and made each line of insurance ineligible
+    """
+
+    __slots__ = ("calls", "errors", "fired", "ineligible", "latency")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.fired = 0
+        self.ineligible = [0, 0, 0, 0]
+        self.latency = Histogram()
+
+    def snapshot(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "fired": self.fired,
+            "ineligible": dict(zip(LINES, self.ineligible)),
+            "latency": self.latency.snapshot()
+        }
+
+
+class RuleMetrics:
+    """
+    Optional instrumentation of the scoring stages: Validator.validate_all, Rules.apply_all_rules,
+    each Rules.rule_* method and the final processing (utils.process_score).
+
+    The methods are only wrapped while the instrumentation is enabled, so there is no overhead
+    at all when it is disabled. The rules are only measured for the users scored by the Rules class
+    (the "rules" engine, or the RiskCache misses in front of it). The final processing is shared by every
+    path of the Rules class (Rules.processedScore, the plans of /api/risk/) and by the rule sets.
+
+    ...
+
+    Methods
+    -------
+    enable()
+        Wraps the methods of Rules and Validator and utils.process_score to record their metrics
+
+    disable()
+        Restores the original methods
+
+    reset()
+        Clears the metrics
+
+    Properties
+    ----------
+    enabled : bool
+        True if the methods are wrapped
+    stats : dictionary
+        metrics of each stage (calls, errors, fired, ineligible by line of insurance and latency histogram)
+    """
+
+    def __init__(self) -> None:
+        self._stages: Dict[str, StageMetrics] = {}
+        self._originals: List[Tuple[object, str, object]] = []
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._originals)
+
+    @property
+    def stats(self) -> Dict[str, Dict]:
+        return {name: stage.snapshot() for name, stage in self._stages.items()}
+
+    def reset(self) -> None:
+        for name in self._stages:
+            self._stages[name] = StageMetrics()
+
+    def enable(self) -> None:
+        if self.enabled:
+            return
+        if getattr(Rules.apply_all_rules, "__wrapped__", None) is not None:
+            raise ValueError('Rule metrics are already enabled by another instance')
+
+        self._wrap(Validator, "validate_all", self._timed)
+        self._wrap(Rules, "apply_all_rules", self._timed)
+        for name in dir(Rules):
+            if name.startswith("rule_"):
+                self._wrap(Rules, name, self._rule)
+        # a module function, looked up as utils.process_score by every caller
+        self._wrap(utils, "process_score", self._timed)
+
+    def disable(self) -> None:
+        for owner, name, original in reversed(self._originals):
+            setattr(owner, name, original)
+        self._originals = []
+
+    def _wrap(self, owner: object, name: str, wrapper: Callable) -> None:
+        # a class or a module
+        original = owner.__dict__[name]
+        self._originals.append((owner, name, original))
+        setattr(owner, name, wrapper(f"{owner.__name__.lower()}.{name}", original))
+
+    def _stage(self, name: str) -> StageMetrics:
+        stage = self._stages.get(name)
+        if stage is None:
+            stage = self._stages[name] = StageMetrics()
+        return stage
+
+    def _timed(self, name: str, method: Callable) -> Callable:
+        self._stage(name)
+        stages = self._stages
+        perf_counter = time.perf_counter
+
+        @functools.wraps(method)
+        def wrapper(instance, *args, **kwargs):
+            stage = stages[name]
+            stage.calls += 1
+            start = perf_counter()
+            try:
+                return method(instance, *args, **kwargs)
+            except Exception:
+                stage.errors += 1
+                raise
+            finally:
+                stage.latency.observe(perf_counter() - start)
+        return wrapper
+
+    def _rule(self, name: str, method: Callable) -> Callable:
+        self._stage(name)
+        stages = self._stages
+        perf_counter = time.perf_counter
+
+        @functools.wraps(method)
+        def wrapper(rules, *args, **kwargs):
+            stage = stages[name]
+            stage.calls += 1
+            score = rules.scoreArray
+            before = list(score)
+            start = perf_counter()
+            try:
+                return method(rules, *args, **kwargs)
+            except Exception:
+                stage.errors += 1
+                raise
+            finally:
+                stage.latency.observe(perf_counter() - start)
+                if score != before:
+                    stage.fired += 1
+                    # bits cleared by the rule
+                    cleared = before[ELIGIBILITY] & ~score[ELIGIBILITY]
+                    for line in range(4):
+                        if cleared & (1 << line):
+                            stage.ineligible[line] += 1
+        return wrapper
@@ -0,0 +1,256 @@
+import json
+import os
+from typing import Callable, Dict, List, Tuple
+import utils as utils
+from models.user_model import UserModel
+from models.risk_model import RiskModel
+from userRecord import ALL_ELIGIBLE, new_score
+from clock import Clock, SYSTEM_CLOCK
+
+DEFAULT_RULE_SET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rulesets", "default.json")
+
+LINES = ("auto", "disability", "home", "life")
+# fields a rule condition can use. The numeric fields that are never null can also be used as the delta of a rule.
+FIELDS = ("age", "dependents", "income", "marital_status", "house", "vehicle", "vehicle_age", "risk")
+NUMERIC_FIELDS = ("age", "dependents", "income", "vehicle", "vehicle_age", "risk")
+NULLABLE_FIELDS = ("house", "vehicle", "vehicle_age")
+DELTA_FIELDS = tuple(field for field in NUMERIC_FIELDS if field not in NULLABLE_FIELDS)
+OPERATORS = ("==", "!=", "<", "<=", ">", ">=")
+
+
+class RuleSet:
+    """
+    A set of rules defined as data, compiled to a single python function.
+
+    A rule set is a JSON (or YAML) document with a version and an ordered list of rules.
+    Each rule has a name, an optional condition ("when") and either the points to add to
+    each line of insurance ("add") or the lines of insurance it makes ineligible ("ineligible").
+    The condition maps fields to comparisons, and all of them must be true:
+
+        {"name": "age_between_thirty_and_forty",
+         "when": {"age": {">=": 30, "<=": 40}},
+         "add": {"auto": -1, "disability": -1, "home": -1, "life": -1}}
+
+    Fields: age, dependents, income, marital_status, house (null, "owned" or "mortgaged"),
+    vehicle (null or the year it was manufactured), vehicle_age (years since the vehicle was
+    manufactured, null without vehicle) and risk (sum of the risk answers).
+    Comparisons other than "==" and "!=" are false when the field is null.
+
+    ...
+
+    Attributes
+    ----------
+    definition : dictionary
+        the rule set document
+    clock : Clock, optional
+        the date the rules are applied on (see clock.py). By default, the system clock
+
+    Methods
+    -------
+    from_file(path, clock)
+        Loads a rule set from a JSON or YAML file (YAML needs PyYAML, which is optional)
+
+    evaluate(age, dependents, income, marital_status, house, vehicle, risk, year)
+        The compiled rules. Returns the score array (auto, disability, home, life, eligibility bitmask),
+        see userRecord.py
+
+    trace(age, dependents, income, marital_status, house, vehicle, risk, year, steps)
+        The same compiled rules, also appending the name of each rule and the score array after it to steps
+
+    canonical(age, dependents, income, marital_status, house, vehicle, risk, year)
+        Also compiled from the rules. Returns the result of every comparison of the rule set and the
+        values of the fields used as deltas: users with the same canonical tuple have the same score
+
+    canonical_key(user)
+        Returns the canonical tuple of the user (see RiskCache)
+
+    calculate(user)
+        Returns the RiskModel of the user
+
+    plans(user)
+        Returns the plans (auto, disability, home, life) of the user
+
+    score(user)
+        Returns the score array of the user (see userRecord.py)
+
+    explain(user)
+        Returns the changes each rule made to the score of the user (see utils.explain_step) and the score array
+
+    Properties
+    ----------
+    version : str
+        version of the rule set
+    source : str
+        python source of the compiled rules
+    """
+
+    def __init__(self, definition: Dict, clock: Clock = None) -> None:
+        self._clock = SYSTEM_CLOCK if clock is None else clock
+        self._version = str(definition.get("version", ""))
+        self._source = self._generate(definition)
+        namespace = {}
+        exec(compile(self._source, f"<rule set {self._version}>", "exec"), namespace)
+        self._evaluate = namespace["evaluate"]
+        self._trace = namespace["trace"]
+        self._canonical = namespace["canonical"]
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_RULE_SET, clock: Clock = None) -> "RuleSet":
+        with open(path) as f:
+            if path.endswith((".yaml", ".yml")):
+                # optional, only needed for YAML rule sets
+                try:
+                    import yaml
+                except ImportError:
+                    raise ValueError('YAML rule sets need PyYAML (pip install PyYAML)') from None
+                definition = yaml.safe_load(f)
+            else:
+                definition = json.load(f)
+        return cls(definition, clock)
+
+    @property
+    def version(self) -> str:
+        return self._version
+
+    @property
+    def source(self) -> str:
+        return self._source
+
+    @property
+    def evaluate(self) -> Callable:
+        return self._evaluate
+
+    @property
+    def canonical(self) -> Callable:
+        return self._canonical
+
+    def calculate(self, user: UserModel) -> RiskModel:
+        auto, disability, home, life = self.plans(user)
+        return RiskModel(auto=auto, disability=disability, home=home, life=life)
+
+    def plans(self, user: UserModel) -> Tuple[str, str, str, str]:
+        return utils.process_score(self._evaluate(*self._arguments(user)))
+
+    def score(self, user: UserModel) -> List[int]:
+        return list(self._evaluate(*self._arguments(user)))
+
+    def explain(self, user: UserModel) -> Tuple[List[Dict], List[int]]:
+        # slower than evaluate, which is kept free of any tracing
+        trace = []
+        score = list(self._trace(*self._arguments(user), trace))
+        steps = []
+        before = new_score()
+        for name, after in trace:
+            steps.append(utils.explain_step(name, before, after))
+            before = after
+        return steps, score
+
+    def canonical_key(self, user: UserModel) -> Tuple:
+        return self._canonical(*self._arguments(user))
+
+    def _arguments(self, user: UserModel) -> Tuple:
+        house = user['house']
+        vehicle = user['vehicle']
+        risk = 0
+        for answer in user['risk_questions']:
+            if answer == 1:
+                risk += 1
+        return (
+            user['age'],
+            user['dependents'],
+            user['income'],
+            user['marital_status'],
+            None if house is None else house['ownership_status'],
+            None if vehicle is None else vehicle['year'],
+            risk,
+            self._clock.year
+        )
+
+    @staticmethod
+    def _generate(definition: Dict) -> str:
+        rules = definition.get("rules")
+        if not isinstance(rules, list):
+            raise ValueError('Invalid rule set: missing list of rules')
+
+        # the lines of each rule, compiled in both evaluate and trace
+        blocks: List[Tuple[str, List[str]]] = []
+        # everything the score depends on, for the canonical function
+        canonical: List[str] = []
+        for rule in rules:
+            name = rule.get("name")
+            if not isinstance(name, str) or not name.isidentifier():
+                raise ValueError(f'Invalid rule name {name!r}')
+            lines = [f"    # {name}"]
+            blocks.append((name, lines))
+            indent = "    "
+            if rule.get("when"):
+                lines.append(f"    if {RuleSet._condition(name, rule['when'], canonical)}:")
+                indent = "        "
+
+            if "add" in rule and "ineligible" not in rule:
+                for line, delta in rule["add"].items():
+                    if line not in LINES:
+                        raise ValueError(f'Invalid rule {name}: unknown line of insurance {line}')
+                    if delta in NULLABLE_FIELDS:
+                        # null for the users without a vehicle
+                        raise ValueError(f'Invalid rule {name}: {delta} can be null, it can not be a delta')
+                    if delta in DELTA_FIELDS:
+                        lines.append(f"{indent}{line} += {delta}")
+                        if delta not in canonical:
+                            canonical.append(delta)
+                    elif isinstance(delta, int) and not isinstance(delta, bool):
+                        lines.append(f"{indent}{line} += {delta!r}")
+                    else:
+                        raise ValueError(f'Invalid rule {name}: invalid delta {delta!r}')
+            elif "ineligible" in rule and "add" not in rule:
+                for line in rule["ineligible"]:
+                    if line not in LINES:
+                        raise ValueError(f'Invalid rule {name}: unknown line of insurance {line}')
+                    lines.append(f"{indent}eligible &= ~{1 << LINES.index(line)}")
+            else:
+                raise ValueError(f'Invalid rule {name}: it must have either "add" or "ineligible"')
+            if indent != "    " and lines[-1].endswith(":"):
+                lines.append(f"{indent}pass")
+
+        lines = []
+        for function, traced in (("evaluate", False), ("trace", True)):
+            lines.append(f"def {function}(age, dependents, income, marital_status, house, vehicle, risk, year"
+                         f"{', steps' if traced else ''}):")
+            lines.append("    vehicle_age = None if vehicle is None else year - vehicle")
+            lines.append("    auto = disability = home = life = 0")
+            lines.append(f"    eligible = {ALL_ELIGIBLE}")
+            for name, block in blocks:
+                lines.extend(block)
+                if traced:
+                    lines.append(f"    steps.append(({name!r}, [auto, disability, home, life, eligible]))")
+            lines.append("    return auto, disability, home, life, eligible")
+            lines.append("")
+        lines.append("def canonical(age, dependents, income, marital_status, house, vehicle, risk, year):")
+        lines.append("    vehicle_age = None if vehicle is None else year - vehicle")
+        lines.append(f"    return ({', '.join(canonical)}{',' if len(canonical) == 1 else ''})")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _condition(name: str, when: Dict, canonical: List[str]) -> str:
+        terms = []
+        for field, comparisons in when.items():
+            if field not in FIELDS:
+                raise ValueError(f'Invalid rule {name}: unknown field {field}')
+            if not isinstance(comparisons, dict):
+                raise ValueError(f'Invalid rule {name}: invalid condition for {field}')
+            for operator, value in comparisons.items():
+                if operator not in OPERATORS:
+                    raise ValueError(f'Invalid rule {name}: unknown operator {operator}')
+                if value is not None and not isinstance(value, (int, str)):
+                    raise ValueError(f'Invalid rule {name}: invalid value {value!r}')
+                if value is None:
+                    if operator not in ("==", "!="):
+                        raise ValueError(f'Invalid rule {name}: null can only be compared with == or !=')
+                    terms.append(f"{field} is {'' if operator == '==' else 'not '}None")
+                elif operator in ("==", "!=") or field not in NULLABLE_FIELDS:
+                    terms.append(f"{field} {operator} {value!r}")
+                else:
+                    terms.append(f"({field} is not None and {field} {operator} {value!r})")
+                if terms[-1] not in canonical:
+                    canonical.append(terms[-1])
+        return " and ".join(terms)
@@ -0,0 +1,120 @@
+import logging
+import os
+import time
+from typing import Dict, List, Tuple
+from models.user_model import UserModel
+from models.risk_model import RiskModel
+from ruleSet import RuleSet
+from clock import Clock
+
+logger = logging.getLogger(__name__)
+
+
+class RuleSetReloader:
+    """
+    Scoring engine that applies the rule set of a file and reloads it when the file changes,
+    so a new rule configuration can be deployed without restarting the workers.
+
+    The file modification time is checked at most once every `interval` seconds, when a user
+    is calculated. A changed file is compiled first and then swapped in with a single assignment,
+    so requests being answered keep the rule set they started with.
+    If the new file is invalid the error is logged and the current rule set is kept.
+
+    ...
+
+    Attributes
+    ----------
+    path : str
+        rule set file (JSON or YAML)
+    interval : float
+        seconds between checks of the file. The file is never checked again if it is 0 or less
+    clock : Clock, optional
+        the date the rules are applied on (see clock.py). By default, the system clock
+
+    Methods
+    -------
+    calculate(user)
+        Returns the RiskModel of the user, calculated with the current rule set
+
+    plans(user)
+        Returns the plans (auto, disability, home, life) of the user, calculated with the current rule set
+
+    score(user)
+        Returns the score array of the user, calculated with the current rule set
+
+    explain(user)
+        Returns the changes each rule of the current rule set made to the score of the user and the score array
+
+    canonical_key(user)
+        Returns the canonical tuple of the user for the current rule set (see RiskCache)
+
+    reload()
+        Compiles the file if it changed and swaps it in. Returns True if the rule set was replaced
+
+    Properties
+    ----------
+    ruleSet : RuleSet
+        current rule set
+    version : str
+        version of the current rule set
+    """
+
+    def __init__(self, path: str, interval: float = 1.0, clock: Clock = None) -> None:
+        self._path = path
+        self._interval = interval
+        self._clock = clock
+        self._mtime = os.stat(path).st_mtime_ns
+        self._rule_set = RuleSet.from_file(path, clock)
+        self._next_check = time.monotonic() + interval
+
+    @property
+    def ruleSet(self) -> RuleSet:
+        return self._rule_set
+
+    @property
+    def version(self) -> str:
+        return self._rule_set.version
+
+    def reload(self) -> bool:
+        try:
+            mtime = os.stat(self._path).st_mtime_ns
+        except OSError as e:
+            logger.error("Could not reload rule set %s: %s", self._path, e)
+            return False
+        if mtime == self._mtime:
+            return False
+        # an invalid file is not retried until it changes again
+        self._mtime = mtime
+        try:
+            rule_set = RuleSet.from_file(self._path, self._clock)
+        except Exception as e:
+            logger.error("Could not reload rule set %s: %s", self._path, e)
+            return False
+        self._rule_set = rule_set
+        logger.info("Loaded rule set %s version %s", self._path, rule_set.version)
+        return True
+
+    def calculate(self, user: UserModel) -> RiskModel:
+        self._check()
+        return self._rule_set.calculate(user)
+
+    def plans(self, user: UserModel) -> Tuple[str, str, str, str]:
+        self._check()
+        return self._rule_set.plans(user)
+
+    def score(self, user: UserModel) -> List[int]:
+        self._check()
+        return self._rule_set.score(user)
+
+    def explain(self, user: UserModel) -> Tuple[List[Dict], List[int]]:
+        self._check()
+        return self._rule_set.explain(user)
+
+    def canonical_key(self, user: UserModel) -> Tuple:
+        self._check()
+        return self._rule_set.canonical_key(user)
+
+    def _check(self) -> None:
+        if 0 < self._interval and self._next_check <= time.monotonic():
+            self._next_check = time.monotonic() + self._interval
+            self.reload()
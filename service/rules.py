@@ -1,8 +1,15 @@
-import datetime
-from typing import Dict
+from typing import Dict, List, Union
 import utils as utils
+from clock import Clock, SYSTEM_CLOCK
 from models.user_model import UserModel
 from models.risk_model import RiskModel
+from userRecord import AUTO, DISABILITY, HOME, LIFE, LINES, ELIGIBILITY, ALL_ELIGIBLE, UserRecord
+
+# eligibility bits of the lines of insurance
+_AUTO = 1 << AUTO
+_DISABILITY = 1 << DISABILITY
+_HOME = 1 << HOME
+_LIFE = 1 << LIFE
 
 
 class Rules:
@@ -15,13 +22,25 @@ class Rules:
     ----------
     user : UserModel
         A dictionary containing the user's answers to the risk questions.
-    score : dictionary
-        A dictionary containing the initial score for each line of insurance.
+        It is converted to a UserRecord, which the rules read.
+    score : dictionary or list
+        A dictionary containing the initial score for each line of insurance (None if ineligible),
+        or a score array (see userRecord.py), which is updated in place.
+    clock : Clock, optional
+        The date the rules are applied on (see clock.py). By default, the system clock.
 
     Methods
     -------
     apply_all_rules()
-        Calculate the risk profile based on payload and business rules
+        Calculate the risk profile based on payload and business rules.
+        The eligibility rules are applied first, and the rules that only change
+        lines of insurance that are already ineligible are skipped.
+
+    explain()
+        Applies the same rules as apply_all_rules, recording the changes each rule made to the score.
+        Returns:
+            A list with one step per applied rule, in order: the name of the rule, the points it added
+            to each eligible line of insurance (delta) and the lines of insurance it made ineligible.
 
     rule_risk_questions()
         It calculates the base score by summing the answers from the risk questions,
@@ -33,15 +52,11 @@ class Rules:
     rule_user_does_not_have_income_vehicle_or_house()
         Rule 1: If the user doesn’t have income, vehicles or houses, 
         she is ineligible for disability, auto, and home insurance, respectively.
-        Returns:
-            A dictionary containing the risk score for each line of insurance.
-            Obs: -99 indicates a ineligible line of insurance.
+        It clears their bits of the eligibility bitmask.
 
     rule_user_over_sixty_years()
         Rule 2: If the user is over 60 years old, she is ineligible for disability and life insurance.
-        Returns:
-            A dictionary containing the risk score for each line of insurance.
-            Obs: -99 indicates a ineligible line of insurance.
+        It clears their bits of the eligibility bitmask.
 
     rule_age_risk()
         Rule 3: If the user is under 30 years old, deduct 2 risk points from all lines of insurance. 
@@ -80,105 +95,176 @@ class Rules:
 
     Properties
     ----------
+    user : UserRecord
+        The user the rules are applied to. It can be replaced to reuse the same
+        instance for several users (see RiskTable).
     score : dictionary
-        A dictionary containing the risk score for each line of insurance.
+        A dictionary containing the risk score for each line of insurance, None for the ineligible ones.
+    scoreArray : list
+        The risk score of each line of insurance, indexed by AUTO, DISABILITY, HOME and LIFE,
+        and the eligibility bitmask, indexed by ELIGIBILITY.
     processedScore : RiskModel
         A RiskModel object containing the calculated risk score for each line of insurance.
     """
 
-    def __init__(self, user: UserModel, score) -> None:
-        self._user = user
-        self._score = score
+    # the rules in the order they are applied by apply_all_rules
+    RULES = (
+        "rule_user_over_sixty_years",
+        "rule_user_does_not_have_income_vehicle_or_house",
+        "rule_risk_questions",
+        "rule_vehicle_last_five_years",
+        "rule_user_is_married",
+        "rule_user_has_dependents",
+        "rule_user_s_house_is_mortgaged",
+        "rule_if_income_is_above_two_hundred_k",
+        "rule_age_risk",
+    )
+    # eligibility bits of the lines each scoring rule changes, the rule is skipped when none of them is set
+    RULE_LINES = {
+        "rule_risk_questions": ALL_ELIGIBLE,
+        "rule_vehicle_last_five_years": _AUTO,
+        "rule_user_is_married": _DISABILITY | _LIFE,
+        "rule_user_has_dependents": _DISABILITY | _LIFE,
+        "rule_user_s_house_is_mortgaged": _DISABILITY | _HOME,
+        "rule_if_income_is_above_two_hundred_k": ALL_ELIGIBLE,
+        "rule_age_risk": ALL_ELIGIBLE,
+    }
+
+    def __init__(self, user: UserModel, score: Union[Dict, List[int]], clock: Clock = None) -> None:
+        self.user = user
+        self.score = score
+        self._clock = SYSTEM_CLOCK if clock is None else clock
+
+    @property
+    def user(self) -> UserRecord:
+        return self._user
+
+    @user.setter
+    def user(self, user: UserModel) -> None:
+        self._user = None if user is None else UserRecord.from_user(user)
 
     @property
     def score(self) -> Dict:
+        return dict(zip(LINES, utils.numeric_score(self._score)))
+
+    @score.setter
+    def score(self, score: Union[Dict, List[int]]) -> None:
+        if isinstance(score, dict):
+            values = [score["auto"], score["disability"], score["home"], score["life"]]
+            eligible = 0
+            for line, value in enumerate(values):
+                if value is None:
+                    values[line] = 0
+                else:
+                    eligible |= 1 << line
+            values.append(eligible)
+            score = values
+        self._score = score
+
+    @property
+    def scoreArray(self) -> List[int]:
         return self._score
 
     @property
     def processedScore(self) -> RiskModel:
-        _output = RiskModel(
-            auto=utils.process(self._score['auto']),
-            disability=utils.process(self._score['disability']),
-            home=utils.process(self._score['home']),
-            life=utils.process(self._score['life'])
-        )
-        return _output
+        return utils.risk_model(utils.process_score(self._score))
 
     def apply_all_rules(self) -> None:
+        # Eligibility first, so the rules of the ineligible lines are skipped (see RULE_LINES)
+        self.rule_user_over_sixty_years()
+        self.rule_user_does_not_have_income_vehicle_or_house()
+        eligible = self._score[ELIGIBILITY]
+        if not eligible:
+            return
         # Calculate base score
         self.rule_risk_questions()
         # Apply other rules
-        self.rule_vehicle_last_five_years()
-        self.rule_user_is_married()
-        self.rule_user_has_dependents()
-        self.rule_user_s_house_is_mortgaged()
+        if eligible & _AUTO:
+            self.rule_vehicle_last_five_years()
+        if eligible & (_DISABILITY | _LIFE):
+            self.rule_user_is_married()
+            self.rule_user_has_dependents()
+        if eligible & (_DISABILITY | _HOME):
+            self.rule_user_s_house_is_mortgaged()
         self.rule_if_income_is_above_two_hundred_k()
         self.rule_age_risk()
-        self.rule_user_over_sixty_years()
-        self.rule_user_does_not_have_income_vehicle_or_house()
+
+    def explain(self) -> List[Dict]:
+        # slower than apply_all_rules, which is kept free of any tracing
+        steps = []
+        score = self._score
+        for name in self.RULES:
+            lines = self.RULE_LINES.get(name)
+            if lines is not None and not score[ELIGIBILITY] & lines:
+                continue
+            before = list(score)
+            getattr(self, name)()
+            steps.append(utils.explain_step(name, before, score))
+        return steps
 
     def rule_risk_questions(self) -> None:
         # calculates the base score by summing the answers from the risk questions
-        for risk in self._user['risk_questions']:
+        score = self._score
+        for risk in self._user.risk_questions:
             if risk == 1:
-                self._score["auto"] += 1
-                self._score["disability"] += 1
-                self._score["home"] += 1
-                self._score["life"] += 1
-        # return self.score
+                score[AUTO] += 1
+                score[DISABILITY] += 1
+                score[HOME] += 1
+                score[LIFE] += 1
 
     def rule_vehicle_last_five_years(self) -> None:
-        if self._user['vehicle'] is not None and self._user['vehicle']['year'] >= (datetime.datetime.now().year - 5):
-            self._score["auto"] += 1
+        vehicle_year = self._user.vehicle_year
+        if vehicle_year is not None and vehicle_year >= (self._clock.year - 5):
+            self._score[AUTO] += 1
 
     def rule_user_is_married(self) -> None:
-        if self._user['marital_status'] == 'married':
-            self._score["life"] += 1
-            self._score["disability"] -= 1
+        if self._user.marital_status == 'married':
+            self._score[LIFE] += 1
+            self._score[DISABILITY] -= 1
 
     def rule_user_has_dependents(self) -> None:
-        """
-        """
-        if self._user['dependents'] > 0:
-            self._score["disability"] += 1
-            self._score["life"] += 1
-
+        if self._user.dependents > 0:
+            self._score[DISABILITY] += 1
+            self._score[LIFE] += 1
 
     def rule_user_s_house_is_mortgaged(self) -> None:
-        if self._user['house'] is not None and self._user['house']['ownership_status'] == 'mortgaged':
-            self._score["home"] += 1
-            self._score["disability"] += 1
+        if self._user.ownership_status == 'mortgaged':
+            self._score[HOME] += 1
+            self._score[DISABILITY] += 1
 
     def rule_if_income_is_above_two_hundred_k(self) -> None:
-        if self._user['income'] > 200000:
-            self._score["auto"] -= 1
-            self._score["disability"] -= 1
-            self._score["home"] -= 1
-            self._score["life"] -= 1
+        if self._user.income > 200000:
+            score = self._score
+            score[AUTO] -= 1
+            score[DISABILITY] -= 1
+            score[HOME] -= 1
+            score[LIFE] -= 1
 
     def rule_age_risk(self) -> None:
+        age = self._user.age
+        score = self._score
         # If the user is under 30 years old, deduct 2 risk points from all lines of insurance.
-        if self._user['age'] < 30:
-            self._score["auto"] -= 2
-            self._score["disability"] -= 2
-            self._score["home"] -= 2
-            self._score["life"] -= 2
+        if age < 30:
+            score[AUTO] -= 2
+            score[DISABILITY] -= 2
+            score[HOME] -= 2
+            score[LIFE] -= 2
         # If she is between 30 and 40 years old, deduct 1.
-        elif 30 <= self._user['age'] <= 40:
-            self._score["auto"] -= 1
-            self._score["disability"] -= 1
-            self._score["home"] -= 1
-            self._score["life"] -= 1
+        elif 30 <= age <= 40:
+            score[AUTO] -= 1
+            score[DISABILITY] -= 1
+            score[HOME] -= 1
+            score[LIFE] -= 1
 
     def rule_user_over_sixty_years(self) -> None:
-        if self._user['age'] > 60:
-            self._score["disability"] = -99
-            self._score["life"] = -99
+        if self._user.age > 60:
+            self._score[ELIGIBILITY] &= ~(_DISABILITY | _LIFE)
 
     def rule_user_does_not_have_income_vehicle_or_house(self) -> None:
-        if self._user['income'] == 0:
-            self._score["disability"] = -99
-        if self._user['vehicle'] is None:
-            self._score["auto"] = -99
-        if self._user['house'] is None:
-            self._score["home"] = -99
+        score = self._score
+        if self._user.income == 0:
+            score[ELIGIBILITY] &= ~_DISABILITY
+        if self._user.vehicle_year is None:
+            score[ELIGIBILITY] &= ~_AUTO
+        if self._user.ownership_status is None:
+            score[ELIGIBILITY] &= ~_HOME
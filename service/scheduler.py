@@ -0,0 +1,194 @@
+import asyncio
+import datetime
+from concurrent.futures import Executor
+from typing import Any, Dict, List, Optional, Tuple, Union
+import fastPath
+import utils as utils
+from clock import Clock
+from engines import RISK_ENGINE, build_engine, build_engine_as_of
+from models.risk_model import BatchRiskItem
+
+# engine of the pool processes and its name, see _init_worker
+_engine = None
+_engine_name = RISK_ENGINE
+
+
+class Overloaded(Exception):
+    """
+    Raised when a batch would exceed the maximum number of pending chunks of the Scheduler
+    """
+
+
+def _init_worker(engine_name: str) -> None:
+    global _engine, _engine_name
+    _engine = build_engine(engine_name)
+    _engine_name = engine_name
+
+
+# the plans or the validation errors of a user
+Result = Union[Tuple[str, str, str, str], List[Dict]]
+
+
+def score_users(task: Tuple[List[Any], Optional[datetime.date]]) -> Tuple[List[Result], List[str]]:
+    """
+    Calculates the plans of a chunk of raw users in a pool process, with the engine of the process
+    or, with an as-of date, the same kind of engine built for that date. Returns the plans or the validation
+    errors of each user, and the versions of the rule set of the engine that scored them (each process
+    reloads its rule set on its own)
+    """
+    users, as_of = task
+    engine, clock = (_engine, None) if as_of is None else build_engine_as_of(_engine_name, as_of)
+    return _score_users(users, engine, clock)
+
+
+def _score_users(users: List[Any], engine=None, clock: Clock = None) -> Tuple[List[Result], List[str]]:
+    # the batches scored inline and the chunks of the pool are validated alike, so the errors of a user
+    # do not depend on the size of its batch
+    results = []
+    versions = []
+    for user in users:
+        user, errors = fastPath.check_user(user, ())
+        if errors:
+            results.append(errors)
+            continue
+        results.append(fastPath.plans(user, engine, clock))
+        # read after scoring, a reloadable engine may have swapped its rule set
+        version = getattr(engine, "version", None)
+        if version is not None and version not in versions:
+            versions.append(version)
+    return results, versions
+
+
+def _items(results: List[Result]) -> List[BatchRiskItem]:
+    return [BatchRiskItem(detail=result) if isinstance(result, list)
+            else BatchRiskItem(result=utils.risk_model(result)) for result in results]
+
+
+def _version(versions: List[str]) -> Optional[str]:
+    # the versions of the rule set that scored a batch, in order. More than one when a new rule set was
+    # deployed while it was scored (e.g. its chunks were scored by processes that reloaded it at different times)
+    return ", ".join(versions) if versions else None
+
+
+class Scheduler:
+    """
+    Scores the batches of the API without blocking the event loop.
+
+    Small batches are scored inline, since sending them to another process costs more than scoring them.
+    Both are validated by fastPath.check_user, so a user gets the same errors whatever the size of its batch. Larger batches are split in chunks that are scored by a pool of processes and awaited, so
+    the event loop keeps answering the other requests (e.g. single users) while they run. At most
+    `concurrency` chunks are sent to the pool at once, and the chunks of concurrent batches take turns.
+    When `max_pending` chunks of other batches are already waiting or running, the batch is rejected (Overloaded),
+    answered with a 429 status code. A batch is never rejected for its own size, the semaphore limits its chunks.
+
+    ...
+
+    Attributes
+    ----------
+    workers : int
+        processes of the pool, started with the first large batch. With 0, every batch is scored inline
+    engine_name : str
+        scoring engine of the pool processes (see engines.py)
+    inline_limit : int
+        batches of up to this number of users are scored inline
+    chunk_size : int
+        number of users sent at once to a process
+    concurrency : int, optional
+        maximum number of chunks sent to the pool at once. By default, twice the number of processes
+    max_pending : int
+        number of chunks waiting or running from which new batches are rejected
+
+    Methods
+    -------
+    score(users, engine, clock)
+        Awaits the BatchRiskItem of each user, in the same order, and the versions of the rule set that scored them
+        (comma separated, None without rule set). Raises Overloaded when it is full
+
+    close()
+        Stops the pool
+
+    Properties
+    ----------
+    stats : dictionary
+        pending chunks and counters of batches scored inline, offloaded and rejected
+    """
+
+    def __init__(self, workers: int = 2, engine_name: str = RISK_ENGINE, inline_limit: int = 100,
+                 chunk_size: int = 1000, concurrency: int = None, max_pending: int = 64) -> None:
+        if workers < 0:
+            raise ValueError('Invalid number of workers')
+        if chunk_size < 1:
+            raise ValueError('Invalid chunk size')
+        self._workers = workers
+        self._engine_name = engine_name
+        self._inline_limit = inline_limit
+        self._chunk_size = chunk_size
+        self._concurrency = concurrency or 2 * max(workers, 1)
+        self._max_pending = max_pending
+        self._pool = None
+        self._semaphore = None
+        self._semaphore_loop = None
+        self._pending = 0
+        self.inline = 0
+        self.offloaded = 0
+        self.rejected = 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": self._pending,
+            "inline": self.inline,
+            "offloaded": self.offloaded,
+            "rejected": self.rejected
+        }
+
+    async def score(self, users: List[Any], engine=None,
+                    clock: Clock = None) -> Tuple[List[BatchRiskItem], Optional[str]]:
+        if self._workers == 0 or len(users) <= self._inline_limit:
+            self.inline += 1
+            results, versions = _score_users(users, engine, clock)
+            return _items(results), _version(versions)
+
+        size = self._chunk_size
+        chunks = [users[i:i + size] for i in range(0, len(users), size)]
+        if self._pending >= self._max_pending:
+            self.rejected += 1
+            raise Overloaded('Too many pending batches')
+        self.offloaded += 1
+        self._pending += len(chunks)
+        as_of = None if clock is None else clock.today()
+        # a chunk that was not started yet is cancelled with the others (e.g. the client went away)
+        chunk_results = await asyncio.gather(*(self._score_chunk(chunk, as_of) for chunk in chunks))
+        versions = []
+        for _, chunk_versions in chunk_results:
+            versions.extend(version for version in chunk_versions if version not in versions)
+        return [item for items, _ in chunk_results for item in items], _version(versions)
+
+    async def _score_chunk(self, chunk: List[Any],
+                           as_of: Optional[datetime.date]) -> Tuple[List[BatchRiskItem], List[str]]:
+        try:
+            loop = asyncio.get_running_loop()
+            # the semaphore belongs to the event loop it was first used in (tests run several loops)
+            if self._semaphore is None or self._semaphore_loop is not loop:
+                self._semaphore = asyncio.Semaphore(self._concurrency)
+                self._semaphore_loop = loop
+            async with self._semaphore:
+                results, versions = await loop.run_in_executor(self._executor(), score_users, (chunk, as_of))
+        finally:
+            self._pending -= 1
+        return _items(results), versions
+
+    def _executor(self) -> Executor:
+        if self._pool is None:
+            # imported with the first large batch, most workers never start the pool
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # spawned, the server process has threads that must not be forked
+            self._pool = ProcessPoolExecutor(self._workers, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_init_worker, initargs=(self._engine_name,))
+        return self._pool
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,135 @@
+import mmap
+import os
+import struct
+import tempfile
+from typing import Dict, Tuple
+from models.user_model import UserModel
+from models.risk_model import RiskModel
+from riskTable import RiskTable, bucket_key
+from clock import Clock, SYSTEM_CLOCK
+
+PLANS = ("ineligible", "economic", "regular", "responsible")
+
+# file layout: header (magic, year, rows) followed by 4 bytes per class of users,
+# with the index in PLANS of the auto, disability, home and life plans
+MAGIC = b"RISKTBL1"
+HEADER = struct.Struct("<8sII")
+ROW_SIZE = 4
+
+DEFAULT_PATH = os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+                            "riskprofile-table.bin")
+
+
+class SharedRiskTable:
+    """
+    A RiskTable shared by all the processes of a host through a memory-mapped file.
+
+    The table is published once (e.g. by the gunicorn master, see gunicorn_conf.py) and every worker maps
+    the same file read-only, so there is a single copy in memory and lookups need no locks.
+    Publishing writes a temporary file and renames it, so readers always see a complete table.
+    A worker that finds no table, or a table of another year, publishes it itself.
+
+    ...
+
+    Attributes
+    ----------
+    path : str
+        file of the shared table
+    clock : Clock, optional
+        the date the rules are applied on (see clock.py). By default, the system clock
+
+    Methods
+    -------
+    publish(path, clock)
+        Calculates the table of the current year of the clock and writes it to the file
+
+    calculate(user)
+        Returns the RiskModel of the user, read from the shared table
+
+    plans(user)
+        Returns the plans (auto, disability, home, life) of the user, read from the shared table
+
+    Properties
+    ----------
+    year : int
+        year of the mapped table
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, clock: Clock = None) -> None:
+        self._path = path
+        self._clock = SYSTEM_CLOCK if clock is None else clock
+        self._mmap = None
+        self._year = None
+        # the 256 possible rows, decoded once per process
+        self._rows: Dict[bytes, Tuple[RiskModel, Tuple[str, str, str, str]]] = {}
+        self._attach()
+
+    @property
+    def year(self) -> int:
+        return self._year
+
+    @staticmethod
+    def publish(path: str = DEFAULT_PATH, clock: Clock = None) -> None:
+        table = RiskTable(clock)
+        rows = bytearray(HEADER.pack(MAGIC, table.year, table.size))
+        for plans in table.plansTable:
+            rows.extend(PLANS.index(plan) for plan in plans)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".riskprofile-table-")
+        try:
+            # readable by workers running as another user
+            os.fchmod(fd, 0o644)
+            with os.fdopen(fd, "wb") as f:
+                f.write(rows)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _read(self):
+        with open(self._path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(mapped) < HEADER.size:
+            mapped.close()
+            return None, None
+        magic, year, rows = HEADER.unpack_from(mapped)
+        if magic != MAGIC or len(mapped) != HEADER.size + rows * ROW_SIZE:
+            mapped.close()
+            return None, None
+        return mapped, year
+
+    def _attach(self) -> None:
+        current_year = self._clock.year
+        mapped = None
+        try:
+            mapped, year = self._read()
+        except (FileNotFoundError, ValueError):
+            # no table yet, or an empty file
+            year = None
+        if year != current_year:
+            if mapped is not None:
+                mapped.close()
+            self.publish(self._path, self._clock)
+            mapped, year = self._read()
+
+        # the previous map is left to the garbage collector, requests may still be reading it
+        self._mmap, self._year = mapped, year
+
+    def _row(self, user: UserModel) -> Tuple[RiskModel, Tuple[str, str, str, str]]:
+        if self._clock.year != self._year:
+            self._attach()
+        offset = HEADER.size + bucket_key(user, self._year) * ROW_SIZE
+        row = self._mmap[offset:offset + ROW_SIZE]
+        decoded = self._rows.get(row)
+        if decoded is None:
+            plans = (PLANS[row[0]], PLANS[row[1]], PLANS[row[2]], PLANS[row[3]])
+            decoded = RiskModel(auto=plans[0], disability=plans[1], home=plans[2], life=plans[3]), plans
+            self._rows[row] = decoded
+        return decoded
+
+    def calculate(self, user: UserModel) -> RiskModel:
+        return self._row(user)[0]
+
+    def plans(self, user: UserModel) -> Tuple[str, str, str, str]:
+        return self._row(user)[1]
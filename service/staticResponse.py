@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import sys
+from typing import Callable, Optional
+from starlette.types import Receive, Scope, Send
+
+
+class StaticResponse:
+    """
+    ASGI app answering every GET (and HEAD) request with the same pre-encoded body, with an ETag and a
+    Cache-Control header. Requests whose If-None-Match has the ETag get a 304 status code without the body.
+
+    The body is given, or built by `build` on the first request (e.g. the OpenAPI schema, which needs every route
+    of the app), and then kept, so nothing is generated or encoded again.
+
+    ...
+
+    Attributes
+    ----------
+    body : bytes, optional
+        body of the responses
+    build : callable, optional
+        returns the body, called once when no body is given
+    media_type : str
+        content type of the responses
+    max_age : int
+        seconds the clients can keep the response without asking again
+
+    Properties
+    ----------
+    body : bytes
+        body of the responses, built if it was not yet
+    etag : str
+        ETag of the body
+    """
+
+    def __init__(self, body: bytes = None, build: Callable[[], bytes] = None, media_type: str = "application/json",
+                 max_age: int = 300) -> None:
+        if body is None and build is None:
+            raise ValueError('A body or a function building it is required')
+        self._build = build
+        self._media_type = media_type
+        self._max_age = max_age
+        self._body: Optional[bytes] = None
+        self._etag: Optional[str] = None
+        self._headers = None
+        if body is not None:
+            self._set(body)
+
+    @property
+    def body(self) -> bytes:
+        if self._body is None:
+            self._set(self._build())
+        return self._body
+
+    @property
+    def etag(self) -> str:
+        if self._body is None:
+            self._set(self._build())
+        return self._etag
+
+    def _set(self, body: bytes) -> None:
+        self._body = body
+        self._etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        etag = self._etag.encode()
+        cache_control = f"public, max-age={self._max_age}".encode()
+        self._headers = (
+            [(b"content-type", self._media_type.encode()), (b"content-length", str(len(body)).encode()),
+             (b"etag", etag), (b"cache-control", cache_control)],
+            [(b"etag", etag), (b"cache-control", cache_control)]
+        )
+
+    def _not_modified(self, scope: Scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == b"if-none-match":
+                tags = [tag.strip() for tag in value.decode("latin-1").split(",")]
+                return "*" in tags or self._etag in tags or "W/" + self._etag in tags
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        body = self.body
+        if self._not_modified(scope):
+            await send({"type": "http.response.start", "status": 304, "headers": self._headers[1]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await send({"type": "http.response.start", "status": 200, "headers": self._headers[0]})
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else body})
+
+
+def encode_json(content) -> bytes:
+    # the same encoding of the JSONResponse of Starlette
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def openapi_schema(app, path: str = None) -> bytes:
+    """
+    Returns the encoded OpenAPI schema of the app, read from the file written by the build step when there is one,
+    otherwise generated
+    """
+    if path is not None and os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    return encode_json(app.openapi())
+
+
+if __name__ == "__main__":
+    # build step: python staticResponse.py openapi.json
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python staticResponse.py <OpenAPI file>")
+    from main import app
+    with open(sys.argv[1], "wb") as output:
+        output.write(encode_json(app.openapi()))
@@ -0,0 +1,116 @@
+from typing import Any, List
+
+# positions of the lines of insurance in a score array
+AUTO = 0
+DISABILITY = 1
+HOME = 2
+LIFE = 3
+LINES = ("auto", "disability", "home", "life")
+# position of the eligibility bitmask in a score array: bit 1 << line is set while the line is eligible
+ELIGIBILITY = 4
+ALL_ELIGIBLE = 0b1111
+
+
+def new_score() -> List[int]:
+    """
+    Returns a clean score array: a list with the score of each line of insurance, indexed by AUTO, DISABILITY, HOME and LIFE,
+    followed by the eligibility bitmask (index ELIGIBILITY), with every line eligible
+    """
+    return [0, 0, 0, 0, ALL_ELIGIBLE]
+
+
+def _value(value: Any) -> Any:
+    # the value of an enumeration member (e.g. MaritalStatus.married), or the value itself
+    return getattr(value, "value", value)
+
+
+def _field(value: Any, name: str) -> Any:
+    # a field of a house or vehicle (dictionary or model). Missing fields are replaced
+    # by an empty string, so they are reported as invalid by the Validator
+    if isinstance(value, dict):
+        return value.get(name, "")
+    return _value(getattr(value, name, ""))
+
+
+class UserRecord:
+    """
+    Lean internal representation of a user's risk profile, used by Rules and Validator.
+    The fields are slots read as attributes, instead of the nested dictionaries or Pydantic models
+    received by the API, which are converted once with from_user.
+    Attributes of a dictionary without them are left unset (e.g. when only some rules are applied).
+
+    ...
+
+    Attributes
+    ----------
+    age : int
+    dependents : int
+    income : int
+    marital_status : str
+        "single" or "married"
+    ownership_status : str
+        ownership status of the user's house, None if the user has no house
+    vehicle_year : int
+        year the user's vehicle was manufactured, None if the user has no vehicle
+    risk_questions : list
+        the answers to the risk questions
+
+    Methods
+    -------
+    from_user(user)
+        Converts a user (dictionary, UserModel or UserRecord) to a UserRecord
+    """
+
+    __slots__ = ("age", "dependents", "income", "marital_status", "ownership_status", "vehicle_year", "risk_questions")
+
+    def __init__(self, age: int, dependents: int, income: int, marital_status: str, ownership_status: str,
+                 vehicle_year: int, risk_questions: List[int]) -> None:
+        self.age = age
+        self.dependents = dependents
+        self.income = income
+        self.marital_status = marital_status
+        self.ownership_status = ownership_status
+        self.vehicle_year = vehicle_year
+        self.risk_questions = risk_questions
+
+    @classmethod
+    def from_user(cls, user: Any) -> "UserRecord":
+        if user.__class__ is cls:
+            return user
+        if not isinstance(user, dict):
+            house = user.house
+            vehicle = user.vehicle
+            return cls(user.age, user.dependents, user.income, _value(user.marital_status),
+                       None if house is None else _field(house, "ownership_status"),
+                       None if vehicle is None else _field(vehicle, "year"),
+                       user.risk_questions)
+
+        house = user.get("house")
+        ownership_status = None if house is None else _field(house, "ownership_status")
+        vehicle = user.get("vehicle")
+        vehicle_year = None if vehicle is None else _field(vehicle, "year")
+        try:
+            return cls(user["age"], user["dependents"], user["income"], user["marital_status"],
+                       ownership_status, vehicle_year, user["risk_questions"])
+        except KeyError:
+            pass
+        record = cls.__new__(cls)
+        for name in ("age", "dependents", "income", "marital_status", "risk_questions"):
+            if name in user:
+                setattr(record, name, user[name])
+        record.ownership_status = ownership_status
+        record.vehicle_year = vehicle_year
+        return record
+
+    def __getitem__(self, item: str) -> Any:
+        # same fields of UserModel, for the engines that read users as dictionaries
+        if item == "house":
+            return None if self.ownership_status is None else {"ownership_status": self.ownership_status}
+        if item == "vehicle":
+            return None if self.vehicle_year is None else {"year": self.vehicle_year}
+        if item not in self.__slots__:
+            raise KeyError(item)
+        try:
+            return getattr(self, item)
+        except AttributeError:
+            raise KeyError(item) from None
@@ -0,0 +1,175 @@
+import os
+import shutil
+import struct
+import tempfile
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+from models.user_model import UserModel
+from vectorizedRules import HOUSE_NONE, HOUSE_OWNED, HOUSE_MORTGAGED, NO_VEHICLE
+
+# file layout: header (magic, rows) followed by one fixed-width column per attribute,
+# each one starting at a multiple of 8 bytes. The columns have the encodings of VectorizedRules
+MAGIC = b"RISKUSR1"
+HEADER = struct.Struct("<8sQ")
+ALIGNMENT = 8
+COLUMNS: Tuple[Tuple[str, np.dtype, int], ...] = (
+    ("age", np.dtype("u1"), 1),
+    ("dependents", np.dtype("u1"), 1),
+    ("income", np.dtype("<u4"), 1),
+    ("married", np.dtype("?"), 1),
+    ("house", np.dtype("i1"), 1),
+    ("vehicle_year", np.dtype("<i2"), 1),
+    ("risk_questions", np.dtype("u1"), 3),
+)
+ROW_SIZE = sum(dtype.itemsize * width for _, dtype, width in COLUMNS)
+
+
+def _fits(user: UserModel) -> bool:
+    # the attributes of a valid user that do not fit in the columns
+    return (user['age'] <= 255 and user['dependents'] <= 255 and user['income'] < 2 ** 32
+            and (user['vehicle'] is None or user['vehicle']['year'] < 2 ** 15))
+
+
+def _column_offsets(rows: int) -> List[int]:
+    offsets = []
+    offset = HEADER.size
+    for _, dtype, width in COLUMNS:
+        offset += -offset % ALIGNMENT
+        offsets.append(offset)
+        offset += dtype.itemsize * width * rows
+    return offsets
+
+
+class UserSnapshotWriter:
+    """
+    Writes valid users to a snapshot file: a fixed-width binary columnar format that can be
+    memory-mapped and scored by VectorizedRules without parsing or copying (see read_snapshot).
+    Each user takes ROW_SIZE (13) bytes.
+
+    Users are appended in chunks, each column to its own temporary file, and the columns are
+    joined when the writer is closed, so the memory used does not depend on the number of users.
+
+    ...
+
+    Attributes
+    ----------
+    path : str
+        snapshot file
+
+    Methods
+    -------
+    write(users)
+        Appends valid users (dictionaries or UserModel objects). Returns the number of users that
+        were skipped because an attribute does not fit in its column
+
+    close()
+        Writes the snapshot file
+
+    Properties
+    ----------
+    rows : int
+        number of users written
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._rows = 0
+        self._directory = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".riskprofile-snapshot-")
+        self._columns = [open(os.path.join(self._directory, name), "wb") for name, _, _ in COLUMNS]
+
+    @property
+    def rows(self) -> int:
+        return self._rows
+
+    def write(self, users: Iterable[UserModel]) -> int:
+        columns: Tuple[list, ...] = ([], [], [], [], [], [], [])
+        age, dependents, income, married, house, vehicle_year, risk_questions = columns
+        skipped = 0
+        for user in users:
+            if not _fits(user):
+                skipped += 1
+                continue
+            age.append(user['age'])
+            dependents.append(user['dependents'])
+            income.append(user['income'])
+            married.append(user['marital_status'] == 'married')
+            if user['house'] is None:
+                house.append(HOUSE_NONE)
+            elif user['house']['ownership_status'] == 'mortgaged':
+                house.append(HOUSE_MORTGAGED)
+            else:
+                house.append(HOUSE_OWNED)
+            vehicle_year.append(NO_VEHICLE if user['vehicle'] is None else user['vehicle']['year'])
+            risk_questions.extend(user['risk_questions'])
+
+        for f, values, (_, dtype, _) in zip(self._columns, columns, COLUMNS):
+            f.write(np.array(values, dtype=dtype).tobytes())
+        self._rows += len(age)
+        return skipped
+
+    def close(self) -> None:
+        for f in self._columns:
+            f.close()
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self._path)), prefix=".riskprofile-snapshot-")
+        try:
+            os.fchmod(fd, 0o644)
+            with os.fdopen(fd, "wb") as output:
+                output.write(HEADER.pack(MAGIC, self._rows))
+                for offset, (name, _, _) in zip(_column_offsets(self._rows), COLUMNS):
+                    output.write(b"\0" * (offset - output.tell()))
+                    with open(os.path.join(self._directory, name), "rb") as column:
+                        shutil.copyfileobj(column, output)
+            os.replace(tmp, self._path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        finally:
+            shutil.rmtree(self._directory)
+
+    def __enter__(self) -> "UserSnapshotWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if exc[0] is None:
+            self.close()
+        else:
+            for f in self._columns:
+                f.close()
+            shutil.rmtree(self._directory)
+
+
+def read_snapshot(path: str, start: int = 0, stop: int = None) -> Dict[str, np.ndarray]:
+    """
+    Memory-maps the users of a snapshot file, without reading or copying them
+    Args:
+        path: snapshot file
+        start: first user
+        stop: user after the last one, None for the end of the file
+    Returns:
+        a dictionary with one read-only array per column, the arguments of VectorizedRules
+    Raises:
+        ValueError if the file is not a snapshot
+    """
+    rows = snapshot_rows(path)
+    stop = rows if stop is None else min(stop, rows)
+    start = min(start, stop)
+    columns = {}
+    for offset, (name, dtype, width) in zip(_column_offsets(rows), COLUMNS):
+        if start == stop:
+            columns[name] = np.zeros((0, width) if width > 1 else 0, dtype=dtype)
+            continue
+        shape = (stop - start, width) if width > 1 else (stop - start,)
+        columns[name] = np.memmap(path, dtype=dtype, mode="r", offset=offset + start * dtype.itemsize * width,
+                                  shape=shape)
+    return columns
+
+
+def snapshot_rows(path: str) -> int:
+    """
+    Returns the number of users of a snapshot file
+    """
+    with open(path, "rb") as f:
+        magic, rows = HEADER.unpack(f.read(HEADER.size).ljust(HEADER.size, b"\0"))
+    if magic != MAGIC:
+        raise ValueError('Invalid snapshot file')
+    return rows
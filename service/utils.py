@@ -1,8 +1,14 @@
-def process(value: int) -> str:
+from itertools import product
+from typing import Dict, List, Optional, Tuple
+from models.risk_model import RiskModel
+from userRecord import ELIGIBILITY, LINES
+
+
+def process(value: Optional[int]) -> str:
     """
     This algorithm results in a final score for each line of insurance, 
     which should be processed using the following ranges:
-    -99 maps to "ineligible"
+    None (no score, the line is ineligible) maps to "ineligible"
     0 and below maps to "economic"
     1 and 2 maps to "regular"
     3 and above maps to "responsible"
@@ -11,7 +17,7 @@ def process(value: int) -> str:
     Returns:
         the processed value (string)
     """
-    if value == -99:
+    if value is None:
         return "ineligible"
     elif value <= 0:
         return "economic"
@@ -21,3 +27,96 @@ def process(value: int) -> str:
         return "responsible"
     else:
         return "error"
+
+
+def process_score(score: List[int]) -> Tuple[str, str, str, str]:
+    """
+    Processes a score array (see userRecord.py)
+    Args:
+        score (list): the score of each line of insurance (auto, disability, home, life) and the eligibility bitmask
+    Returns:
+        the processed values (strings) of the auto, disability, home and life lines
+    """
+    eligible = score[ELIGIBILITY]
+    return (process(score[0]) if eligible & 1 else "ineligible",
+            process(score[1]) if eligible & 2 else "ineligible",
+            process(score[2]) if eligible & 4 else "ineligible",
+            process(score[3]) if eligible & 8 else "ineligible")
+
+
+def numeric_score(score: List[int]) -> Tuple[Optional[int], Optional[int], Optional[int], Optional[int]]:
+    """
+    Returns the scores of a score array (see userRecord.py) before processing
+    Args:
+        score (list): the score of each line of insurance (auto, disability, home, life) and the eligibility bitmask
+    Returns:
+        the scores of the auto, disability, home and life lines, None for the ineligible ones
+    """
+    eligible = score[ELIGIBILITY]
+    return (score[0] if eligible & 1 else None,
+            score[1] if eligible & 2 else None,
+            score[2] if eligible & 4 else None,
+            score[3] if eligible & 8 else None)
+
+
+def explain_step(rule: str, before: List[int], after: List[int]) -> Dict:
+    """
+    Describes the changes a rule made to a score array (see userRecord.py), a step of an explanation
+    Args:
+        rule (str): the name of the rule
+        before (list): the score array before the rule
+        after (list): the score array after the rule
+    Returns:
+        the name of the rule, the points it added to each eligible line of insurance (delta)
+        and the lines of insurance it made ineligible
+    """
+    eligible_before = before[ELIGIBILITY]
+    eligible = after[ELIGIBILITY]
+    delta = {}
+    ineligible = []
+    for i, line in enumerate(LINES):
+        bit = 1 << i
+        if not eligible & bit:
+            if eligible_before & bit:
+                ineligible.append(line)
+        elif after[i] != before[i]:
+            delta[line] = after[i] - before[i]
+    return {"rule": rule, "delta": delta, "ineligible": ineligible}
+
+
+# one RiskModel per combination of plans, they are never modified
+_risk_models: Dict[Tuple[str, str, str, str], RiskModel] = {}
+
+
+def risk_model(plans: Tuple[str, str, str, str]) -> RiskModel:
+    """
+    Returns the RiskModel of the plans (auto, disability, home, life).
+    There are only 256 combinations of plans, so the RiskModel objects are built once and shared.
+    Args:
+        plans (tuple): the processed values of the auto, disability, home and life lines
+    Returns:
+        the RiskModel object
+    """
+    model = _risk_models.get(plans)
+    if model is None:
+        model = _risk_models[plans] = RiskModel(auto=plans[0], disability=plans[1], home=plans[2], life=plans[3])
+    return model
+
+
+# the JSON body of /api/risk/ for each combination of plans, encoded as FastAPI does (no spaces)
+_encoded_plans: Dict[Tuple[str, str, str, str], bytes] = {
+    plans: ('{"auto":"%s","disability":"%s","home":"%s","life":"%s"}' % plans).encode()
+    for plans in product(("ineligible", "economic", "regular", "responsible"), repeat=4)
+}
+
+
+def encode_plans(plans: Tuple[str, str, str, str]) -> bytes:
+    """
+    Returns the JSON of the RiskModel of the plans (auto, disability, home, life), the response body of /api/risk/.
+    The 256 combinations of plans are encoded once, so no RiskModel is built nor serialized.
+    Args:
+        plans (tuple): the processed values of the auto, disability, home and life lines
+    Returns:
+        the JSON document (bytes)
+    """
+    return _encoded_plans[plans]
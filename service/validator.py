@@ -1,4 +1,5 @@
 from models.user_model import UserModel
+from userRecord import UserRecord
 
 
 class Validator:
@@ -11,6 +12,13 @@ class Validator:
     ----------
     user : (UserModel)
         A dictionary containing the user's answers to the risk questions.
+        It is converted to a UserRecord, which is validated.
+
+    Properties
+    ----------
+    user : UserRecord
+        The user being validated. It can be replaced to reuse the same
+        instance for several users.
 
     Methods
     -------
@@ -73,7 +81,15 @@ class Validator:
     """
 
     def __init__(self, user: UserModel) -> None:
-        self._user = user
+        self.user = user
+
+    @property
+    def user(self) -> UserRecord:
+        return self._user
+
+    @user.setter
+    def user(self, user: UserModel) -> None:
+        self._user = UserRecord.from_user(user)
 
     def validate_all(self) -> None:
         # check if all required attributes are submitted
@@ -82,68 +98,62 @@ class Validator:
         # validate all the items on the risk profile
         self.validate_age()
         self.validate_dependents()
-        if self._user['house'] is not None:
+        if self._user.ownership_status is not None:
             self.validate_house()
         self.validate_income()
         self.validate_marital_status()
         self.validate_risk_questions()
-        if self._user['vehicle'] is not None:
+        if self._user.vehicle_year is not None:
             self.validate_vehicle()
 
     def validate_required_attributes_in_user(self) -> bool:
         required_attributes = ["age", "dependents", "income", "marital_status", "risk_questions"]
         for attribute in required_attributes:
-            try:
-                t = self._user[attribute]
-            except KeyError:
+            # attributes missing from the user are unset in the record
+            if not hasattr(self._user, attribute):
                 raise ValueError(f'Missing required attribute {attribute}')
         return True
 
     def validate_risk_questions(self) -> bool:
-        risk_questions = self._user['risk_questions']
+        risk_questions = self._user.risk_questions
         if len(risk_questions) != 3:
             raise ValueError('Invalid number of risk questions')
-        for i in range(len(risk_questions)):
-            if risk_questions[i] != 0 and risk_questions[i] != 1:
+        for answer in risk_questions:
+            if answer != 0 and answer != 1:
                 raise ValueError('Invalid risk answer')
         return True
 
     def validate_age(self) -> bool:
-        age = self._user['age']
-        if age < 0:
+        if self._user.age < 0:
             raise ValueError('Invalid age')
         return True
 
     def validate_dependents(self) -> bool:
-        dependents = self._user['dependents']
-        if dependents < 0:
+        if self._user.dependents < 0:
             raise ValueError('Invalid number of dependents')
         return True
 
     def validate_house(self) -> bool:
-        house = self._user['house']
-        if house['ownership_status'] != 'owned' and house['ownership_status'] != 'mortgaged':
+        ownership_status = self._user.ownership_status
+        if ownership_status != 'owned' and ownership_status != 'mortgaged':
             raise ValueError('Invalid house ownership status')
         return True
 
     def validate_income(self) -> bool:
-        income=self._user['income']
-        if income < 0:
+        if self._user.income < 0:
             raise ValueError('Invalid income')
         return True
 
-
     def validate_marital_status(self) -> bool:
-        marital_status = self._user['marital_status']
+        marital_status = self._user.marital_status
         if marital_status != 'married' and marital_status != 'single':
             raise ValueError('Invalid marital status')
         return True
 
-
     def validate_vehicle(self) -> bool:
-        vehicle = self._user['vehicle']
-        if not isinstance(vehicle['year'], int):
+        vehicle_year = self._user.vehicle_year
+        if not isinstance(vehicle_year, int):
             raise ValueError('Invalid vehicle year')
-        elif vehicle['year'] < 0:
+        elif vehicle_year < 0:
             raise ValueError('Invalid vehicle year')
         return True
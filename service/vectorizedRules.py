@@ -0,0 +1,171 @@
+from typing import Dict, Iterable
+import numpy as np
+from clock import Clock, SYSTEM_CLOCK
+from models.user_model import UserModel
+
+# column encodings
+HOUSE_NONE = 0
+HOUSE_OWNED = 1
+HOUSE_MORTGAGED = 2
+NO_VEHICLE = -1
+
+LINES = ("auto", "disability", "home", "life")
+PLANS = np.array(["ineligible", "economic", "regular", "responsible"])
+
+
+def process_codes(values: np.ndarray, eligible: np.ndarray = None) -> np.ndarray:
+    """
+    Vectorized version of utils.process returning the index of the plan in PLANS
+    Args:
+        values (np.ndarray): the scores to be processed
+        eligible (np.ndarray): True where the line of insurance is eligible, None if all are
+    Returns:
+        an int8 array with 0 (ineligible), 1 (economic), 2 (regular) or 3 (responsible)
+    """
+    values = np.asarray(values)
+    codes = np.where(values <= 0, 1, np.where(values <= 2, 2, 3)).astype(np.int8)
+    if eligible is not None:
+        codes[~np.asarray(eligible)] = 0
+    return codes
+
+
+def process_array(values: np.ndarray, eligible: np.ndarray = None) -> np.ndarray:
+    """
+    Vectorized version of utils.process
+    Args:
+        values (np.ndarray): the scores to be processed
+        eligible (np.ndarray): True where the line of insurance is eligible, None if all are
+    Returns:
+        an array with the processed values (strings)
+    """
+    return PLANS[process_codes(values, eligible)]
+
+
+def columns_from_users(users: Iterable[UserModel]) -> Dict[str, np.ndarray]:
+    """
+    Converts user's risk profiles (dictionaries or UserModel objects) to the columns used by VectorizedRules
+    Args:
+        users: the user's risk profiles
+    Returns:
+        a dictionary with one array per column
+    """
+    age, dependents, income, married, house, vehicle_year, risk_questions = [], [], [], [], [], [], []
+    for user in users:
+        age.append(user['age'])
+        dependents.append(user['dependents'])
+        income.append(user['income'])
+        married.append(user['marital_status'] == 'married')
+        if user['house'] is None:
+            house.append(HOUSE_NONE)
+        elif user['house']['ownership_status'] == 'mortgaged':
+            house.append(HOUSE_MORTGAGED)
+        else:
+            house.append(HOUSE_OWNED)
+        vehicle_year.append(NO_VEHICLE if user['vehicle'] is None else user['vehicle']['year'])
+        risk_questions.append(list(user['risk_questions']))
+    return {
+        "age": np.array(age, dtype=np.int64),
+        "dependents": np.array(dependents, dtype=np.int64),
+        "income": np.array(income, dtype=np.int64),
+        "married": np.array(married, dtype=bool),
+        "house": np.array(house, dtype=np.int8),
+        "vehicle_year": np.array(vehicle_year, dtype=np.int64),
+        "risk_questions": np.array(risk_questions, dtype=np.int8).reshape(-1, 3)
+    }
+
+
+class VectorizedRules:
+    """
+    A class to apply the rules to a whole batch of users at once, using array operations.
+    It gives exactly the same results as Rules.apply_all_rules for every user.
+
+    ...
+
+    Attributes
+    ----------
+    age : array of int
+    dependents : array of int
+    income : array of int
+    married : array of bool
+        True if the marital status is "married"
+    house : array of int
+        HOUSE_NONE, HOUSE_OWNED or HOUSE_MORTGAGED
+    vehicle_year : array of int
+        year the vehicle was manufactured, NO_VEHICLE if the user has no vehicle
+    risk_questions : array of int with shape (n, 3)
+        the answers to the risk questions
+    clock : Clock, optional
+        the date the rules are applied on (see clock.py). By default, the system clock
+
+    Methods
+    -------
+    apply_all_rules()
+        Calculate the risk scores of all the users
+
+    Properties
+    ----------
+    score : dictionary
+        A dictionary containing an array of risk scores for each line of insurance.
+        The scores of the ineligible lines are meaningless, see eligible.
+    eligible : dictionary
+        A dictionary containing a boolean array for each line of insurance, True where it is eligible.
+    processedScore : dictionary
+        A dictionary containing an array of processed values for each line of insurance.
+    """
+
+    def __init__(self, age, dependents, income, married, house, vehicle_year, risk_questions,
+                 clock: Clock = None) -> None:
+        self._age = np.asarray(age)
+        self._dependents = np.asarray(dependents)
+        self._income = np.asarray(income)
+        self._married = np.asarray(married, dtype=bool)
+        self._house = np.asarray(house)
+        self._vehicle_year = np.asarray(vehicle_year)
+        self._risk_questions = np.asarray(risk_questions).reshape(-1, 3)
+        self._clock = SYSTEM_CLOCK if clock is None else clock
+        self._score = None
+        self._eligible = None
+
+    @classmethod
+    def from_users(cls, users: Iterable[UserModel], clock: Clock = None) -> "VectorizedRules":
+        return cls(**columns_from_users(users), clock=clock)
+
+    @property
+    def score(self) -> Dict[str, np.ndarray]:
+        return self._score
+
+    @property
+    def eligible(self) -> Dict[str, np.ndarray]:
+        return self._eligible
+
+    @property
+    def processedScore(self) -> Dict[str, np.ndarray]:
+        return {line: process_array(self._score[line], self._eligible[line]) for line in LINES}
+
+    def apply_all_rules(self) -> None:
+        age = self._age
+        income = self._income
+        has_vehicle = self._vehicle_year != NO_VEHICLE
+
+        # base score: sum of the answers from the risk questions
+        base = (self._risk_questions == 1).sum(axis=1, dtype=np.int64)
+
+        # deductions that apply to all lines of insurance (age risk and income above $200k)
+        base -= np.where(age < 30, 2, np.where(age <= 40, 1, 0))
+        base -= income > 200000
+
+        married = self._married
+        dependents = self._dependents > 0
+        mortgaged = self._house == HOUSE_MORTGAGED
+
+        auto = base + (has_vehicle & (self._vehicle_year >= self._clock.year - 5))
+        disability = base - married + dependents + mortgaged
+        home = base + mortgaged
+        life = base + married + dependents
+
+        # eligible lines of insurance
+        under_sixty = age <= 60
+        self._eligible = {"auto": has_vehicle, "disability": under_sixty & (income != 0),
+                          "home": self._house != HOUSE_NONE, "life": under_sixty}
+
+        self._score = {"auto": auto, "disability": disability, "home": home, "life": life}
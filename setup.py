@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 
-from distutils.core import setup
+from setuptools import setup
 
 setup(name='RiskProfileAPI',
       version='1.0',
@@ -8,5 +8,9 @@ setup(name='RiskProfileAPI',
       author='Mauro Widman',
       author_email='dwidman@gmail.com',
       url='https://www.example.com',
-      packages=['riskProfile'],
-     )
\ No newline at end of file
+      packages=['service', 'service.models'],
+      package_data={'service': ['rulesets/*.json']},
+      entry_points={
+          'console_scripts': ['riskprofile-batch=service.batch:main'],
+      },
+     )
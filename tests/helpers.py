@@ -0,0 +1,54 @@
+"""
+User generators shared by the tests and the benchmarks.
+"""
+import datetime
+import random
+from itertools import product
+
+
+def users():
+    year = datetime.datetime.now().year
+    for age, income, dependents, marital_status, house, vehicle, risk_questions in product(
+            [0, 29, 30, 40, 41, 60, 61, 100],
+            [0, 1, 200000, 200001],
+            [0, 1, 4],
+            ["single", "married"],
+            [None, {"ownership_status": "owned"}, {"ownership_status": "mortgaged"}],
+            [None, {"year": year + 1}, {"year": year - 5}, {"year": year - 6}],
+            [[0, 0, 0], [0, 1, 0], [1, 0, 1], [1, 1, 1]]):
+        yield {
+            "age": age,
+            "dependents": dependents,
+            "house": house,
+            "income": income,
+            "marital_status": marital_status,
+            "risk_questions": risk_questions,
+            "vehicle": vehicle
+        }
+
+
+def random_user(rnd: random.Random, boundaries: bool = False) -> dict:
+    """
+    Random user. With boundaries the numeric fields are drawn from the thresholds of the rules
+    (and one value past each), otherwise from a plausible range of customers.
+    """
+    year = datetime.datetime.now().year
+    if boundaries:
+        age = rnd.choice([0, 29, 30, 35, 40, 41, 60, 61, 90])
+        dependents = rnd.choice([0, 1, 3])
+        income = rnd.choice([0, 1, 200000, 200001, 500000])
+        vehicle = rnd.choice([None, {"year": year}, {"year": year - 5}, {"year": year - 6}, {"year": 0}])
+    else:
+        age = rnd.randint(18, 90)
+        dependents = rnd.randint(0, 4)
+        income = rnd.choice([0, rnd.randint(1, 400000)])
+        vehicle = rnd.choice([None, {"year": rnd.randint(year - 20, year)}])
+    return {
+        "age": age,
+        "dependents": dependents,
+        "house": rnd.choice([None, {"ownership_status": "owned"}, {"ownership_status": "mortgaged"}]),
+        "income": income,
+        "marital_status": rnd.choice(["single", "married"]),
+        "risk_questions": [rnd.randint(0, 1) for _ in range(3)],
+        "vehicle": vehicle
+    }
@@ -0,0 +1,149 @@
+import sys, os
+
+testdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import csv
+import datetime
+import io
+import json
+import shutil
+import tempfile
+import unittest
+from itertools import islice
+from unittest import mock
+from fastapi.testclient import TestClient
+from main import app
+import batch
+from clock import Clock
+from portfolioStats import PortfolioStats
+from tests.helpers import users
+
+
+def csv_row(user):
+    return [user["age"], user["dependents"], user["house"]["ownership_status"] if user["house"] else "",
+            user["income"], user["marital_status"], json.dumps(user["risk_questions"]),
+            user["vehicle"]["year"] if user["vehicle"] else ""]
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.users = list(islice(users(), 0, None, 7))
+        self.expected = TestClient(app).post("/api/risk/batch", json=self.users).json()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_ndjson(self):
+        with open(self.path("users.ndjson"), "w") as f:
+            for user in self.users:
+                f.write(json.dumps(user) + "\n")
+            f.write("\n{\"age\": -1}\n")
+        for workers in (1, 3):
+            stats = batch.run(self.path("users.ndjson"), self.path("results.ndjson"), workers, chunk_size=50)
+            self.assertEqual(stats["users"], len(self.users) + 1)
+            self.assertEqual(stats["errors"], 1)
+            with open(self.path("results.ndjson")) as f:
+                results = [json.loads(line) for line in f]
+            self.assertEqual(results[:-1], self.expected)
+            self.assertEqual(results[-1]["line"], len(self.users) + 2)
+            self.assertEqual(results[-1]["detail"][0], {"loc": ["age"], "msg": "Invalid age", "type": "value_error"})
+
+    def test_csv(self):
+        with open(self.path("users.csv"), "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["age", "dependents", "house", "income", "marital_status", "risk_questions", "vehicle"])
+            writer.writerows(csv_row(user) for user in self.users)
+            writer.writerow(["35", "0", "leased", "0", "single", "[0, 0, 0]", ""])
+        batch.main([self.path("users.csv"), self.path("results.csv"), "--workers", "2",
+                    "--chunk-size", "100", "--quiet"])
+        with open(self.path("results.csv"), newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([{line: row[line] for line in batch.LINES} for row in rows[:-1]],
+                         [item["result"] for item in self.expected])
+        self.assertEqual(json.loads(rows[-1]["errors"])[0]["loc"], ["house", "ownership_status"])
+
+    @unittest.skipIf(batch.parquet is None, "pyarrow is not installed")
+    def test_parquet(self):
+        rows = [dict(zip(["age", "dependents", "house", "income", "marital_status", "risk_questions", "vehicle"],
+                         csv_row(user))) for user in self.users]
+        for row, user in zip(rows, self.users):
+            row["risk_questions"] = user["risk_questions"]
+            row["vehicle"] = user["vehicle"]["year"] if user["vehicle"] else None
+            row["house"] = row["house"] or None
+        batch.parquet.write_table(batch.pyarrow.Table.from_pylist(rows), self.path("users.parquet"))
+        batch.run(self.path("users.parquet"), self.path("results.parquet"), 2, chunk_size=100)
+        results = batch.parquet.read_table(self.path("results.parquet")).to_pylist()
+        self.assertEqual([{line: row[line] for line in batch.LINES} for row in results],
+                         [item["result"] for item in self.expected])
+
+    def test_as_of(self):
+        with open(self.path("users.ndjson"), "w") as f:
+            for user in self.users:
+                f.write(json.dumps(user) + "\n")
+        expected = TestClient(app).post("/api/risk/batch?as_of=2019-07-01", json=self.users).json()
+        for engine in ("rules", "table", "ruleset"):
+            batch.main([self.path("users.ndjson"), self.path("results.ndjson"), "--engine", engine,
+                        "--workers", "1", "--as-of", "2019-07-01", "--quiet"])
+            with open(self.path("results.ndjson")) as f:
+                self.assertEqual([json.loads(line) for line in f], expected, engine)
+        with self.assertRaises(ValueError):
+            batch.run(self.path("users.ndjson"), self.path("results.ndjson"), engine="shared",
+                      as_of=datetime.date(2019, 7, 1))
+
+    def test_aggregate(self):
+        with open(self.path("users.ndjson"), "w") as f:
+            for user in self.users:
+                f.write(json.dumps(user) + "\n")
+            f.write("{\"age\": -1}\n")
+        stats = PortfolioStats("age_band", clock=Clock(datetime.date(2019, 7, 1)))
+        for user in self.users:
+            stats.add(user)
+        stats.add_error()
+        for workers in (1, 2):
+            result = batch.aggregate(self.path("users.ndjson"), self.path("report.json"), workers, chunk_size=40,
+                                     group_by="age_band", as_of=datetime.date(2019, 7, 1))
+            self.assertEqual((result["users"], result["errors"]), (len(self.users) + 1, 1))
+            with open(self.path("report.json")) as f:
+                self.assertEqual(json.load(f), stats.to_dict())
+
+        # the same report from a snapshot of the valid users, with the command line
+        batch.run(self.path("users.ndjson"), self.path("users.rsk"))
+        batch.main([self.path("users.rsk"), self.path("report.json"), "--aggregate", "age_band",
+                    "--as-of", "2019-07-01", "--workers", "2", "--chunk-size", "100", "--quiet"])
+        with open(self.path("report.json")) as f:
+            self.assertEqual(json.load(f), dict(stats.to_dict(), errors=0))
+        with self.assertRaises(ValueError):
+            batch.aggregate(self.path("users.ndjson"), self.path("report.ndjson"))
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            batch.run(self.path("users.txt"), self.path("results.txt"))
+        with self.assertRaises(ValueError):
+            batch.run(self.path("users.csv"), self.path("results.ndjson"))
+        with self.assertRaises(ValueError):
+            batch.run(self.path("users.csv"), self.path("results.csv"), workers=0)
+
+    def test_invalid_engine(self):
+        with open(self.path("users.ndjson"), "w") as f:
+            for user in self.users:
+                f.write(json.dumps(user) + "\n")
+        for function, output in [(batch.run, "results.ndjson"), (batch.aggregate, "report.json")]:
+            with self.assertRaises(ValueError) as ctx:
+                function(self.path("users.ndjson"), self.path(output), workers=2, engine="foo")
+            self.assertEqual("Invalid risk engine foo", str(ctx.exception))
+        with mock.patch("sys.stderr", io.StringIO()) as stderr:
+            with self.assertRaises(SystemExit) as ctx:
+                batch.main([self.path("users.ndjson"), self.path("results.ndjson"), "--engine", "foo",
+                            "--workers", "2", "--quiet"])
+        self.assertEqual(2, ctx.exception.code)
+        self.assertIn("invalid choice: 'foo'", stderr.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
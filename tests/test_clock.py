@@ -0,0 +1,50 @@
+import sys, os
+
+testdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import datetime
+import unittest
+from unittest import mock
+from clock import Clock
+from rules import Rules
+from userRecord import new_score
+
+
+class TestClock(unittest.TestCase):
+    def test_system_clock(self):
+        clock = Clock()
+        self.assertIsNone(clock.as_of)
+        self.assertEqual(datetime.datetime.now().year, clock.year)
+        self.assertEqual(datetime.date.today(), clock.today())
+
+    def test_year_is_cached_until_it_changes(self):
+        clock = Clock()
+        last_second = datetime.datetime(2021, 12, 31, 23, 59, 59).timestamp()
+        with mock.patch("clock.time.time", return_value=last_second):
+            self.assertEqual(2021, clock.year)
+            with mock.patch("clock.datetime") as mocked:
+                self.assertEqual(2021, clock.year)
+                mocked.datetime.fromtimestamp.assert_not_called()
+        with mock.patch("clock.time.time", return_value=last_second + 1):
+            self.assertEqual(2022, clock.year)
+        # the system clock is set back
+        with mock.patch("clock.time.time", return_value=last_second):
+            self.assertEqual(2021, clock.year)
+
+    def test_fixed_clock(self):
+        clock = Clock(datetime.date(2019, 5, 1))
+        self.assertEqual(2019, clock.year)
+        self.assertEqual(datetime.date(2019, 5, 1), clock.today())
+        with mock.patch("clock.time.time", return_value=datetime.datetime(2030, 1, 1).timestamp()):
+            self.assertEqual(2019, clock.year)
+
+    def test_rules_use_the_clock(self):
+        user = {"vehicle": {"year": 2015}}
+        rules = Rules(user=user, score=new_score(), clock=Clock(datetime.date(2020, 12, 31)))
+        rules.rule_vehicle_last_five_years()
+        self.assertEqual(1, rules.score["auto"])
+        rules = Rules(user=user, score=new_score(), clock=Clock(datetime.date(2021, 1, 1)))
+        rules.rule_vehicle_last_five_years()
+        self.assertEqual(0, rules.score["auto"])
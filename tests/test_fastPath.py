@@ -0,0 +1,68 @@
+import sys, os
+
+testdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import unittest
+from itertools import islice
+from fastapi.testclient import TestClient
+from main import app
+import fastPath
+from engines import build_engine
+from tests.helpers import users
+
+user = {
+    "age": 35,
+    "dependents": 2,
+    "house": {"ownership_status": "owned"},
+    "income": 0,
+    "marital_status": "married",
+    "risk_questions": [0, 1, 0],
+    "vehicle": {"year": 2018}
+}
+
+
+class TestFastPath(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client = TestClient(app)
+
+    def assertSameResponse(self, **kwargs):
+        expected = self.client.post("/api/risk/", **kwargs)
+        response = self.client.post("/api/risk/fast", **kwargs)
+        self.assertEqual(expected.status_code, response.status_code, kwargs)
+        self.assertEqual(expected.json(), response.json(), kwargs)
+        self.assertEqual(expected.headers["content-type"], response.headers["content-type"])
+
+    def test_same_results_of_api(self):
+        for u in islice(users(), 0, None, 37):
+            self.assertSameResponse(json=u)
+
+    def test_same_validation_errors_of_api(self):
+        bad_users = [
+            dict(user, age="x"), dict(user, age=None), dict(user, age=-1), dict(user, dependents=-1),
+            dict(user, income=-1), dict(user, house="x"), dict(user, house={}),
+            dict(user, house={"ownership_status": None}), dict(user, house={"ownership_status": "leased"}),
+            dict(user, marital_status=1), dict(user, marital_status="widow"), dict(user, risk_questions=[0, 1]),
+            dict(user, risk_questions=[0, 1, 0, 1]), dict(user, risk_questions="abc"),
+            dict(user, risk_questions=None), dict(user, risk_questions=[0, "a", "b"]),
+            dict(user, risk_questions=[0, 1, 2]), dict(user, vehicle={"year": "x"}), dict(user, vehicle=[]),
+            dict(user, vehicle={"year": -1}), {"risk_questions": [1, 1, "x"], "vehicle": {"year": -1}, "age": -5}, {},
+        ]
+        for bad_user in bad_users:
+            self.assertSameResponse(json=bad_user)
+
+    def test_same_coercion_of_api(self):
+        for good_user in [dict(user, age=True), dict(user, age="35"), dict(user, age=3.7),
+                          dict(user, risk_questions=[True, "1", 0.5]), dict(user, extra=1)]:
+            self.assertSameResponse(json=good_user)
+
+    def test_invalid_bodies(self):
+        for body in [b"", b"{bad", b"[1]", b"null", b"3", b"\xff"]:
+            self.assertSameResponse(data=body, headers={"content-type": "application/json"})
+
+    def test_calculate_with_engines(self):
+        for name in ["table", "ruleset"]:
+            engine = build_engine(name)
+            for u in users():
+                self.assertEqual(fastPath.calculate(fastPath.dumps(u)), fastPath.calculate(fastPath.dumps(u), engine))
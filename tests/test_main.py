@@ -4,8 +4,13 @@ testdir = os.path.dirname(__file__)
 srcdir = '../service'
 sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
 
+from itertools import islice
+from unittest import mock
 from fastapi.testclient import TestClient
 from main import app
+from engines import build_engine
+from riskProfile import RiskProfile
+from tests.helpers import users
 
 client = TestClient(app)
 
@@ -27,10 +32,21 @@ output = {
 
 
 def test_calculate_user_risk_with_default_data():
-    response = client.post("/api/risk/", json=user)
+    # the vehicle of 2018 was produced in the last 5 years
+    response = client.post("/api/risk/?as_of=2021-01-01", json=user)
     assert response.status_code == 200
     assert response.json() == output
 
+def test_calculate_user_risk_as_of_another_date():
+    response = client.post("/api/risk/?as_of=2024-01-01", json=user)
+    assert response.status_code == 200
+    assert response.json() == dict(output, auto="economic")
+    response = client.post("/api/risk/batch?as_of=2021-01-01", json=[user])
+    assert response.json() == [{"result": output}]
+    response = client.post("/api/risk/?as_of=2021-13-01", json=user)
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["query", "as_of"]
+
 def test_force_validation_error():
     bad_user = {
         "dependents": 2,
@@ -84,3 +100,50 @@ def test_force_validation_error():
     response = client.post("/api/risk/", json=bad_user)
     assert response.status_code == 422
     assert response.json() == bad_output
+
+def test_validator_rules_return_validation_error():
+    response = client.post("/api/risk/", json=dict(user, age=-1))
+    assert response.status_code == 422
+    assert response.json() == {"detail": [{"loc": ["body", "age"], "msg": "Invalid age", "type": "value_error"}]}
+
+def test_calculate_users_risk_in_batch_keeps_order_and_reports_errors_per_item():
+    older_user = dict(user, age=61, income=220000, vehicle={"year": 2015})
+    bad_user = dict(user, marital_status="widow")
+    negative_age_user = dict(user, age=-1)
+    response = client.post("/api/risk/batch", json=[user, bad_user, older_user, negative_age_user])
+    assert response.status_code == 200
+    items = response.json()
+    assert len(items) == 4
+    assert items[0] == {"result": client.post("/api/risk/", json=user).json()}
+    assert items[1]["detail"][0]["loc"] == ["marital_status"]
+    assert items[2] == {"result": {"auto": "economic", "disability": "ineligible",
+                                   "home": "economic", "life": "ineligible"}}
+    assert items[3] == {"detail": [{"loc": ["age"], "msg": "Invalid age", "type": "value_error"}]}
+
+def test_explained_user_risk():
+    response = client.post("/api/risk/?explain=true", json=user)
+    assert response.status_code == 200
+    body = response.json()
+    explanation = body.pop("explanation")
+    assert body == client.post("/api/risk/", json=user).json()
+    assert explanation["steps"][1] == {"rule": "rule_user_does_not_have_income_vehicle_or_house",
+                                       "delta": {}, "ineligible": ["disability"]}
+    assert explanation["score"]["disability"] is None
+
+def test_user_risk_with_scores():
+    response = client.post("/api/risk/?scores=true", json=user)
+    assert response.status_code == 200
+    body = response.json()
+    scores = body.pop("scores")
+    assert body == client.post("/api/risk/", json=user).json()
+    assert scores["disability"] is None
+    assert scores["home"] == 0 and scores["life"] == 2
+
+def test_user_risk_is_the_same_for_every_engine():
+    for name in ["rules", "table", "ruleset"]:
+        with mock.patch("main.engine", build_engine(name)):
+            for u in islice(users(), 0, None, 37):
+                response = client.post("/api/risk/", json=u)
+                assert response.status_code == 200
+                assert response.headers["content-type"] == "application/json"
+                assert response.json() == RiskProfile(u).calculatedRiskProfile.dict(), (name, u)
@@ -0,0 +1,95 @@
+import sys, os
+
+testdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import asyncio
+import json
+import unittest
+from itertools import islice
+from fastapi.testclient import TestClient
+from main import app
+from ndjsonStream import LineSplitter, score_stream
+from tests.helpers import users
+
+user = {
+    "age": 35,
+    "dependents": 2,
+    "house": {"ownership_status": "owned"},
+    "income": 0,
+    "marital_status": "married",
+    "risk_questions": [0, 1, 0],
+    "vehicle": {"year": 2018}
+}
+
+
+async def chunks_of(document: bytes, size: int):
+    for i in range(0, len(document), size):
+        yield document[i:i + size]
+
+
+def stream(document: bytes, size: int, max_line: int = 1024):
+    async def collect():
+        return [chunk async for chunk in score_stream(chunks_of(document, size), max_line=max_line)]
+    return asyncio.new_event_loop().run_until_complete(collect())
+
+
+class TestLineSplitter(unittest.TestCase):
+    def test_lines_split_across_chunks(self):
+        splitter = LineSplitter(10)
+        lines = list(splitter.feed(b"ab\ncd")) + list(splitter.feed(b"ef\n\ngh")) + list(splitter.close())
+        self.assertEqual(lines, [(1, b"ab"), (2, b"cdef"), (3, b""), (4, b"gh")])
+
+    def test_too_long_lines(self):
+        splitter = LineSplitter(3)
+        lines = list(splitter.feed(b"abcd\nab")) + list(splitter.feed(b"cd")) + list(splitter.feed(b"ef\nabc\n"))
+        self.assertEqual(lines, [(1, None), (2, None), (3, b"abc")])
+        self.assertEqual(list(splitter.close()), [])
+
+
+class TestNDJSONStream(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client = TestClient(app)
+
+    def test_same_results_of_batch(self):
+        sample = list(islice(users(), 0, None, 37))
+        document = b"".join(json.dumps(u).encode() + b"\n" for u in sample)
+        expected = self.client.post("/api/risk/batch", json=sample).json()
+        for size in (1, 7, 4096, len(document)):
+            results = [json.loads(line) for line in b"".join(stream(document, size)).splitlines()]
+            self.assertEqual(results, expected)
+
+    def test_per_line_errors(self):
+        document = b"\n".join([
+            json.dumps(user).encode(),
+            b"",
+            json.dumps(dict(user, age=-1)).encode(),
+            b"{not json",
+            b"x" * 2000,
+            json.dumps(user).encode()
+        ])
+        results = [json.loads(line) for line in b"".join(stream(document, 100)).splitlines()]
+        self.assertEqual(len(results), 5)
+        self.assertIn("result", results[0])
+        self.assertEqual(results[1], {"line": 3, "detail": [{"loc": ["age"], "msg": "Invalid age", "type": "value_error"}]})
+        self.assertEqual(results[2]["line"], 4)
+        self.assertEqual(results[2]["detail"][0]["type"], "value_error.jsondecode")
+        self.assertEqual(results[3]["line"], 5)
+        self.assertEqual(results[3]["detail"][0]["type"], "value_error.line_too_long")
+        self.assertEqual(results[4], results[0])
+
+    def test_stream_endpoint(self):
+        document = json.dumps(user) + "\n" + json.dumps(dict(user, marital_status="widow")) + "\n"
+        response = self.client.post("/api/risk/stream", data=document.encode(),
+                                    headers={"content-type": "application/x-ndjson"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        results = [json.loads(line) for line in response.content.splitlines()]
+        self.assertEqual(results[0], self.client.post("/api/risk/batch", json=[user]).json()[0])
+        self.assertEqual(results[1]["line"], 2)
+        self.assertEqual(results[1]["detail"][0]["loc"], ["marital_status"])
+
+
+if __name__ == '__main__':
+    unittest.main()
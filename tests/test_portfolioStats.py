@@ -0,0 +1,160 @@
+import sys, os
+
+testdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import datetime
+import json
+import unittest
+from itertools import islice
+from unittest import mock
+from fastapi.testclient import TestClient
+import main
+from clock import Clock
+from portfolioStats import AGE_BANDS, PortfolioStats, age_band
+from riskProfile import RiskProfile
+from ruleSet import DEFAULT_RULE_SET, RuleSet
+from userRecord import LINES
+from tests.helpers import users
+
+clock = Clock(datetime.date(2021, 1, 1))
+
+
+def expected_stats(users_, group):
+    # the same counts, from the risk profiles and the scores of RiskProfile
+    groups = {}
+    for user in users_:
+        profile = RiskProfile(user, scores=True, clock=clock)
+        counts = groups.setdefault(group(user), {"users": 0, "plans": {}, "scores": {}})
+        counts["users"] += 1
+        for line in LINES:
+            plan = profile.calculatedRiskProfile[line].value
+            plans = counts["plans"].setdefault(line, {})
+            plans[plan] = plans.get(plan, 0) + 1
+            score = profile.scores[line]
+            if score is not None:
+                scores = counts["scores"].setdefault(line, {})
+                scores[str(score)] = scores.get(str(score), 0) + 1
+    return groups
+
+
+def without_zeros(groups):
+    return {name: {"users": group["users"],
+                   "plans": {line: {plan: count for plan, count in plans.items() if count}
+                             for line, plans in group["plans"].items()},
+                   "scores": {line: scores for line, scores in group["scores"].items() if scores}}
+            for name, group in groups.items()}
+
+
+def lower_income_threshold() -> RuleSet:
+    with open(DEFAULT_RULE_SET) as f:
+        definition = json.load(f)
+    definition["version"] = "lower-income-threshold"
+    for rule in definition["rules"]:
+        if rule["name"] == "income_is_above_two_hundred_k":
+            rule["when"]["income"][">"] = 100000
+    return RuleSet(definition, clock)
+
+
+class TestPortfolioStats(unittest.TestCase):
+    def setUp(self) -> None:
+        self.users = list(islice(users(), 0, None, 5))
+
+    def test_counts_match_the_risk_profiles(self):
+        for group_by, group in [(None, lambda user: "all"),
+                                ("age_band", lambda user: age_band(user["age"])),
+                                ("marital_status", lambda user: user["marital_status"])]:
+            stats = PortfolioStats(group_by, clock=clock)
+            for user in self.users:
+                stats.add(user)
+            report = stats.to_dict()
+            self.assertEqual(report["group_by"], group_by)
+            self.assertEqual(report["users"], len(self.users))
+            self.assertEqual(without_zeros(report["groups"]), expected_stats(self.users, group), group_by)
+
+    def test_report_shape(self):
+        stats = PortfolioStats("age_band", clock=clock)
+        stats.add(self.users[-1])
+        stats.add(self.users[0])
+        stats.add_error()
+        report = stats.to_dict()
+        self.assertEqual(report["errors"], 1)
+        # age bands from the youngest, and every plan of every line
+        self.assertEqual(list(report["groups"]), [AGE_BANDS[0], AGE_BANDS[3]])
+        for group in report["groups"].values():
+            self.assertEqual(list(group["plans"]), list(LINES))
+            for plans in group["plans"].values():
+                self.assertEqual(list(plans), ["ineligible", "economic", "regular", "responsible"])
+
+    def test_merge_is_the_same_as_a_single_pass(self):
+        single = PortfolioStats("marital_status", clock=clock)
+        chunks = [PortfolioStats("marital_status", clock=clock) for _ in range(3)]
+        for i, user in enumerate(self.users):
+            single.add(user)
+            chunks[i % 3].add(user)
+        chunks[1].add_error()
+        single.add_error()
+        merged = PortfolioStats("marital_status")
+        for chunk in chunks:
+            merged.merge(chunk)
+        self.assertEqual(merged.to_dict(), single.to_dict())
+
+    def test_counts_match_the_plans_of_the_engine(self):
+        engine = lower_income_threshold()
+        stats = PortfolioStats(engine=engine)
+        plans = {}
+        for user in self.users:
+            stats.add(user)
+            for line, plan in zip(LINES, engine.plans(user)):
+                plans.setdefault(line, {})
+                plans[line][plan] = plans[line].get(plan, 0) + 1
+        report = without_zeros(stats.to_dict()["groups"])
+        self.assertEqual(report["all"]["plans"], plans)
+        # the threshold changes the plans of the Rules class
+        self.assertNotEqual(report, without_zeros(expected_stats(self.users, lambda user: "all")))
+
+    def test_age_bands(self):
+        self.assertEqual([age_band(age) for age in (0, 29, 30, 40, 41, 60, 61)],
+                         ["under 30", "under 30", "30-40", "30-40", "41-60", "41-60", "over 60"])
+
+    def test_invalid_grouping(self):
+        with self.assertRaises(ValueError):
+            PortfolioStats("income")
+        with self.assertRaises(ValueError):
+            PortfolioStats("age_band").merge(PortfolioStats())
+
+
+class TestAggregateEndpoint(unittest.TestCase):
+    def test_aggregate(self):
+        users_ = list(islice(users(), 0, None, 13))
+        body = "\n".join(json.dumps(user) for user in users_) + "\n\n{\"age\": -1}\nnot json"
+        response = TestClient(main.app).post("/api/risk/aggregate?group_by=age_band&as_of=2021-01-01", data=body)
+        self.assertEqual(response.status_code, 200)
+        stats = PortfolioStats("age_band", clock=clock)
+        for user in users_:
+            stats.add(user)
+        stats.add_error()
+        stats.add_error()
+        self.assertEqual(response.json(), stats.to_dict())
+
+    def test_aggregate_with_the_engine(self):
+        users_ = list(islice(users(), 0, None, 13))
+        body = "\n".join(json.dumps(user) for user in users_)
+        engine = lower_income_threshold()
+        with mock.patch.object(main, "engine", engine):
+            response = TestClient(main.app).post("/api/risk/aggregate?group_by=marital_status", data=body)
+        self.assertEqual(response.headers["X-Rule-Set-Version"], "lower-income-threshold")
+        groups = without_zeros(response.json()["groups"])
+        for status in ("single", "married"):
+            for i, line in enumerate(LINES):
+                plans = [engine.plans(user)[i] for user in users_ if user["marital_status"] == status]
+                self.assertEqual(groups[status]["plans"][line], {plan: plans.count(plan) for plan in set(plans)})
+
+    def test_invalid_grouping(self):
+        response = TestClient(main.app).post("/api/risk/aggregate?group_by=income", data="")
+        self.assertEqual(response.status_code, 422)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import sys, os
+
+testdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import datetime
+import unittest
+from unittest import mock
+from fastapi.testclient import TestClient
+import main
+from models.user_model import UserModel
+from requestDedup import IdempotencyConflict, IdempotencyStore, request_key
+
+user = {
+    "age": 35,
+    "dependents": 2,
+    "house": {"ownership_status": "owned"},
+    "income": 0,
+    "marital_status": "married",
+    "risk_questions": [0, 1, 0],
+    "vehicle": {"year": 2018}
+}
+
+
+class TestRequestKey(unittest.TestCase):
+    def test_equal_requests_have_equal_keys(self):
+        self.assertEqual(request_key(UserModel(**user)), request_key(UserModel(**dict(user))))
+        self.assertEqual(request_key(UserModel(**user)),
+                         (35, 2, "owned", 0, "married", (0, 1, 0), 2018, False, False, None))
+
+    def test_every_field_and_option_changes_the_key(self):
+        key = request_key(UserModel(**user))
+        for field, value in [("age", 36), ("dependents", 0), ("house", None), ("income", 1),
+                             ("marital_status", "single"), ("risk_questions", [1, 1, 0]), ("vehicle", None)]:
+            self.assertNotEqual(key, request_key(UserModel(**dict(user, **{field: value}))), field)
+        self.assertNotEqual(key, request_key(UserModel(**user), explain=True))
+        self.assertNotEqual(key, request_key(UserModel(**user), scores=True))
+        self.assertNotEqual(key, request_key(UserModel(**user), as_of=datetime.date(2021, 1, 1)))
+
+
+class TestIdempotencyStore(unittest.TestCase):
+    def test_replays_and_conflicts(self):
+        store = IdempotencyStore(maxsize=2)
+        self.assertIsNone(store.get("a", 1))
+        store.put("a", 1, "response")
+        self.assertEqual(store.get("a", 1), "response")
+        with self.assertRaises(IdempotencyConflict):
+            store.get("a", 2)
+        self.assertEqual(store.stats, {"hits": 1, "misses": 1, "conflicts": 1, "evictions": 0, "expirations": 0,
+                                       "size": 1, "maxsize": 2})
+
+    def test_least_recently_used_key_is_evicted(self):
+        store = IdempotencyStore(maxsize=2)
+        store.put("a", 1, "a")
+        store.put("b", 1, "b")
+        store.get("a", 1)
+        store.put("c", 1, "c")
+        self.assertIsNone(store.get("b", 1))
+        self.assertEqual(store.get("a", 1), "a")
+        self.assertEqual(store.evictions, 1)
+
+    def test_responses_expire(self):
+        store = IdempotencyStore(ttl=10)
+        with mock.patch("requestDedup.time.monotonic", return_value=100.0):
+            store.put("a", 1, "a")
+        with mock.patch("requestDedup.time.monotonic", return_value=109.0):
+            self.assertEqual(store.get("a", 1), "a")
+        with mock.patch("requestDedup.time.monotonic", return_value=110.0):
+            self.assertIsNone(store.get("a", 1))
+        self.assertEqual(store.expirations, 1)
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            IdempotencyStore(maxsize=0)
+
+
+class TestIdempotencyKey(unittest.TestCase):
+    def setUp(self) -> None:
+        self.client = TestClient(main.app)
+        self.store = IdempotencyStore()
+
+    def test_response_is_replayed(self):
+        with mock.patch.object(main, "idempotency_store", self.store):
+            first = self.client.post("/api/risk/?scores=true", json=user, headers={"Idempotency-Key": "k1"})
+            with mock.patch.object(main, "score_user", side_effect=AssertionError("scored again")):
+                second = self.client.post("/api/risk/?scores=true", json=user, headers={"Idempotency-Key": "k1"})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+        self.assertNotIn("Idempotent-Replayed", first.headers)
+        self.assertEqual(second.headers["Idempotent-Replayed"], "true")
+        self.assertEqual(self.store.hits, 1)
+
+    def test_key_reused_with_another_request(self):
+        with mock.patch.object(main, "idempotency_store", self.store):
+            self.client.post("/api/risk/", json=user, headers={"Idempotency-Key": "k1"})
+            response = self.client.post("/api/risk/", json=dict(user, age=70), headers={"Idempotency-Key": "k1"})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json(), {"detail": "Idempotency-Key was used with another request"})
+
+    def test_requests_without_key_are_not_stored(self):
+        with mock.patch.object(main, "idempotency_store", self.store):
+            self.client.post("/api/risk/", json=user)
+        self.assertEqual(self.store.stats["size"], 0)
+
+    def test_counters(self):
+        response = self.client.get("/metrics/dedup")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {"idempotency"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import sys, os
+
+testdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import json
+import shutil
+import tempfile
+import unittest
+from fastapi.testclient import TestClient
+import main
+from requestMetrics import RequestMetrics
+
+user = {
+    "age": 35,
+    "dependents": 2,
+    "house": {"ownership_status": "owned"},
+    "income": 0,
+    "marital_status": "married",
+    "risk_questions": [0, 1, 0],
+    "vehicle": {"year": 2018}
+}
+
+
+def samples(text):
+    # the samples of a Prometheus text document, by name and labels
+    result = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            result[name] = float(value)
+    return result
+
+
+class TestRequestMetrics(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory)
+
+    def test_render(self):
+        metrics = RequestMetrics()
+        metrics.observe_request("POST", "/api/risk/", 200, 0.003)
+        metrics.observe_request("POST", "/api/risk/", 200, 2.0)
+        metrics.observe_request("POST", "/api/risk/", 422, 0.0001)
+        metrics.observe_errors([{"loc": ["body", "age"], "msg": "Invalid age", "type": "value_error"},
+                                {"loc": ["body", 1], "msg": "Expecting value: line 1 column 2 (char 1)",
+                                 "type": "value_error.jsondecode"}])
+        metrics.observe_plans(("regular", "ineligible", "economic", "regular"))
+        text = metrics.render()
+        self.assertIn("# TYPE riskprofile_request_duration_seconds histogram", text)
+        values = samples(text)
+        self.assertEqual(values['riskprofile_requests_total{method="POST",path="/api/risk/",status="200"}'], 2)
+        self.assertEqual(values['riskprofile_requests_total{method="POST",path="/api/risk/",status="422"}'], 1)
+        histogram = 'riskprofile_request_duration_seconds_bucket{method="POST",path="/api/risk/",le="%s"}'
+        self.assertEqual(values[histogram % "0.0005"], 1)
+        self.assertEqual(values[histogram % "0.005"], 2)
+        self.assertEqual(values[histogram % "2.5"], 3)
+        self.assertEqual(values[histogram % "+Inf"], 3)
+        self.assertEqual(values['riskprofile_request_duration_seconds_count{method="POST",path="/api/risk/"}'], 3)
+        self.assertEqual(values['riskprofile_validation_failures_total{message="Invalid age"}'], 1)
+        self.assertEqual(values['riskprofile_validation_failures_total{message="Invalid JSON"}'], 1)
+        self.assertEqual(values['riskprofile_plans_total{line="disability",plan="ineligible"}'], 1)
+        self.assertEqual(values['riskprofile_plans_total{line="life",plan="regular"}'], 1)
+
+    def test_workers_are_merged(self):
+        first = RequestMetrics(self.directory)
+        first.observe_plans(("regular", "ineligible", "economic", "regular"))
+        first.observe_request("GET", "/", 200, 0.001)
+        # the file of another worker (the files are named after the process id)
+        with open(os.path.join(self.directory, "metrics-1.json"), "w") as f:
+            json.dump(first._samples(), f)
+
+        second = RequestMetrics(self.directory)
+        second.observe_plans(("regular", "economic", "economic", "regular"))
+        second.observe_request("GET", "/", 200, 0.002)
+        values = samples(second.render())
+        self.assertTrue(os.path.exists(os.path.join(self.directory, f"metrics-{os.getpid()}.json")))
+        self.assertEqual(values['riskprofile_plans_total{line="auto",plan="regular"}'], 2)
+        self.assertEqual(values['riskprofile_plans_total{line="disability",plan="ineligible"}'], 1)
+        self.assertEqual(values['riskprofile_plans_total{line="disability",plan="economic"}'], 1)
+        self.assertEqual(values['riskprofile_requests_total{method="GET",path="/",status="200"}'], 2)
+        self.assertAlmostEqual(values['riskprofile_request_duration_seconds_sum{method="GET",path="/"}'], 0.003)
+
+    def test_endpoint(self):
+        original = main.request_metrics
+        main.request_metrics = metrics = RequestMetrics()
+        # the middleware keeps the instance it was created with
+        middleware = main.app.middleware_stack
+        while not hasattr(middleware, "metrics"):
+            middleware = middleware.app
+        middleware.metrics = metrics
+        try:
+            client = TestClient(main.app)
+            client.post("/api/risk/", json=user)
+            client.post("/api/risk/", json=dict(user, age=-1))
+            client.post("/api/risk/fast", json=dict(user, marital_status="widow"))
+            client.post("/api/risk/batch", json=[user, dict(user, income=-1)])
+            client.get("/unknown")
+            response = client.get("/metrics")
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.headers["content-type"].startswith("text/plain; version=0.0.4"))
+            values = samples(response.text)
+        finally:
+            main.request_metrics = original
+            middleware.metrics = original
+
+        self.assertEqual(values['riskprofile_requests_total{method="POST",path="/api/risk/",status="200"}'], 1)
+        self.assertEqual(values['riskprofile_requests_total{method="POST",path="/api/risk/",status="422"}'], 1)
+        self.assertEqual(values['riskprofile_requests_total{method="POST",path="/api/risk/fast",status="422"}'], 1)
+        self.assertEqual(values['riskprofile_requests_total{method="GET",path="other",status="404"}'], 1)
+        self.assertEqual(values['riskprofile_validation_failures_total{message="Invalid age"}'], 1)
+        self.assertEqual(values['riskprofile_validation_failures_total{message="Invalid income"}'], 1)
+        self.assertEqual(sum(value for name, value in values.items()
+                             if name.startswith('riskprofile_plans_total{line="auto"')), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
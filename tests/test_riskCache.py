@@ -0,0 +1,123 @@
+import sys, os
+
+testdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import datetime
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from fastapi.testclient import TestClient
+import main
+from riskProfile import RiskProfile
+from riskCache import RiskCache
+from engines import build_engine
+from ruleSet import RuleSet, DEFAULT_RULE_SET
+from tests.helpers import users
+from ruleSetReloader import RuleSetReloader
+
+user = {
+    "age": 35,
+    "dependents": 2,
+    "house": {"ownership_status": "owned"},
+    "income": 0,
+    "marital_status": "married",
+    "risk_questions": [0, 1, 0],
+    "vehicle": None
+}
+
+
+class TestRiskCache(unittest.TestCase):
+    def test_cache_matches_rules_for_every_engine(self):
+        for name in ["rules", "table", "ruleset"]:
+            cache = build_engine(name, cache_size=100000)
+            self.assertIsInstance(cache, RiskCache)
+            for u in users():
+                self.assertEqual(RiskProfile(u).calculatedRiskProfile, RiskProfile(u, cache).calculatedRiskProfile,
+                                 (name, u))
+            self.assertLessEqual(cache.stats["size"], 1728)
+
+    def test_users_with_the_same_canonical_profile_share_an_entry(self):
+        for engine in [None, RuleSet.from_file()]:
+            cache = RiskCache(engine)
+            cache.calculate(user)
+            cache.calculate(dict(user, age=31, dependents=5))
+            self.assertEqual(cache.plans(dict(user, age=40, dependents=1)), ("ineligible", "ineligible", "economic", "regular"))
+            cache.calculate(dict(user, age=41))
+            self.assertEqual({"hits": 2, "misses": 2, "evictions": 0, "expirations": 0, "invalidations": 0,
+                              "size": 2, "maxsize": 10000}, cache.stats)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = RiskCache(maxsize=2)
+        cache.calculate(dict(user, age=20))
+        cache.calculate(dict(user, age=35))
+        cache.calculate(dict(user, age=20))
+        cache.calculate(dict(user, age=50))
+        self.assertEqual(1, cache.stats["evictions"])
+        cache.calculate(dict(user, age=20))
+        self.assertEqual(2, cache.stats["hits"])
+        cache.calculate(dict(user, age=35))
+        self.assertEqual(3, cache.stats["misses"] - 1)
+
+    def test_entries_expire_after_ttl(self):
+        cache = RiskCache(ttl=10)
+        with mock.patch("riskCache.time.monotonic", return_value=100.0):
+            cache.calculate(user)
+        with mock.patch("riskCache.time.monotonic", return_value=109.0):
+            cache.calculate(user)
+        with mock.patch("riskCache.time.monotonic", return_value=110.0):
+            cache.calculate(user)
+        self.assertEqual(1, cache.stats["hits"])
+        self.assertEqual(1, cache.stats["expirations"])
+        self.assertEqual(2, cache.stats["misses"])
+
+    def test_cache_is_cleared_when_the_year_changes(self):
+        cache = RiskCache()
+        year = datetime.datetime.now().year
+        vehicle_user = dict(user, income=100000, vehicle={"year": year - 5})
+        self.assertEqual("regular", cache.calculate(vehicle_user)["auto"])
+
+        next_year = datetime.datetime(year + 1, 1, 1).timestamp()
+        with mock.patch("clock.time.time", return_value=next_year):
+            self.assertEqual("economic", cache.calculate(vehicle_user)["auto"])
+        self.assertEqual(1, cache.stats["invalidations"])
+
+    def test_cache_is_cleared_when_the_rule_set_changes(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "rules.json")
+            shutil.copy(DEFAULT_RULE_SET, path)
+            engine = RuleSetReloader(path, interval=0)
+            cache = RiskCache(engine)
+            high_income_user = dict(user, age=45, income=150000, dependents=0, marital_status="single",
+                                    risk_questions=[1, 0, 0])
+            self.assertEqual("regular", cache.calculate(high_income_user)["life"])
+
+            with open(DEFAULT_RULE_SET) as f:
+                definition = json.load(f)
+            definition["version"] = "lower-income-threshold"
+            definition["rules"][5]["when"]["income"][">"] = 100000
+            with open(path, "w") as f:
+                json.dump(definition, f)
+            os.utime(path, ns=(0, 0))
+            engine.reload()
+
+            self.assertEqual("economic", cache.calculate(high_income_user)["life"])
+            self.assertEqual(1, cache.stats["invalidations"])
+            self.assertEqual("lower-income-threshold", cache.version)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_cache_metrics_endpoint(self):
+        client = TestClient(main.app)
+        self.assertEqual(404, client.get("/metrics/cache").status_code)
+        with mock.patch.object(main, "engine", RiskCache()):
+            client.post("/api/risk/", json=user)
+            client.post("/api/risk/", json=dict(user, age=39))
+            response = client.get("/metrics/cache")
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(1, response.json()["hits"])
+            self.assertEqual(1, response.json()["misses"])
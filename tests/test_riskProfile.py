@@ -4,8 +4,16 @@ testdir = os.path.dirname(__file__)
 srcdir = '../service'
 sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
 
+import datetime
+import json
 import unittest
+from unittest import mock
+from pydantic import ValidationError
+from models.user_model import UserModel
 from riskProfile import RiskProfile
+from ruleSet import DEFAULT_RULE_SET, RuleSet
+from userRecord import UserRecord
+from clock import Clock
 
 
 class TestRiskProfile(unittest.TestCase):
@@ -28,7 +36,8 @@ class TestRiskProfile(unittest.TestCase):
             "home": "economic",
             "life": "regular"
         }
-        risk_profile = RiskProfile(user)
+        # the vehicle of 2018 was produced in the last 5 years
+        risk_profile = RiskProfile(user, clock=Clock(datetime.date(2021, 1, 1)))
         self.assertEqual(output, risk_profile.calculatedRiskProfile)
 
     def test_risk_profile_with_custom_data1(self):
@@ -68,3 +77,120 @@ class TestRiskProfile(unittest.TestCase):
         }
         risk_profile = RiskProfile(user)
         self.assertEqual(output, risk_profile.calculatedRiskProfile)
+
+    def test_explained_risk_profile(self):
+        user = UserModel.parse_obj(UserModel.Config.schema_extra["example"])
+        explained = RiskProfile(user, explain=True)
+        self.assertEqual(explained.calculatedRiskProfile, RiskProfile(user).calculatedRiskProfile)
+        self.assertEqual(len(explained.explanation["steps"]), 9)
+        self.assertIsNone(explained.explanation["score"]["disability"])
+        self.assertIsNone(RiskProfile(user).explanation)
+
+    def test_risk_profile_with_scores(self):
+        user = UserModel.parse_obj(UserModel.Config.schema_extra["example"])
+        # a table, compiled from the Rules class
+        scored = RiskProfile(user, mock.Mock(spec=["calculate", "plans"]), scores=True)
+        self.assertEqual(scored.calculatedRiskProfile, RiskProfile(user).calculatedRiskProfile)
+        self.assertEqual(scored.scores, {"auto": scored.scores["auto"], "disability": None, "home": 0, "life": 2})
+        self.assertIsNone(scored.explanation)
+        self.assertIsNone(RiskProfile(user).scores)
+
+    def test_explain_applies_the_rules_for_engines_without_explain(self):
+        # the tables are compiled from the Rules class
+        engine = mock.Mock(spec=["calculate", "plans"])
+        user = UserModel.parse_obj(UserModel.Config.schema_extra["example"])
+        explained = RiskProfile(user, engine, explain=True)
+        engine.calculate.assert_not_called()
+        self.assertEqual(explained.calculatedRiskProfile, RiskProfile(user).calculatedRiskProfile)
+
+    def test_explain_traces_the_rule_set_of_the_engine(self):
+        with open(DEFAULT_RULE_SET) as f:
+            definition = json.load(f)
+        for rule in definition["rules"]:
+            if rule["name"] == "income_is_above_two_hundred_k":
+                rule["when"]["income"][">"] = 100000
+        engine = RuleSet(definition)
+        user = UserModel(age=45, dependents=0, house=None, income=150000, marital_status="single",
+                         risk_questions=[1, 0, 0], vehicle=None)
+        explained = RiskProfile(user, engine, explain=True)
+        self.assertEqual(explained.calculatedRiskProfile, engine.calculate(user))
+        self.assertEqual(explained.calculatedRiskProfile.life.value, "economic")
+        steps = explained.explanation["steps"]
+        self.assertEqual([step["rule"] for step in steps], [rule["name"] for rule in definition["rules"]])
+        # the lines are made ineligible by the last rules of the rule set
+        self.assertIn({"rule": "income_is_above_two_hundred_k",
+                       "delta": {"auto": -1, "disability": -1, "home": -1, "life": -1}, "ineligible": []}, steps)
+        self.assertEqual(explained.explanation["score"], {"auto": None, "disability": 0, "home": None, "life": 0})
+
+    def test_scores_are_the_scores_of_the_engine(self):
+        with open(DEFAULT_RULE_SET) as f:
+            definition = json.load(f)
+        for rule in definition["rules"]:
+            if rule["name"] == "income_is_above_two_hundred_k":
+                rule["when"]["income"][">"] = 100000
+        engine = RuleSet(definition)
+        user = UserModel(age=45, dependents=0, house=None, income=150000, marital_status="single",
+                         risk_questions=[1, 0, 0], vehicle=None)
+        scored = RiskProfile(user, engine, scores=True)
+        self.assertEqual(scored.calculatedRiskProfile, engine.calculate(user))
+        self.assertEqual(scored.scores, {"auto": None, "disability": 0, "home": None, "life": 0})
+        self.assertEqual(scored.scores, RiskProfile(user, engine, explain=True, scores=True).scores)
+
+    def test_raw_user_is_validated(self):
+        user = {
+            "age": -1,
+            "dependents": 2,
+            "house": None,
+            "income": 0,
+            "marital_status": "married",
+            "risk_questions": [0, 1, 0],
+            "vehicle": None
+        }
+        with self.assertRaises(ValueError) as ctx:
+            RiskProfile(user)
+        self.assertEqual("Invalid age", str(ctx.exception))
+
+    def test_user_model_is_trusted(self):
+        user = UserModel(
+            age=35,
+            dependents=2,
+            house=None,
+            income=0,
+            marital_status="married",
+            risk_questions=[0, 1, 0],
+            vehicle=None
+        )
+        with mock.patch("riskProfile.Validator") as validator:
+            expected = RiskProfile(user).calculatedRiskProfile
+            validator.assert_not_called()
+            self.assertEqual(expected, RiskProfile(user, validate=True).calculatedRiskProfile)
+            validator.assert_called_once()
+            # the Validator receives the record the rules are applied to
+            record = validator.call_args.kwargs["user"]
+            self.assertIsInstance(record, UserRecord)
+            self.assertEqual((record.age, record.marital_status, record.vehicle_year), (35, "married", None))
+
+    def test_user_model_has_the_validator_rules(self):
+        user = {
+            "age": 35,
+            "dependents": 2,
+            "house": None,
+            "income": 0,
+            "marital_status": "married",
+            "risk_questions": [0, 1, 0],
+            "vehicle": None
+        }
+        bad_values = [
+            ("age", -1, "Invalid age"),
+            ("dependents", -1, "Invalid number of dependents"),
+            ("income", -1, "Invalid income"),
+            ("risk_questions", [0, 1, 2], "Invalid risk answer"),
+            ("vehicle", {"year": -1}, "Invalid vehicle year"),
+        ]
+        for attribute, value, message in bad_values:
+            with self.assertRaises(ValidationError) as ctx:
+                UserModel(**dict(user, **{attribute: value}))
+            self.assertEqual(message, ctx.exception.errors()[0]["msg"])
+            with self.assertRaises(ValueError) as ctx:
+                RiskProfile(dict(user, **{attribute: value}))
+            self.assertEqual(message, str(ctx.exception))
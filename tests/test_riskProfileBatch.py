@@ -0,0 +1,64 @@
+import sys, os
+
+testdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import unittest
+from riskProfile import RiskProfile
+from riskProfileBatch import RiskProfileBatch
+
+
+class TestRiskProfileBatch(unittest.TestCase):
+    def setUp(self) -> None:
+        self.users = [
+            {
+                "age": 51,
+                "dependents": 2,
+                "house": {"ownership_status": "mortgaged"},
+                "income": 120000,
+                "marital_status": "married",
+                "risk_questions": [0, 0, 1],
+                "vehicle": {"year": 2015}
+            },
+            {
+                "age": 61,
+                "dependents": 2,
+                "house": {"ownership_status": "mortgaged"},
+                "income": 220000,
+                "marital_status": "married",
+                "risk_questions": [0, 0, 1],
+                "vehicle": {"year": 2015}
+            },
+            {
+                "age": 25,
+                "dependents": 0,
+                "house": None,
+                "income": 0,
+                "marital_status": "single",
+                "risk_questions": [1, 1, 1],
+                "vehicle": None
+            }
+        ]
+
+    def test_batch_matches_single_risk_profile_in_order(self):
+        items = RiskProfileBatch(self.users).calculatedRiskProfiles
+        self.assertEqual(len(self.users), len(items))
+        for user, item in zip(self.users, items):
+            self.assertIsNone(item.detail)
+            self.assertEqual(RiskProfile(user).calculatedRiskProfile, item.result)
+
+    def test_batch_reports_errors_per_item(self):
+        users = list(self.users)
+        users.insert(1, dict(self.users[0], age=-1))
+        users.insert(2, dict(self.users[0], risk_questions=[0, 1]))
+        items = RiskProfileBatch(users).calculatedRiskProfiles
+        self.assertEqual(len(users), len(items))
+        self.assertEqual("Invalid age", items[1].detail[0]["msg"])
+        self.assertEqual(["risk_questions"], list(items[2].detail[0]["loc"]))
+        for i in (0, 3, 4):
+            self.assertIsNone(items[i].detail)
+            self.assertIsNotNone(items[i].result)
+
+    def test_empty_batch(self):
+        self.assertEqual([], RiskProfileBatch([]).calculatedRiskProfiles)
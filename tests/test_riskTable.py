@@ -0,0 +1,63 @@
+import sys, os
+
+testdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import datetime
+import unittest
+from unittest import mock
+from riskProfile import RiskProfile
+from riskTable import RiskTable
+from clock import Clock
+from engines import build_engine
+from tests.helpers import users
+
+
+class TestRiskTable(unittest.TestCase):
+    def setUp(self) -> None:
+        self.table = RiskTable()
+
+    def test_table_has_one_entry_per_class(self):
+        self.assertEqual(4 * 3 * 2 * 2 * 3 * 3 * 4, self.table.size)
+
+    def test_table_matches_rules(self):
+        for user in users():
+            self.assertEqual(RiskProfile(user).calculatedRiskProfile, self.table.calculate(user), user)
+
+    def test_risk_profile_with_table_engine(self):
+        engine = build_engine("table")
+        for user in users():
+            self.assertEqual(RiskProfile(user).calculatedRiskProfile,
+                             RiskProfile(user, engine).calculatedRiskProfile, user)
+
+    def test_table_is_rebuilt_when_the_year_changes(self):
+        year = self.table.year
+        user = {
+            "age": 50,
+            "dependents": 0,
+            "house": {"ownership_status": "owned"},
+            "income": 100000,
+            "marital_status": "single",
+            "risk_questions": [0, 0, 0],
+            "vehicle": {"year": year - 5}
+        }
+        self.assertEqual("regular", self.table.calculate(user)["auto"])
+
+        next_year = datetime.datetime(year + 1, 1, 1).timestamp()
+        with mock.patch("clock.time.time", return_value=next_year):
+            self.assertEqual("economic", self.table.calculate(user)["auto"])
+        self.assertEqual(year + 1, self.table.year)
+
+    def test_table_of_a_fixed_date(self):
+        table = RiskTable(Clock(datetime.date(2021, 6, 30)))
+        self.assertEqual(2021, table.year)
+        user = {"age": 50, "dependents": 0, "house": {"ownership_status": "owned"}, "income": 100000,
+                "marital_status": "single", "risk_questions": [0, 0, 0], "vehicle": {"year": 2016}}
+        self.assertEqual("regular", table.calculate(user)["auto"])
+        self.assertEqual("economic", RiskTable(Clock(datetime.date(2022, 1, 1))).calculate(user)["auto"])
+
+    def test_invalid_engine_raises_exception(self):
+        with self.assertRaises(ValueError) as ctx:
+            build_engine("magic")
+        self.assertEqual("Invalid risk engine magic", str(ctx.exception))
@@ -0,0 +1,109 @@
+import sys, os
+
+testdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import unittest
+from fastapi.testclient import TestClient
+import main
+import utils
+from riskProfile import RiskProfile
+from ruleMetrics import Histogram, RuleMetrics
+from rules import Rules
+from validator import Validator
+
+user = {
+    "age": 65,
+    "dependents": 0,
+    "house": None,
+    "income": 1000,
+    "marital_status": "single",
+    "risk_questions": [1, 0, 0],
+    "vehicle": None
+}
+
+
+class TestRuleMetrics(unittest.TestCase):
+    def setUp(self) -> None:
+        self.metrics = RuleMetrics()
+
+    def tearDown(self) -> None:
+        self.metrics.disable()
+
+    def test_methods_are_only_wrapped_while_enabled(self):
+        originals = (Rules.rule_age_risk, Rules.apply_all_rules, utils.process_score, Validator.validate_all)
+        self.metrics.enable()
+        self.assertTrue(self.metrics.enabled)
+        self.assertIsNot(Rules.rule_age_risk, originals[0])
+        with self.assertRaises(ValueError):
+            RuleMetrics().enable()
+        self.metrics.disable()
+        self.assertFalse(self.metrics.enabled)
+        self.assertEqual((Rules.rule_age_risk, Rules.apply_all_rules, utils.process_score, Validator.validate_all),
+                         originals)
+
+    def test_counts(self):
+        self.metrics.enable()
+        expected = RiskProfile(user).calculatedRiskProfile
+        RiskProfile(dict(user, age=30))
+        with self.assertRaises(ValueError):
+            RiskProfile(dict(user, age=-1))
+        stats = self.metrics.stats
+
+        self.assertEqual(stats["validator.validate_all"]["calls"], 3)
+        self.assertEqual(stats["validator.validate_all"]["errors"], 1)
+        self.assertEqual(stats["rules.apply_all_rules"]["calls"], 2)
+        self.assertEqual(stats["utils.process_score"]["calls"], 2)
+
+        over_sixty = stats["rules.rule_user_over_sixty_years"]
+        self.assertEqual((over_sixty["calls"], over_sixty["fired"]), (2, 1))
+        self.assertEqual(over_sixty["ineligible"], {"auto": 0, "disability": 1, "home": 0, "life": 1})
+        no_assets = stats["rules.rule_user_does_not_have_income_vehicle_or_house"]
+        self.assertEqual(no_assets["ineligible"], {"auto": 2, "disability": 0, "home": 2, "life": 0})
+        self.assertEqual(stats["rules.rule_age_risk"]["fired"], 1)
+        self.assertEqual(stats["rules.rule_user_is_married"]["fired"], 0)
+        # every line of the first user is ineligible, the scoring rules are skipped
+        self.assertEqual(stats["rules.rule_age_risk"]["calls"], 1)
+
+        latency = stats["rules.rule_age_risk"]["latency"]
+        self.assertEqual(latency["count"], 1)
+        self.assertEqual(latency["buckets"]["+Inf"], 1)
+
+        # the results do not change
+        self.metrics.disable()
+        self.assertEqual(RiskProfile(user).calculatedRiskProfile, expected)
+
+        self.metrics.reset()
+        self.assertEqual(self.metrics.stats["rules.rule_age_risk"]["calls"], 0)
+
+    def test_histogram(self):
+        histogram = Histogram((1.0, 2.0, float("inf")))
+        for value in (0.5, 1.0, 1.5, 3.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.snapshot(), {"count": 4, "sum": 6.0,
+                                                "buckets": {"1.0": 2, "2.0": 3, "+Inf": 4}})
+
+    def test_endpoint(self):
+        client = TestClient(main.app)
+        response = client.get("/metrics/rules")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {"detail": "Rule metrics are disabled"})
+
+        original = main.rule_metrics
+        main.rule_metrics = self.metrics
+        try:
+            self.metrics.enable()
+            for _ in range(5):
+                client.post("/api/risk/", json=user)
+            stats = client.get("/metrics/rules").json()
+            self.assertEqual(stats["rules.apply_all_rules"]["calls"], 5)
+            self.assertEqual(stats["rules.rule_user_over_sixty_years"]["fired"], 5)
+            # the final processing of the plans returned by /api/risk/
+            self.assertEqual(stats["utils.process_score"]["calls"], 5)
+        finally:
+            main.rule_metrics = original
+
+
+if __name__ == '__main__':
+    unittest.main()
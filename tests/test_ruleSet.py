@@ -0,0 +1,125 @@
+import sys, os
+
+testdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import datetime
+import json
+import tempfile
+import unittest
+from copy import deepcopy
+from unittest import mock
+import utils
+from riskProfile import RiskProfile
+from rules import Rules
+from ruleSet import RuleSet, DEFAULT_RULE_SET
+from engines import build_engine
+from userRecord import LINES
+from tests.helpers import users
+
+
+class TestRuleSet(unittest.TestCase):
+    def setUp(self) -> None:
+        with open(DEFAULT_RULE_SET) as f:
+            self.definition = json.load(f)
+        self.rule_set = RuleSet(self.definition)
+
+    def test_default_rule_set_matches_rules(self):
+        for user in users():
+            self.assertEqual(RiskProfile(user).calculatedRiskProfile, self.rule_set.calculate(user), user)
+
+    def test_default_rule_set_matches_rules_score(self):
+        for user in users():
+            rules = Rules(user=user, score={"auto": 0, "disability": 0, "home": 0, "life": 0})
+            rules.apply_all_rules()
+            house = user["house"] and user["house"]["ownership_status"]
+            vehicle = user["vehicle"] and user["vehicle"]["year"]
+            score = self.rule_set.evaluate(user["age"], user["dependents"], user["income"], user["marital_status"],
+                                           house, vehicle, sum(user["risk_questions"]), datetime.datetime.now().year)
+            self.assertEqual(tuple(rules.score.values()), utils.numeric_score(score), user)
+
+    def test_explain_adds_up_to_the_score(self):
+        for user in users():
+            steps, score = self.rule_set.explain(user)
+            self.assertEqual(score, list(self.rule_set.evaluate(*self.rule_set._arguments(user))), user)
+            self.assertEqual([step["rule"] for step in steps], [rule["name"] for rule in self.definition["rules"]])
+            totals = dict.fromkeys(LINES, 0)
+            ineligible = []
+            for step in steps:
+                for line, delta in step["delta"].items():
+                    totals[line] += delta
+                ineligible.extend(step["ineligible"])
+            eligible = {line: value for line, value in zip(LINES, utils.numeric_score(score)) if value is not None}
+            self.assertEqual({line: totals[line] for line in eligible}, eligible, user)
+            self.assertEqual(sorted(ineligible), sorted(set(LINES) - set(eligible)), user)
+
+    def test_ruleset_engine(self):
+        engine = build_engine("ruleset")
+        self.assertEqual("default-1", engine.version)
+        user = next(users())
+        self.assertEqual(RiskProfile(user).calculatedRiskProfile, RiskProfile(user, engine).calculatedRiskProfile)
+
+    def test_rule_set_from_yaml_file(self):
+        try:
+            import yaml
+        except ImportError:
+            self.skipTest("PyYAML is not installed")
+        with tempfile.NamedTemporaryFile("w", suffix=".yaml", delete=False) as f:
+            yaml.safe_dump(self.definition, f, sort_keys=False)
+        try:
+            rule_set = RuleSet.from_file(f.name)
+        finally:
+            os.remove(f.name)
+        self.assertEqual(self.rule_set.source, rule_set.source)
+
+    def test_yaml_rule_set_without_pyyaml(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".yaml", delete=False) as f:
+            f.write("version: bad\n")
+        try:
+            with mock.patch.dict(sys.modules, {"yaml": None}):
+                with self.assertRaises(ValueError) as ctx:
+                    RuleSet.from_file(f.name)
+        finally:
+            os.remove(f.name)
+        self.assertEqual("YAML rule sets need PyYAML (pip install PyYAML)", str(ctx.exception))
+
+    def test_changed_threshold(self):
+        definition = deepcopy(self.definition)
+        for rule in definition["rules"]:
+            if rule["name"] == "income_is_above_two_hundred_k":
+                rule["when"]["income"][">"] = 100000
+        rule_set = RuleSet(definition)
+        self.assertEqual((-1, -1, -1, -1, 0b1010), rule_set.evaluate(45, 0, 150000, "single", None, None, 0, 2021))
+        self.assertEqual((0, 0, 0, 0, 0b1010), self.rule_set.evaluate(45, 0, 150000, "single", None, None, 0, 2021))
+
+    def test_field_deltas_of_users_without_vehicle(self):
+        definition = deepcopy(self.definition)
+        definition["rules"].append({"name": "per_risk", "add": {"auto": "risk", "life": "age"}})
+        rule_set = RuleSet(definition)
+        user = {"age": 35, "dependents": 0, "house": None, "income": 1000, "marital_status": "single",
+                "risk_questions": [1, 1, 0], "vehicle": None}
+        self.assertEqual(rule_set.plans(user), ("ineligible", "regular", "ineligible", "responsible"))
+
+    def test_invalid_rule_sets_raise_exception(self):
+        bad_rules = [
+            ({"name": "r", "when": {"height": {">": 1}}, "add": {"auto": 1}}, "Invalid rule r: unknown field height"),
+            ({"name": "r", "when": {"age": {"~": 1}}, "add": {"auto": 1}}, "Invalid rule r: unknown operator ~"),
+            ({"name": "r", "add": {"pet": 1}}, "Invalid rule r: unknown line of insurance pet"),
+            ({"name": "r", "add": {"auto": "1; import os"}}, "Invalid rule r: invalid delta '1; import os'"),
+            ({"name": "r", "add": {"auto": "vehicle_age"}},
+             "Invalid rule r: vehicle_age can be null, it can not be a delta"),
+            ({"name": "r", "add": {"auto": "vehicle"}}, "Invalid rule r: vehicle can be null, it can not be a delta"),
+            ({"name": "r", "ineligible": ["pet"]}, "Invalid rule r: unknown line of insurance pet"),
+            ({"name": "r", "when": {"age": {">": None}}, "ineligible": ["auto"]},
+             "Invalid rule r: null can only be compared with == or !="),
+            ({"name": "r"}, 'Invalid rule r: it must have either "add" or "ineligible"'),
+            ({"name": "r\nimport os", "add": {"auto": 1}}, "Invalid rule name 'r\\nimport os'"),
+        ]
+        for rule, message in bad_rules:
+            with self.assertRaises(ValueError) as ctx:
+                RuleSet({"version": "bad", "rules": [rule]})
+            self.assertEqual(message, str(ctx.exception))
+        with self.assertRaises(ValueError) as ctx:
+            RuleSet({"version": "bad"})
+        self.assertEqual("Invalid rule set: missing list of rules", str(ctx.exception))
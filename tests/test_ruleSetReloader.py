@@ -0,0 +1,154 @@
+import sys, os
+
+testdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import json
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+from fastapi.testclient import TestClient
+import main
+from engines import build_engine_as_of
+from ruleSet import DEFAULT_RULE_SET
+from ruleSetReloader import RuleSetReloader
+
+user = {
+    "age": 45,
+    "dependents": 0,
+    "house": None,
+    "income": 150000,
+    "marital_status": "single",
+    "risk_questions": [1, 0, 0],
+    "vehicle": None
+}
+
+
+class TestRuleSetReloader(unittest.TestCase):
+    def setUp(self) -> None:
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "rules.json")
+        shutil.copy(DEFAULT_RULE_SET, self.path)
+        with open(DEFAULT_RULE_SET) as f:
+            self.definition = json.load(f)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.dir)
+
+    def write(self, definition) -> None:
+        # write to a temporary file and rename it, so the reloader never reads a partial file
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(definition if isinstance(definition, str) else json.dumps(definition))
+        mtime = os.stat(self.path).st_mtime_ns + 1000000
+        os.utime(tmp, ns=(mtime, mtime))
+        os.replace(tmp, self.path)
+
+    def lower_income_threshold(self) -> dict:
+        definition = json.loads(json.dumps(self.definition))
+        definition["version"] = "lower-income-threshold"
+        for rule in definition["rules"]:
+            if rule["name"] == "income_is_above_two_hundred_k":
+                rule["when"]["income"][">"] = 100000
+        return definition
+
+    def test_reload_swaps_rule_set_when_file_changes(self):
+        reloader = RuleSetReloader(self.path, interval=0)
+        self.assertEqual("default-1", reloader.version)
+        self.assertEqual("regular", reloader.calculate(user)["life"])
+        self.assertFalse(reloader.reload())
+
+        self.write(self.lower_income_threshold())
+        self.assertEqual("regular", reloader.calculate(user)["life"])
+        self.assertTrue(reloader.reload())
+        self.assertEqual("lower-income-threshold", reloader.version)
+        self.assertEqual("economic", reloader.calculate(user)["life"])
+
+    def test_invalid_file_keeps_current_rule_set(self):
+        reloader = RuleSetReloader(self.path, interval=0)
+        rule_set = reloader.ruleSet
+        self.write("{not json")
+        with self.assertLogs("ruleSetReloader", level="ERROR"):
+            self.assertFalse(reloader.reload())
+        self.assertIs(rule_set, reloader.ruleSet)
+        self.assertFalse(reloader.reload())
+
+    def test_nullable_delta_keeps_current_rule_set(self):
+        reloader = RuleSetReloader(self.path, interval=0)
+        definition = self.lower_income_threshold()
+        definition["rules"].append({"name": "per_vehicle", "add": {"auto": "vehicle_age"}})
+        self.write(definition)
+        with self.assertLogs("ruleSetReloader", level="ERROR"):
+            self.assertFalse(reloader.reload())
+        self.assertEqual("default-1", reloader.version)
+        self.assertEqual("regular", reloader.calculate(user)["life"])
+
+    def test_calculate_checks_file_after_interval(self):
+        reloader = RuleSetReloader(self.path, interval=0.01)
+        self.write(self.lower_income_threshold())
+        time.sleep(0.02)
+        self.assertEqual("economic", reloader.calculate(user)["life"])
+        self.assertEqual("lower-income-threshold", reloader.version)
+
+    def test_api_returns_rule_set_version_header(self):
+        client = TestClient(main.app)
+        response = client.post("/api/risk/", json=user)
+        self.assertNotIn("X-Rule-Set-Version", response.headers)
+
+        with mock.patch.object(main, "engine", RuleSetReloader(self.path, interval=0)):
+            response = client.post("/api/risk/", json=user)
+            self.assertEqual("default-1", response.headers["X-Rule-Set-Version"])
+            response = client.post("/api/risk/batch", json=[user])
+            self.assertEqual("default-1", response.headers["X-Rule-Set-Version"])
+            self.assertEqual("regular", response.json()[0]["result"]["life"])
+
+    def test_api_scores_as_of_dates_with_the_rule_set(self):
+        client = TestClient(main.app)
+        self.write(self.lower_income_threshold())
+        # the engines of the as-of dates are built from the settings, they must not be kept for the other tests
+        build_engine_as_of.cache_clear()
+        self.addCleanup(build_engine_as_of.cache_clear)
+        with mock.patch.object(main, "engine", RuleSetReloader(self.path, interval=0)), \
+                mock.patch.object(main, "engine_name", "ruleset"), mock.patch("engines.RISK_RULE_SET", self.path):
+            for url in ["/api/risk/", "/api/risk/?as_of=2021-01-01"]:
+                response = client.post(url, json=user)
+                self.assertEqual("lower-income-threshold", response.headers["X-Rule-Set-Version"], url)
+                self.assertEqual("economic", response.json()["life"], url)
+            response = client.post("/api/risk/batch?as_of=2021-01-01", json=[user])
+            self.assertEqual("lower-income-threshold", response.headers["X-Rule-Set-Version"])
+            self.assertEqual("economic", response.json()[0]["result"]["life"])
+
+    def test_api_explains_the_rule_set(self):
+        client = TestClient(main.app)
+        self.write(self.lower_income_threshold())
+        with mock.patch.object(main, "engine", RuleSetReloader(self.path, interval=0)):
+            plain = client.post("/api/risk/", json=user)
+            response = client.post("/api/risk/?explain=true", json=user)
+        self.assertEqual("lower-income-threshold", response.headers["X-Rule-Set-Version"])
+        body = response.json()
+        explanation = body.pop("explanation")
+        self.assertEqual(plain.json(), body)
+        self.assertEqual("economic", body["life"])
+        self.assertEqual([step["rule"] for step in explanation["steps"]],
+                         [rule["name"] for rule in self.definition["rules"]])
+
+    def test_api_scores_with_the_rule_set(self):
+        client = TestClient(main.app)
+        self.write(self.lower_income_threshold())
+        with mock.patch.object(main, "engine", RuleSetReloader(self.path, interval=0)):
+            plain = client.post("/api/risk/", json=user)
+            response = client.post("/api/risk/?scores=true", json=user)
+        self.assertEqual("lower-income-threshold", response.headers["X-Rule-Set-Version"])
+        body = response.json()
+        scores = body.pop("scores")
+        self.assertEqual(plain.json(), body)
+        self.assertEqual({"auto": None, "disability": 0, "home": None, "life": 0}, scores)
+
+    def test_api_rejects_as_of_dates_of_the_shared_engine(self):
+        with mock.patch.object(main, "engine_name", "shared"):
+            response = TestClient(main.app).post("/api/risk/?as_of=2021-01-01", json=user)
+        self.assertEqual(400, response.status_code)
+        self.assertEqual("The shared engine can not score as of another date", response.json()["detail"])
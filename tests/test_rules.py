@@ -27,13 +27,13 @@ class TestRules(unittest.TestCase):
         test_array = [
             {"expected_score": {"auto": 0, "disability": 0, "home": 0, "life": 0},
             "user": {"income": 10000, "vehicle": {"year": 2020}, "house": {"ownership_status": "owned"}}},
-            {"expected_score": {"auto": -99, "disability": 0, "home": 0, "life": 0},
+            {"expected_score": {"auto": None, "disability": 0, "home": 0, "life": 0},
             "user": {"income": 10000, "vehicle": None, "house": {"ownership_status": "owned"}}},
-            {"expected_score": { "auto": 0, "disability": -99, "home": 0, "life": 0},
+            {"expected_score": { "auto": 0, "disability": None, "home": 0, "life": 0},
             "user": {"income": 0, "vehicle": {"year": 2020}, "house": {"ownership_status": "owned"}}},
-            {"expected_score": { "auto": 0, "disability": 0, "home": -99, "life": 0},
+            {"expected_score": { "auto": 0, "disability": 0, "home": None, "life": 0},
             "user": {"income": 10000, "vehicle": {"year": 2020}, "house": None}},
-            {"expected_score": {"auto": -99, "disability": -99, "home": -99, "life": 0},
+            {"expected_score": {"auto": None, "disability": None, "home": None, "life": 0},
             "user": {"income": 0, "vehicle": None, "house": None}}
         ]
 
@@ -45,7 +45,7 @@ class TestRules(unittest.TestCase):
     def test_rule_user_over_sixty_years(self):
         # 2. If the user is over 60 years old, she is ineligible for disability and life insurance.
         user = {"age": 61}
-        expected_score = {"auto": 0, "disability": -99, "home": 0, "life": -99}
+        expected_score = {"auto": 0, "disability": None, "home": 0, "life": None}
         rules = Rules(user=user, score=deepcopy(self._initial_score))
         rules.rule_user_over_sixty_years()
         self.assertEqual(expected_score, rules.score)
@@ -141,3 +141,53 @@ class TestRules(unittest.TestCase):
         rules = Rules(user=user, score=deepcopy(self._initial_score))
         rules.rule_vehicle_last_five_years()
         self.assertEqual(expected_score, rules.score)
+
+    def test_explain_applies_the_rules_in_order(self):
+        user = {"age": 35, "dependents": 2, "house": {"ownership_status": "owned"}, "income": 0,
+                "marital_status": "married", "risk_questions": [0, 1, 0], "vehicle": {"year": 2018}}
+        applied = Rules(user=user, score=deepcopy(self._initial_score))
+        applied.apply_all_rules()
+        explained = Rules(user=user, score=deepcopy(self._initial_score))
+        steps = explained.explain()
+
+        self.assertEqual(applied.score, explained.score)
+        self.assertEqual([step["rule"] for step in steps], list(Rules.RULES))
+        self.assertEqual(steps[0], {"rule": "rule_user_over_sixty_years", "delta": {}, "ineligible": []})
+        self.assertEqual(steps[1], {"rule": "rule_user_does_not_have_income_vehicle_or_house",
+                                    "delta": {}, "ineligible": ["disability"]})
+        # no deltas of the ineligible lines
+        self.assertEqual(steps[2], {"rule": "rule_risk_questions",
+                                    "delta": {"auto": 1, "home": 1, "life": 1}, "ineligible": []})
+        self.assertEqual(steps[4], {"rule": "rule_user_is_married", "delta": {"life": 1}, "ineligible": []})
+
+    def test_rules_of_ineligible_lines_are_skipped(self):
+        # over sixty, without income, vehicle or house: every line is ineligible
+        user = {"age": 61, "dependents": 2, "house": None, "income": 0,
+                "marital_status": "married", "risk_questions": [1, 1, 1], "vehicle": None}
+        rules = Rules(user=user, score=deepcopy(self._initial_score))
+        rules.apply_all_rules()
+        self.assertEqual({"auto": None, "disability": None, "home": None, "life": None}, rules.score)
+        self.assertEqual(0, sum(rules.scoreArray[:4]))
+        self.assertEqual([step["rule"] for step in rules.explain()], list(Rules.RULES[:2]))
+
+        # only auto is eligible
+        user = dict(user, vehicle={"year": datetime.datetime.now().year})
+        rules = Rules(user=user, score=deepcopy(self._initial_score))
+        steps = rules.explain()
+        self.assertNotIn("rule_user_is_married", [step["rule"] for step in steps])
+        self.assertEqual({"auto": 4, "disability": None, "home": None, "life": None}, rules.score)
+
+    def test_ineligible_line_is_not_processed_as_a_score(self):
+        # a deduction after the line is ineligible does not make it "economic"
+        user = {"age": 20, "dependents": 0, "house": None, "income": 300000,
+                "marital_status": "single", "risk_questions": [0, 0, 0], "vehicle": {"year": 2000}}
+        rules = Rules(user=user, score=deepcopy(self._initial_score))
+        rules.rule_user_does_not_have_income_vehicle_or_house()
+        rules.rule_age_risk()
+        rules.rule_if_income_is_above_two_hundred_k()
+        self.assertEqual("ineligible", rules.processedScore.home)
+        self.assertEqual("economic", rules.processedScore.auto)
+
+    def test_explain_has_every_rule(self):
+        names = sorted(name for name in dir(Rules) if name.startswith("rule_"))
+        self.assertEqual(names, sorted(Rules.RULES))
@@ -0,0 +1,155 @@
+import sys, os
+
+testdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import asyncio
+import datetime
+import unittest
+from itertools import islice
+from unittest import mock
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+import main
+from clock import Clock
+from riskProfileBatch import RiskProfileBatch
+from ruleSet import RuleSet
+from scheduler import Overloaded, Scheduler, score_users
+from tests.helpers import users
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.users = list(islice(users(), 0, None, 11))
+        self.users.insert(5, dict(self.users[0], age=-1))
+        self.users.insert(9, dict(self.users[0], marital_status="widow"))
+
+    def test_small_batches_are_scored_inline(self):
+        scheduler = Scheduler(workers=2, inline_limit=len(self.users))
+        items, version = asyncio.run(scheduler.score(self.users))
+        self.assertIsNone(version)
+        # the same JSON response (the locations of the errors are lists instead of tuples)
+        self.assertEqual(jsonable_encoder(items), jsonable_encoder(RiskProfileBatch(self.users).calculatedRiskProfiles))
+        self.assertEqual(scheduler.stats, {"pending": 0, "inline": 1, "offloaded": 0, "rejected": 0})
+        scheduler.close()
+
+    def test_large_batches_are_scored_by_the_pool(self):
+        scheduler = Scheduler(workers=2, inline_limit=10, chunk_size=50)
+        try:
+            items, _ = asyncio.run(scheduler.score(self.users))
+            clock = Clock(datetime.date(2019, 7, 1))
+            items_as_of, _ = asyncio.run(scheduler.score(self.users, clock=clock))
+        finally:
+            scheduler.close()
+        # the same JSON response (the locations of the errors are lists instead of tuples)
+        self.assertEqual(jsonable_encoder(items), jsonable_encoder(RiskProfileBatch(self.users).calculatedRiskProfiles))
+        self.assertEqual(jsonable_encoder(items_as_of),
+                         jsonable_encoder(RiskProfileBatch(self.users, clock=clock).calculatedRiskProfiles))
+        self.assertEqual(scheduler.stats, {"pending": 0, "inline": 0, "offloaded": 2, "rejected": 0})
+
+    def test_score_users_matches_the_batch_errors(self):
+        expected = RiskProfileBatch(self.users).calculatedRiskProfiles
+        results, versions = score_users((self.users, None))
+        self.assertEqual(versions, [])
+        for item, result in zip(expected, results):
+            if item.detail is None:
+                self.assertEqual(tuple(item.result.dict().values()), result)
+            else:
+                self.assertEqual(jsonable_encoder(item.detail), result)
+
+    def test_inline_and_pooled_batches_have_the_same_errors(self):
+        invalid = [dict(self.users[0], age=-1), dict(self.users[0], age="x"), {}, "user", 3, None, [1],
+                   dict(self.users[0], house={"ownership_status": "rented"}), dict(self.users[0], vehicle={"year": "x"}),
+                   dict(self.users[0], risk_questions=[0, 1, 2]), dict(self.users[0], income=-1, dependents=-1)]
+        inline = Scheduler(workers=1, inline_limit=len(invalid))
+        pooled = Scheduler(workers=1, inline_limit=0, chunk_size=4)
+        try:
+            inline_items, _ = asyncio.run(inline.score(invalid))
+            pooled_items, _ = asyncio.run(pooled.score(invalid))
+        finally:
+            pooled.close()
+        self.assertEqual(inline.stats["inline"], 1)
+        self.assertEqual(pooled.stats["offloaded"], 1)
+        self.assertEqual(jsonable_encoder(inline_items), jsonable_encoder(pooled_items))
+        self.assertTrue(all(item.detail for item in inline_items))
+
+    def test_overloaded_scheduler_rejects_batches(self):
+        scheduler = Scheduler(workers=1, inline_limit=0, chunk_size=10, max_pending=3)
+
+        async def run():
+            started = asyncio.Event()
+            release = asyncio.Event()
+
+            async def blocked_chunk(chunk, as_of):
+                started.set()
+                await release.wait()
+                scheduler._pending -= 1
+                return [], []
+
+            with mock.patch.object(scheduler, "_score_chunk", blocked_chunk):
+                first = asyncio.ensure_future(scheduler.score(self.users[:30]))
+                await started.wait()
+                with self.assertRaises(Overloaded):
+                    await scheduler.score(self.users[:10])
+                release.set()
+                await first
+                await scheduler.score(self.users[:30])
+
+        asyncio.run(run())
+        self.assertEqual(scheduler.stats, {"pending": 0, "inline": 0, "offloaded": 2, "rejected": 1})
+
+    def test_large_batch_is_accepted_by_an_idle_scheduler(self):
+        # more chunks than max_pending, but nothing else is pending
+        scheduler = Scheduler(workers=1, inline_limit=0, chunk_size=10, max_pending=2)
+
+        async def chunk_results(chunk, as_of):
+            scheduler._pending -= 1
+            return [None] * len(chunk), []
+
+        with mock.patch.object(scheduler, "_score_chunk", chunk_results):
+            items, _ = asyncio.run(scheduler.score(self.users[:50]))
+        self.assertEqual(len(items), 50)
+        self.assertEqual(scheduler.stats, {"pending": 0, "inline": 0, "offloaded": 1, "rejected": 0})
+
+    def test_versions_of_the_rule_sets_that_scored_the_batch(self):
+        inline_items, version = asyncio.run(Scheduler(workers=0).score(self.users, RuleSet.from_file()))
+        self.assertEqual(version, "default-1")
+        self.assertEqual(jsonable_encoder(inline_items),
+                         jsonable_encoder(RiskProfileBatch(self.users).calculatedRiskProfiles))
+
+        # the processes of the pool reload the rule set on their own, a deploy can split a batch
+        scheduler = Scheduler(workers=2, inline_limit=0, chunk_size=10)
+        chunk_versions = iter([["default-1"], ["default-1", "default-2"], ["default-2"]])
+
+        async def chunk_results(chunk, as_of):
+            scheduler._pending -= 1
+            return [None] * len(chunk), next(chunk_versions)
+
+        with mock.patch.object(scheduler, "_score_chunk", chunk_results):
+            _, version = asyncio.run(scheduler.score(self.users[:30]))
+        self.assertEqual(version, "default-1, default-2")
+
+    def test_endpoint_returns_the_versions_of_the_batch(self):
+        client = TestClient(main.app)
+        with mock.patch.object(main.scheduler, "score", mock.AsyncMock(return_value=([], "default-1, default-2"))):
+            response = client.post("/api/risk/batch", json=self.users)
+        self.assertEqual(response.headers["X-Rule-Set-Version"], "default-1, default-2")
+
+    def test_endpoint_answers_429_when_overloaded(self):
+        client = TestClient(main.app)
+        with mock.patch.object(main.scheduler, "score", side_effect=Overloaded('Too many pending batches')):
+            response = client.post("/api/risk/batch", json=self.users)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["retry-after"], "1")
+        self.assertEqual(response.json(), {"detail": "Too many pending batches"})
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            Scheduler(workers=-1)
+        with self.assertRaises(ValueError):
+            Scheduler(chunk_size=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import sys, os
+
+testdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import datetime
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import gunicorn_conf
+from riskTable import RiskTable
+from sharedRiskTable import SharedRiskTable, HEADER
+from engines import build_engine
+from tests.helpers import users
+
+
+class TestSharedRiskTable(unittest.TestCase):
+    def setUp(self) -> None:
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "table.bin")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.dir)
+
+    def test_first_reader_publishes_the_table(self):
+        self.assertFalse(os.path.exists(self.path))
+        table = SharedRiskTable(self.path)
+        self.assertEqual(HEADER.size + 1728 * 4, os.path.getsize(self.path))
+        self.assertEqual(datetime.datetime.now().year, table.year)
+
+    def test_workers_share_the_published_table(self):
+        SharedRiskTable.publish(self.path)
+        mtime = os.stat(self.path).st_mtime_ns
+        workers = [SharedRiskTable(self.path), SharedRiskTable(self.path)]
+        self.assertEqual(mtime, os.stat(self.path).st_mtime_ns)
+        expected = RiskTable()
+        for user in users():
+            for worker in workers:
+                self.assertEqual(expected.calculate(user), worker.calculate(user), user)
+                self.assertEqual(expected.plans(user), worker.plans(user), user)
+
+    def test_invalid_file_is_published_again(self):
+        for content in [b"", b"garbage", b"RISKTBL1" + b"\0" * 20]:
+            with open(self.path, "wb") as f:
+                f.write(content)
+            table = SharedRiskTable(self.path)
+            self.assertEqual(HEADER.size + 1728 * 4, os.path.getsize(self.path))
+            self.assertEqual(datetime.datetime.now().year, table.year)
+
+    def test_table_is_published_again_when_the_year_changes(self):
+        table = SharedRiskTable(self.path)
+        year = table.year
+        user = {
+            "age": 50,
+            "dependents": 0,
+            "house": {"ownership_status": "owned"},
+            "income": 100000,
+            "marital_status": "single",
+            "risk_questions": [0, 0, 0],
+            "vehicle": {"year": year - 5}
+        }
+        self.assertEqual("regular", table.calculate(user)["auto"])
+
+        next_year = datetime.datetime(year + 1, 1, 1).timestamp()
+        with mock.patch("clock.time.time", return_value=next_year):
+            self.assertEqual("economic", table.calculate(user)["auto"])
+            self.assertEqual(year + 1, SharedRiskTable(self.path).year)
+
+    def test_gunicorn_master_publishes_the_table(self):
+        with mock.patch("engines.RISK_ENGINE", "shared"), mock.patch("engines.RISK_SHARED_TABLE", self.path):
+            gunicorn_conf.on_starting(server=None)
+            self.assertTrue(os.path.exists(self.path))
+            engine = build_engine("shared")
+        self.assertIsInstance(engine, SharedRiskTable)
+
+    def test_gunicorn_master_does_not_publish_for_other_engines(self):
+        with mock.patch("engines.RISK_ENGINE", "rules"), mock.patch("engines.RISK_SHARED_TABLE", self.path):
+            gunicorn_conf.on_starting(server=None)
+        self.assertFalse(os.path.exists(self.path))
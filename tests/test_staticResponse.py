@@ -0,0 +1,95 @@
+import sys, os
+
+testdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import json
+import subprocess
+import tempfile
+import unittest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.routing import Route
+import main
+from staticResponse import StaticResponse, encode_json, openapi_schema
+
+
+def client(response: StaticResponse) -> TestClient:
+    app = FastAPI()
+    app.router.routes.append(Route("/static", response, methods=["GET", "HEAD"]))
+    return TestClient(app)
+
+
+class TestStaticResponse(unittest.TestCase):
+    def test_body_and_headers(self):
+        static = StaticResponse(b'{"a":1}', max_age=60)
+        response = client(static).get("/static")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'{"a":1}')
+        self.assertEqual(response.headers["content-type"], "application/json")
+        self.assertEqual(response.headers["etag"], static.etag)
+        self.assertEqual(response.headers["cache-control"], "public, max-age=60")
+
+    def test_not_modified(self):
+        static = StaticResponse(b'{"a":1}')
+        for tag in [static.etag, "W/" + static.etag, '"other", ' + static.etag, "*"]:
+            response = client(static).get("/static", headers={"If-None-Match": tag})
+            self.assertEqual(response.status_code, 304, tag)
+            self.assertEqual(response.content, b"")
+            self.assertEqual(response.headers["etag"], static.etag)
+        self.assertEqual(client(static).get("/static", headers={"If-None-Match": '"other"'}).status_code, 200)
+
+    def test_head(self):
+        response = client(StaticResponse(b'{"a":1}')).head("/static")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-length"], "7")
+        self.assertEqual(response.content, b"")
+
+    def test_body_is_built_once(self):
+        calls = []
+        static = StaticResponse(build=lambda: calls.append(1) or b"[]")
+        self.assertEqual(calls, [])
+        test_client = client(static)
+        for _ in range(3):
+            self.assertEqual(test_client.get("/static").content, b"[]")
+        self.assertEqual(calls, [1])
+
+    def test_body_is_required(self):
+        with self.assertRaises(ValueError):
+            StaticResponse()
+
+
+class TestOpenAPISchema(unittest.TestCase):
+    def test_served_schema_is_the_schema_of_the_app(self):
+        response = TestClient(main.app).get("/openapi.json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), main.app.openapi())
+        self.assertEqual(response.headers["etag"], main.openapi_response.etag)
+        self.assertEqual(TestClient(main.app).get("/docs").status_code, 200)
+
+    def test_build_step_writes_the_schema(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "openapi.json")
+            subprocess.run([sys.executable, "staticResponse.py", path], check=True,
+                           cwd=os.path.abspath(os.path.join(testdir, srcdir)))
+            with open(path, "rb") as f:
+                self.assertEqual(json.loads(f.read()), main.app.openapi())
+            self.assertEqual(openapi_schema(main.app, path), encode_json(main.app.openapi()))
+
+    def test_schema_is_generated_without_file(self):
+        self.assertEqual(openapi_schema(main.app, "/nonexistent/openapi.json"), encode_json(main.app.openapi()))
+        self.assertEqual(openapi_schema(main.app), encode_json(main.app.openapi()))
+
+
+class TestIndex(unittest.TestCase):
+    def test_index(self):
+        response = TestClient(main.app).get("/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/json")
+        self.assertEqual(response.json(), {"message": "Hello World",
+                                           "documentation": "Call /docs to see all the documentation"})
+
+
+if __name__ == '__main__':
+    unittest.main()
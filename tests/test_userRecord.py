@@ -0,0 +1,84 @@
+import sys, os
+
+testdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import unittest
+from models.user_model import UserModel
+from rules import Rules
+from userRecord import AUTO, DISABILITY, HOME, LIFE, ELIGIBILITY, ALL_ELIGIBLE, UserRecord, new_score
+import utils as utils
+
+user = {
+    "age": 35,
+    "dependents": 2,
+    "house": {"ownership_status": "mortgaged"},
+    "income": 0,
+    "marital_status": "married",
+    "risk_questions": [0, 1, 0],
+    "vehicle": {"year": 2018}
+}
+
+
+class TestUserRecord(unittest.TestCase):
+    def assertRecord(self, record):
+        self.assertEqual((record.age, record.dependents, record.income, record.marital_status,
+                          record.ownership_status, record.vehicle_year, list(record.risk_questions)),
+                         (35, 2, 0, "married", "mortgaged", 2018, [0, 1, 0]))
+
+    def test_from_dict_and_model(self):
+        self.assertRecord(UserRecord.from_user(user))
+        record = UserRecord.from_user(UserModel.parse_obj(user))
+        self.assertRecord(record)
+        # enumeration members are converted to their values
+        self.assertIs(record.marital_status.__class__, str)
+        self.assertIs(UserRecord.from_user(record), record)
+
+    def test_no_house_or_vehicle(self):
+        record = UserRecord.from_user(dict(user, house=None, vehicle=None))
+        self.assertIsNone(record.ownership_status)
+        self.assertIsNone(record.vehicle_year)
+        self.assertIsNone(record["house"])
+        self.assertIsNone(record["vehicle"])
+
+    def test_partial_dict(self):
+        record = UserRecord.from_user({"age": 61})
+        self.assertEqual(record.age, 61)
+        self.assertFalse(hasattr(record, "income"))
+        self.assertIsNone(record.ownership_status)
+        with self.assertRaises(KeyError):
+            record["income"]
+
+    def test_invalid_house_and_vehicle_are_kept_invalid(self):
+        record = UserRecord.from_user(dict(user, house={}, vehicle={"year": "new"}))
+        self.assertEqual(record.ownership_status, "")
+        self.assertEqual(record.vehicle_year, "new")
+
+    def test_getitem_has_the_fields_of_user_model(self):
+        record = UserRecord.from_user(user)
+        for field in user:
+            self.assertEqual(record[field], user[field])
+        with self.assertRaises(KeyError):
+            record["__class__"]
+
+    def test_rules_update_the_score_array(self):
+        score = new_score()
+        rules = Rules(user=UserRecord.from_user(user), score=score)
+        rules.apply_all_rules()
+        self.assertIs(rules.scoreArray, score)
+        # the user has no income, so disability is ineligible
+        self.assertEqual(score[ELIGIBILITY], ALL_ELIGIBLE & ~(1 << DISABILITY))
+        self.assertEqual(rules.score, {"auto": score[AUTO], "disability": None,
+                                       "home": score[HOME], "life": score[LIFE]})
+
+    def test_risk_models_are_shared(self):
+        plans = ("regular", "ineligible", "economic", "responsible")
+        self.assertEqual(utils.process_score([1, 0, 0, 3, 0b1101]), plans)
+        model = utils.risk_model(plans)
+        self.assertIs(utils.risk_model(plans), model)
+        self.assertEqual(model.dict(), dict(zip(("auto", "disability", "home", "life"), plans)))
+
+
+if __name__ == '__main__':
+    unittest.main()
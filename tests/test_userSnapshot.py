@@ -0,0 +1,94 @@
+import sys, os
+
+testdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import json
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from rules import Rules
+from userSnapshot import ROW_SIZE, UserSnapshotWriter, read_snapshot, snapshot_rows
+from vectorizedRules import LINES, VectorizedRules, columns_from_users
+import batch
+from tests.helpers import users
+
+
+class TestUserSnapshot(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "users.rsk")
+        self.users = list(users())
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        with UserSnapshotWriter(self.path) as writer:
+            for i in range(0, len(self.users), 1000):
+                self.assertEqual(writer.write(self.users[i:i + 1000]), 0)
+        self.assertEqual(snapshot_rows(self.path), len(self.users))
+        self.assertLessEqual(os.path.getsize(self.path), 64 + ROW_SIZE * len(self.users))
+
+        columns = read_snapshot(self.path)
+        expected = columns_from_users(self.users)
+        for name, column in columns.items():
+            self.assertIsInstance(column, np.memmap)
+            np.testing.assert_array_equal(column, expected[name])
+
+        middle = read_snapshot(self.path, 100, 250)
+        for name, column in middle.items():
+            np.testing.assert_array_equal(column, expected[name][100:250])
+        self.assertEqual(len(read_snapshot(self.path, 500, 500)["age"]), 0)
+
+    def test_scores_of_mapped_columns(self):
+        with UserSnapshotWriter(self.path) as writer:
+            writer.write(self.users)
+        rules = VectorizedRules(**read_snapshot(self.path))
+        rules.apply_all_rules()
+        processed = rules.processedScore
+        for i in range(0, len(self.users), 41):
+            expected = Rules(user=self.users[i], score={"auto": 0, "disability": 0, "home": 0, "life": 0})
+            expected.apply_all_rules()
+            self.assertEqual(tuple(processed[line][i] for line in LINES),
+                             tuple(getattr(expected.processedScore, line).value for line in LINES))
+
+    def test_users_that_do_not_fit(self):
+        user = self.users[0]
+        big_users = [dict(user, age=256), dict(user, dependents=300), dict(user, income=2 ** 32),
+                     dict(user, vehicle={"year": 40000})]
+        with UserSnapshotWriter(self.path) as writer:
+            self.assertEqual(writer.write(big_users + [user]), 4)
+        self.assertEqual(snapshot_rows(self.path), 1)
+
+    def test_invalid_file(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a snapshot")
+        with self.assertRaises(ValueError):
+            read_snapshot(self.path)
+
+    def test_batch_export_and_rescore(self):
+        source = os.path.join(self.directory, "users.ndjson")
+        with open(source, "w") as f:
+            for user in self.users[::5]:
+                f.write(json.dumps(user) + "\n")
+            f.write("{\"age\": -1}\n")
+        stats = batch.run(source, self.path, workers=2, chunk_size=300)
+        self.assertEqual((stats["users"], stats["errors"]), (len(self.users[::5]) + 1, 1))
+
+        expected = os.path.join(self.directory, "expected.ndjson")
+        batch.run(source, expected, chunk_size=300)
+        for workers, engine in ((1, "rules"), (2, "rules"), (1, "table")):
+            results = os.path.join(self.directory, "results.ndjson")
+            batch.run(self.path, results, workers=workers, chunk_size=300, engine=engine)
+            with open(expected) as f, open(results) as g:
+                self.assertEqual(f.read().splitlines()[:-1], g.read().splitlines())
+
+        with self.assertRaises(ValueError):
+            batch.run(self.path, os.path.join(self.directory, "copy.rsk"))
+
+
+if __name__ == '__main__':
+    unittest.main()
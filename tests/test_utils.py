@@ -1,4 +1,7 @@
+import itertools
 import unittest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 import service.utils as utils
 
 
@@ -10,14 +13,29 @@ class TestUtils(unittest.TestCase):
         # This algorithm results in a final score for each line of insurance,
         # which should be processed using the following ranges:
         #
-        # -99 maps to “ineligible”.
+        # no score (an ineligible line) maps to “ineligible”.
         # 0 and below maps to “economic”.
         # 1 and 2 maps to “regular”.
         # 3 and above maps to “responsible”.
-        self.assertEqual("ineligible", utils.process(-99))
+        self.assertEqual("ineligible", utils.process(None))
+        self.assertEqual("economic", utils.process(-100))
         self.assertEqual("economic", utils.process(-1))
         self.assertEqual("economic", utils.process(0))
         self.assertEqual("regular", utils.process(1))
         self.assertEqual("regular", utils.process(2))
         self.assertEqual("responsible", utils.process(3))
         self.assertEqual("responsible", utils.process(4))
+
+    def test_process_score_uses_the_eligibility_bitmask(self):
+        # bits 1 << line of the lines that are eligible, whatever their score
+        score = [1, -100, 0, 3, 0b1101]
+        self.assertEqual(("regular", "ineligible", "economic", "responsible"), utils.process_score(score))
+        self.assertEqual((1, None, 0, 3), utils.numeric_score(score))
+        self.assertEqual(("ineligible",) * 4, utils.process_score([5, 5, 5, 5, 0]))
+
+    def test_encode_plans_matches_the_json_of_the_risk_model(self):
+        # the same bytes FastAPI writes for the RiskModel, for the 256 combinations of plans
+        plans = ("ineligible", "economic", "regular", "responsible")
+        for combination in itertools.product(plans, repeat=4):
+            expected = JSONResponse(jsonable_encoder(utils.risk_model(combination))).body
+            self.assertEqual(expected, utils.encode_plans(combination))
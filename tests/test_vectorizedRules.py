@@ -0,0 +1,46 @@
+import sys, os
+
+testdir = os.path.dirname(__file__)
+srcdir = '../service'
+sys.path.insert(0, os.path.abspath(os.path.join(testdir, srcdir)))
+
+import random
+import unittest
+import numpy as np
+import utils
+from rules import Rules
+from vectorizedRules import VectorizedRules, process_array, LINES
+from tests.helpers import random_user
+
+
+class TestVectorizedRules(unittest.TestCase):
+    def test_process_array_matches_process(self):
+        values = np.array([-99, -5, -1, 0, 1, 2, 3, 4, 10])
+        expected = [utils.process(int(v)) for v in values]
+        self.assertEqual(expected, process_array(values).tolist())
+        eligible = values != 3
+        expected = [utils.process(int(v) if v != 3 else None) for v in values]
+        self.assertEqual(expected, process_array(values, eligible).tolist())
+
+    def test_apply_all_rules_matches_rules(self):
+        rnd = random.Random(42)
+        users = [random_user(rnd, boundaries=True) for _ in range(5000)]
+        rules = VectorizedRules.from_users(users)
+        rules.apply_all_rules()
+        score = rules.score
+        eligible = rules.eligible
+        processed = rules.processedScore
+        for i, user in enumerate(users):
+            expected = Rules(user=user, score={"auto": 0, "disability": 0, "home": 0, "life": 0})
+            expected.apply_all_rules()
+            for line in LINES:
+                self.assertEqual(expected.score[line] is not None, eligible[line][i], (user, line))
+                if expected.score[line] is not None:
+                    self.assertEqual(expected.score[line], score[line][i], (user, line))
+                self.assertEqual(expected.processedScore[line], processed[line][i], (user, line))
+
+    def test_empty_batch(self):
+        rules = VectorizedRules.from_users([])
+        rules.apply_all_rules()
+        for line in LINES:
+            self.assertEqual(0, len(rules.processedScore[line]))